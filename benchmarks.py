@@ -0,0 +1,189 @@
+"""pymindの処理性能を計測するベンチマーク
+
+Tkを使わない推定計測（SvgRenderer）でレイアウトなどを実行し、所要時間を表で出力する。
+
+    python benchmarks.py layout --sizes 1000 10000
+    python benchmarks.py children --sizes 1000 10000
+    python benchmarks.py depth --depths 10000 50000
+"""
+import argparse
+import random
+import time
+from models import MindMapModel
+from layout import LayoutEngine
+from tidy_layout import TidyLayoutEngine
+from svg_export import SvgRenderer
+from child_list import ChildList
+from models import Node
+from traversal import visible
+import tree_json
+
+def build_random_map(size: int, seed: int = 0) -> MindMapModel:
+    """ランダムな親に子を追加していく一般的な形のマップ"""
+    rng = random.Random(seed)
+    model = MindMapModel()
+    nodes = [model.root]
+    for i in range(size - 1):
+        parent = rng.choice(nodes)
+        nodes.append(model.add_node(parent, "トピック" * rng.randint(1, 4) + str(i)))
+    return model
+
+def build_deep_branch_map(size: int, depth: int = 30, seed: int = 0) -> MindMapModel:
+    """幅の広い浅い枝と、深く細い枝が混在するマップ（積み上げ方式では縦に伸びやすい）"""
+    rng = random.Random(seed)
+    model = MindMapModel()
+    count = 1
+    while count < size:
+        branch = model.add_node(model.root, f"枝{count}")
+        count += 1
+        curr = branch
+        for d in range(min(depth, size - count)):
+            curr = model.add_node(curr, f"深さ{d}")
+            count += 1
+            # 深い枝の途中に短い葉を生やす
+            if rng.random() < 0.3 and count < size:
+                model.add_node(curr, "葉")
+                count += 1
+    return model
+
+def _timed(func, repeat: int):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def _vertical_extent(root) -> float:
+    top, bottom = float("inf"), float("-inf")
+    stack = [root]
+    while stack:
+        n = stack.pop()
+        top, bottom = min(top, n.y - n.height/2), max(bottom, n.y + n.height/2)
+        if not n.collapsed:
+            stack.extend(n.children)
+    return bottom - top
+
+def _forget_layout(root):
+    """前回のレイアウトの記録を消し、次のレイアウトで全ノードを計測し直させる"""
+    stack = [root]
+    while stack:
+        n = stack.pop()
+        n._layout_key = None
+        stack.extend(n.children)
+
+def bench_layout(sizes, repeat: int = 3):
+    """標準レイアウトとTidyレイアウトの所要時間とマップの高さを比較する
+
+    time は全ノードを計測し直す場合、relayout は1ノードのテキストだけを変えた後の場合。
+    """
+    metrics = SvgRenderer()
+    print(f"{'map':<12}{'nodes':>8}  {'engine':<10}{'time[ms]':>10}{'relayout[ms]':>14}{'height[px]':>12}")
+    for size in sizes:
+        for name, builder in [("random", build_random_map), ("deep", build_deep_branch_map)]:
+            model = builder(size)
+            leaf = model.root
+            while leaf.children:
+                leaf = leaf.children[-1]
+            for engine_name, engine in [("standard", LayoutEngine()), ("tidy", TidyLayoutEngine())]:
+                def cold():
+                    _forget_layout(model.root)
+                    engine.apply_layout(model, metrics, 0, 0)
+                def relayout():
+                    model.set_text(leaf, leaf.text + "!")
+                    engine.apply_layout(model, metrics, 0, 0)
+                t = _timed(cold, repeat)
+                t_relayout = _timed(relayout, repeat)
+                height = _vertical_extent(model.root)
+                print(f"{name:<12}{size:>8}  {engine_name:<10}{t * 1000:>10.1f}{t_relayout * 1000:>14.1f}{height:>12.0f}")
+
+def bench_children(sizes, repeat: int = 3):
+    """兄弟の多いノードでの位置検索・削除・挿入を list と ChildList で比較する"""
+    print(f"{'siblings':>8}  {'container':<10}{'time[ms]':>10}")
+    for size in sizes:
+        rng = random.Random(size)
+        items = [object() for _ in range(size)]
+        ops = [rng.randrange(size) for _ in range(size)]
+        for name, factory in [("list", list), ("ChildList", ChildList)]:
+            def run():
+                children = factory(items)
+                for i in ops:
+                    item = items[i]
+                    pos = children.index(item)
+                    children.remove(item)
+                    children.insert(pos // 2, item)
+            t = _timed(run, repeat)
+            print(f"{size:>8}  {name:<10}{t * 1000:>10.1f}")
+
+def build_chain_data(depth: int) -> dict:
+    """各トピックが子を1つだけ持つ、深さ depth の文書（他のツールから取り込んだ深いアウトライン）"""
+    data = {"text": "中心トピック", "children": []}
+    curr = data
+    for d in range(depth):
+        child = {"text": f"深さ{d}", "children": []}
+        curr["children"].append(child)
+        curr = child
+    return data
+
+def bench_depth(depths, repeat: int = 3):
+    """深いツリーでの読み込み・保存（JSONの書き出し・読み込みを含む）・レイアウト・描画順の走査・検索の所要時間
+
+    いずれも明示的なスタックで走査するため、Pythonの再帰の上限（既定で1000）を超える深さでも動作する。
+    """
+    metrics = SvgRenderer()
+    engines = [("standard", LayoutEngine()), ("tidy", TidyLayoutEngine())]
+    print(f"{'depth':>8}  {'operation':<18}{'time[ms]':>10}")
+    for depth in depths:
+        data = build_chain_data(depth)
+        model = MindMapModel()
+        model.load(data)
+        deepest = model.root
+        while deepest.children:
+            deepest = deepest.children[0]
+
+        text = tree_json.dumps(model.save(), ensure_ascii=False, indent=4)
+
+        rows = [
+            ("from_dict", lambda: Node.from_dict(data)),
+            ("to_dict", model.save),
+            ("json dump", lambda: tree_json.dumps(model.save(), ensure_ascii=False, indent=4)),
+            ("json load", lambda: Node.from_dict(tree_json.loads(text))),
+            ("find_node_by_id", lambda: model.find_node_by_id(deepest.id)),
+        ]
+        for engine_name, engine in engines:
+            def cold(engine=engine):
+                _forget_layout(model.root)
+                engine.apply_layout(model, metrics, 0, 0)
+            rows.append((f"layout {engine_name}", cold))
+            rows.append((f"relayout {engine_name}", lambda engine=engine: engine.apply_layout(model, metrics, 0, 0)))
+        engine = engines[0][1]
+        rows.append(("visible walk", lambda: sum(1 for _ in visible(model.root, engine.is_expanded,
+                                                                        engine.laid_out_children))))
+        for name, func in rows:
+            t = _timed(func, repeat)
+            print(f"{depth:>8}  {name:<18}{t * 1000:>10.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="pymind ベンチマーク")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_layout = sub.add_parser("layout", help="レイアウトエンジンの比較")
+    p_layout.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    p_layout.add_argument("--repeat", type=int, default=3)
+    p_children = sub.add_parser("children", help="子ノードコンテナの比較")
+    p_children.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    p_children.add_argument("--repeat", type=int, default=3)
+    p_depth = sub.add_parser("depth", help="深いツリーでの走査")
+    p_depth.add_argument("--depths", type=int, nargs="+", default=[10000, 50000])
+    p_depth.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.command == "layout":
+        bench_layout(args.sizes, args.repeat)
+    elif args.command == "children":
+        bench_children(args.sizes, args.repeat)
+    elif args.command == "depth":
+        bench_depth(args.depths, args.repeat)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+from itertools import chain, islice
+
+class ChildList:
+    """子ノード用のlist互換コンテナ
+
+    要素を最大 2*BLOCK_SIZE 個のブロックに分割し、ブロックの長さをフェンウィック木で管理する。
+    要素からブロックへの対応表を持つため、位置の検索・挿入・削除・移動が
+    O(log(n/BLOCK_SIZE) + BLOCK_SIZE) で行える（兄弟数が数千でも一定時間に近い）。
+    ブロックの分割・削除ではブロック番号を振り直すため O(n/BLOCK_SIZE) かかるが、
+    分割されたブロックはそれぞれ BLOCK_SIZE 個以上の要素を持つので、1ブロックにつき
+    BLOCK_SIZE 回以上の挿入・削除ごとにしか起きない。
+    要素数が少ない間は1ブロックのみで、通常のlistとほぼ同じコストで動作する。
+    """
+    BLOCK_SIZE = 64
+
+    __slots__ = ("_blocks", "_len", "_where", "_block_pos", "_tree")
+
+    def __init__(self, iterable=()):
+        self._blocks = []      # 要素のブロック（list）の列
+        self._len = 0
+        self._where = None     # 要素 -> 所属ブロック（ブロックが2つ以上の場合のみ）
+        self._block_pos = None # id(ブロック) -> ブロック番号
+        self._tree = None      # ブロック長のフェンウィック木
+        self.extend(iterable)
+
+    # --- 内部構造の管理 ---
+
+    def _rebuild_index(self):
+        """要素の対応表・ブロック番号・フェンウィック木をすべて作り直す"""
+        if len(self._blocks) <= 1:
+            self._where = self._block_pos = self._tree = None
+            return
+        self._where = {item: block for block in self._blocks for item in block}
+        self._reindex_blocks()
+
+    def _reindex_blocks(self):
+        """ブロックの追加・削除時に、ブロック番号とフェンウィック木だけを作り直す（O(ブロック数)）"""
+        if len(self._blocks) <= 1:
+            self._where = self._block_pos = self._tree = None
+            return
+        self._block_pos = {id(block): i for i, block in enumerate(self._blocks)}
+        n = len(self._blocks)
+        tree = [0] * (n + 1)
+        for i, block in enumerate(self._blocks, 1):
+            tree[i] += len(block)
+            j = i + (i & -i)
+            if j <= n:
+                tree[j] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, block_index, delta):
+        tree = self._tree
+        i = block_index + 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, block_index):
+        """block_index より前のブロックに含まれる要素数"""
+        tree = self._tree
+        total, i = 0, block_index
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def _locate(self, index):
+        """位置 index の要素が入っている (ブロック番号, ブロック内の位置) を返す"""
+        if self._tree is None:
+            return 0, index
+        tree = self._tree
+        pos, rest = 0, index
+        step = 1 << (len(tree) - 1).bit_length()
+        while step:
+            nxt = pos + step
+            if nxt < len(tree) and tree[nxt] <= rest:
+                pos = nxt
+                rest -= tree[nxt]
+            step >>= 1
+        return pos, rest
+
+    def _normalize(self, index, for_insert=False):
+        if index < 0:
+            index += self._len
+        if for_insert:
+            return min(max(index, 0), self._len)
+        if not 0 <= index < self._len:
+            raise IndexError("ChildList index out of range")
+        return index
+
+    def _split_if_needed(self, block_index):
+        block = self._blocks[block_index]
+        if len(block) > 2 * self.BLOCK_SIZE:
+            half = len(block) // 2
+            second = block[half:]
+            del block[half:]
+            self._blocks.insert(block_index + 1, second)
+            if self._where is None:
+                self._rebuild_index()
+            else:
+                for item in second:
+                    self._where[item] = second
+                self._reindex_blocks()
+
+    # --- list互換のAPI ---
+
+    def __len__(self):
+        return self._len
+
+    def __bool__(self):
+        return self._len > 0
+
+    def __iter__(self):
+        if len(self._blocks) == 1:
+            return iter(self._blocks[0])
+        return chain.from_iterable(self._blocks)
+
+    def __reversed__(self):
+        for block in reversed(self._blocks):
+            yield from reversed(block)
+
+    def __contains__(self, item):
+        if self._where is not None:
+            return item in self._where
+        return bool(self._blocks) and item in self._blocks[0]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._len)
+            if step == 1:
+                if stop <= start:
+                    return []
+                # 開始位置まではブロック単位で読み飛ばす
+                bi, off = self._locate(start)
+                items = chain([self._blocks[bi][off:]], islice(self._blocks, bi + 1, None))
+                return list(islice(chain.from_iterable(items), stop - start))
+            return list(self)[index]
+        bi, off = self._locate(self._normalize(index))
+        return self._blocks[bi][off]
+
+    def __setitem__(self, index, item):
+        bi, off = self._locate(self._normalize(index))
+        block = self._blocks[bi]
+        if self._where is not None:
+            del self._where[block[off]]
+            self._where[item] = block
+        block[off] = item
+
+    def __delitem__(self, index):
+        if isinstance(index, slice):
+            items = list(self)
+            del items[index]
+            self.clear()
+            self.extend(items)
+            return
+        self.pop(index)
+
+    def __eq__(self, other):
+        if isinstance(other, (ChildList, list)):
+            return len(self) == len(other) and all(a is b or a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self):
+        return f"ChildList({list(self)!r})"
+
+    def index(self, item) -> int:
+        if self._where is None:
+            if not self._blocks:
+                raise ValueError(f"{item!r} is not in ChildList")
+            return self._blocks[0].index(item)
+        block = self._where.get(item)
+        if block is None:
+            raise ValueError(f"{item!r} is not in ChildList")
+        bi = self._block_pos[id(block)]
+        return self._prefix(bi) + block.index(item)
+
+    def insert(self, index, item):
+        index = self._normalize(index, for_insert=True)
+        if not self._blocks:
+            self._blocks.append([item])
+            self._len = 1
+            return
+        if index == self._len:
+            bi = len(self._blocks) - 1
+            off = len(self._blocks[bi])
+        else:
+            bi, off = self._locate(index)
+        block = self._blocks[bi]
+        block.insert(off, item)
+        self._len += 1
+        if self._where is not None:
+            self._where[item] = block
+            self._tree_add(bi, 1)
+        self._split_if_needed(bi)
+
+    def append(self, item):
+        self.insert(self._len, item)
+
+    def extend(self, items):
+        for item in items:
+            self.insert(self._len, item)
+
+    def pop(self, index=-1):
+        bi, off = self._locate(self._normalize(index))
+        block = self._blocks[bi]
+        item = block.pop(off)
+        self._len -= 1
+        if self._where is not None:
+            del self._where[item]
+        if not block:
+            del self._blocks[bi]
+            self._reindex_blocks()
+        elif self._tree is not None:
+            self._tree_add(bi, -1)
+        return item
+
+    def remove(self, item):
+        self.pop(self.index(item))
+
+    def move(self, item, new_index):
+        """要素を別の位置へ移動する（new_index は移動後の位置）"""
+        self.pop(self.index(item))
+        self.insert(new_index, item)
+
+    def clear(self):
+        self._blocks = []
+        self._len = 0
+        self._rebuild_index()
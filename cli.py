@@ -0,0 +1,253 @@
+"""pymindのマップファイルをGUIなしで一括処理するコマンドラインツール
+
+    python cli.py validate maps/
+    python cli.py convert maps/*.json --to md -o out/
+    python cli.py stats maps/ -j 8 --json
+
+tkinterを読み込まないため、ディスプレイのない環境でも実行できる。
+ファイルごとの処理はプロセスプールで並列に行い、結果は入力の順に逐次出力する。
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+import tree_json
+from exporters import EXPORTERS, export_file
+from importers import IMPORTERS, import_file
+from models import Node
+
+VALID_DIRECTIONS = (None, "left", "right")
+_COLOR = re.compile(r'^#[0-9a-fA-F]{6}$')
+_TAG = re.compile(r'<[^>]+>')
+
+def validate_data(data) -> Tuple[List[str], List[str]]:
+    """pymindのJSONデータのスキーマと親子関係の整合性を検査し、(エラー, 警告) を返す"""
+    errors, warnings = [], []
+    seen_ids = {} # id -> 最初に現れた位置
+    # (ノードの辞書, 位置, 親のdirection, 深さ)。位置は (親の位置, 子の番号) のつながりで、
+    # root/0/2 のような文字列にするのは報告する場合だけ（深いツリーで文字列の長さが深さに比例しないように）
+    stack = [(data, None, None, 0)]
+    while stack:
+        node, path, parent_direction, depth = stack.pop()
+        if not isinstance(node, dict):
+            errors.append(f"{_format_path(path)}: ノードがオブジェクトではありません")
+            continue
+
+        if not isinstance(node.get("text"), str):
+            errors.append(f"{_format_path(path)}: text が文字列ではありません")
+
+        node_id = node.get("id")
+        if node_id is not None:
+            if not isinstance(node_id, str):
+                errors.append(f"{_format_path(path)}: id が文字列ではありません")
+            elif node_id in seen_ids:
+                errors.append(f"{_format_path(path)}: id {node_id} が {_format_path(seen_ids[node_id])} と重複しています")
+            else:
+                seen_ids[node_id] = path
+
+        direction = node.get("direction")
+        if direction not in VALID_DIRECTIONS:
+            errors.append(f"{_format_path(path)}: direction が不正です: {direction!r}")
+        elif depth == 1 and direction is None:
+            warnings.append(f"{_format_path(path)}: ルートの子に direction がありません")
+        elif depth >= 2 and direction != parent_direction:
+            warnings.append(f"{_format_path(path)}: direction {direction!r} が親の {parent_direction!r} と一致しません")
+
+        color = node.get("color")
+        if color is not None and not (isinstance(color, str) and _COLOR.match(color)):
+            errors.append(f"{_format_path(path)}: color が #RRGGBB 形式ではありません: {color!r}")
+        if not isinstance(node.get("collapsed", False), bool):
+            errors.append(f"{_format_path(path)}: collapsed が真偽値ではありません")
+
+        children = node.get("children", [])
+        if not isinstance(children, list):
+            errors.append(f"{_format_path(path)}: children が配列ではありません")
+            continue
+        for i in range(len(children) - 1, -1, -1):
+            stack.append((children[i], (path, i), direction, depth + 1))
+    return errors, warnings
+
+def _format_path(path) -> str:
+    """(親の位置, 子の番号) のつながりを root/0/2 の形式にする"""
+    indexes = []
+    while path is not None:
+        path, i = path
+        indexes.append(str(i))
+    indexes.append("root")
+    return "/".join(reversed(indexes))
+
+def check_tree(root: Node) -> List[str]:
+    """読み込んだノードツリーの親子の参照と集計値が一致しているかを検査する"""
+    errors = []
+    count = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        count += 1
+        for child in node.children:
+            if child.parent is not node:
+                errors.append(f"{child.id}: parent が親ノードを指していません")
+        stack.extend(node.children)
+    if root.descendant_count + 1 != count:
+        errors.append(f"ノード数の集計値 {root.descendant_count + 1} が実際の {count} と一致しません")
+    return errors
+
+def compute_stats(root: Node) -> dict:
+    """ノード数・深さ・分岐数・テキスト長の統計を求める"""
+    leaves = collapsed = max_children = branches = 0
+    text_total = text_max = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        n_children = len(node.children)
+        if n_children:
+            branches += 1
+            max_children = max(max_children, n_children)
+            if node.collapsed: collapsed += 1
+        else:
+            leaves += 1
+        length = len(_TAG.sub("", node.text))
+        text_total += length
+        text_max = max(text_max, length)
+        stack.extend(node.children)
+
+    nodes = root.descendant_count + 1
+    return {
+        "nodes": nodes,
+        "depth": root.max_depth,
+        "leaves": leaves,
+        "collapsed": collapsed,
+        "max_children": max_children,
+        "mean_children": round((nodes - 1) / branches, 2) if branches else 0,
+        "text_chars": text_total,
+        "text_mean": round(text_total / nodes, 1),
+        "text_max": text_max,
+    }
+
+# --- 各プロセスで実行される処理（戻り値は親プロセスへ送るため辞書とする） ---
+
+def _validate(path: str, options: dict) -> dict:
+    if os.path.splitext(path)[1].lower() == ".json":
+        with open(path, "r", encoding="utf-8") as f:
+            data = tree_json.load(f)
+        errors, warnings = validate_data(data)
+        if not errors:
+            errors = check_tree(Node.from_dict(data))
+    else:
+        # アウトライン形式は読み込めれば構造は常に正しい
+        errors, warnings = check_tree(import_file(path)), []
+    return {"file": path, "ok": not errors, "errors": errors, "warnings": warnings}
+
+def _convert(path: str, options: dict) -> dict:
+    stem = os.path.splitext(os.path.basename(path))[0]
+    out_dir = options["output_dir"] or os.path.dirname(path)
+    out_path = os.path.join(out_dir, f"{stem}.{options['to']}")
+    if os.path.abspath(out_path) == os.path.abspath(path):
+        return {"file": path, "ok": False, "errors": ["出力先が入力ファイルと同じです"]}
+    export_file(import_file(path), out_path)
+    return {"file": path, "ok": True, "output": out_path}
+
+def _stats(path: str, options: dict) -> dict:
+    return {"file": path, "ok": True, "stats": compute_stats(import_file(path))}
+
+COMMANDS = {"validate": _validate, "convert": _convert, "stats": _stats}
+
+def _run_task(task) -> dict:
+    command, path, options = task
+    try:
+        return COMMANDS[command](path, options)
+    except Exception as e:
+        return {"file": path, "ok": False, "errors": [f"{type(e).__name__}: {e}"]}
+
+# --- 親プロセス側 ---
+
+def expand_inputs(paths: List[str]) -> List[str]:
+    """ディレクトリは対応する拡張子のファイルを再帰的に展開する"""
+    files = []
+    for path in paths:
+        if not os.path.isdir(path):
+            files.append(path)
+            continue
+        found = []
+        for dir_path, _, names in os.walk(path):
+            found.extend(os.path.join(dir_path, name) for name in names
+                         if os.path.splitext(name)[1].lower() in IMPORTERS)
+        files.extend(sorted(found))
+    return files
+
+def run_tasks(command: str, files: List[str], options: dict, jobs: int):
+    """結果を入力の順に、得られたものから逐次返す"""
+    tasks = [(command, path, options) for path in files]
+    if jobs <= 1 or len(tasks) <= 1:
+        yield from map(_run_task, tasks)
+        return
+    # 小さなファイルが多い場合のプロセス間通信を減らすため、ある程度まとめて渡す
+    chunksize = max(1, min(32, len(tasks) // (jobs * 4)))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(_run_task, tasks, chunksize=chunksize)
+
+STATS_COLUMNS = ["nodes", "depth", "leaves", "max_children", "mean_children", "text_chars", "text_max"]
+
+def _print_result(command: str, result: dict, as_json: bool):
+    if as_json:
+        print(json.dumps(result, ensure_ascii=False), flush=True)
+        return
+    path = result["file"]
+    if not result["ok"]:
+        print(f"NG  {path}")
+        for error in result["errors"]:
+            print(f"    {error}")
+    elif command == "validate":
+        print(f"OK  {path}")
+    elif command == "convert":
+        print(f"OK  {path} -> {result['output']}")
+    elif command == "stats":
+        stats = result["stats"]
+        print("".join(f"{stats[c]:>14}" for c in STATS_COLUMNS) + f"  {path}")
+    if command == "validate":
+        for warning in result.get("warnings", []):
+            print(f"    警告: {warning}")
+    sys.stdout.flush()
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="pymind マップファイルの一括処理")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_command(name, help_text):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("files", nargs="+", help="入力ファイルまたはディレクトリ")
+        p.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="並列に処理するプロセス数")
+        p.add_argument("--json", action="store_true", help="結果を1ファイル1行のJSONで出力する")
+        return p
+
+    add_command("validate", "スキーマと親子関係の整合性を検査する")
+    p_convert = add_command("convert", "別の形式に変換する")
+    p_convert.add_argument("--to", required=True, choices=sorted(ext[1:] for ext in EXPORTERS) + ["svg"],
+                           help="出力形式")
+    p_convert.add_argument("-o", "--output-dir", help="出力先ディレクトリ（省略時は入力と同じ場所）")
+    add_command("stats", "ノード数・深さ・テキストの統計を出力する")
+    args = parser.parse_args(argv)
+
+    options = {}
+    if args.command == "convert":
+        options = {"to": args.to, "output_dir": args.output_dir}
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+
+    files = expand_inputs(args.files)
+    if args.command == "stats" and not args.json:
+        print("".join(f"{c:>14}" for c in STATS_COLUMNS) + "  file")
+
+    failed = 0
+    for result in run_tasks(args.command, files, options, args.jobs):
+        _print_result(args.command, result, args.json)
+        if not result["ok"]:
+            failed += 1
+    print(f"{len(files)} 件中 {failed} 件失敗", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
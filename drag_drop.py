@@ -1,17 +1,17 @@
 import tkinter as tk
+from types import SimpleNamespace
 from models import Node
+from tracing import traced
 
 class DragDropHandler:
     """ノードのドラッグ＆ドロップ移動を管理するクラス"""
-    def __init__(self, canvas, model, graphics, layout_engine, render_callback, find_node_at, logical_center_x, logical_center_y):
+    def __init__(self, canvas, model, graphics, layout_engine, find_node_at, get_selection=None):
         self.canvas = canvas
         self.model = model
         self.graphics = graphics
         self.layout_engine = layout_engine
-        self.render_callback = render_callback
         self.find_node_at = find_node_at
-        self.logical_center_x = logical_center_x
-        self.logical_center_y = logical_center_y
+        self.get_selection = get_selection # 複数選択中のノード一覧を返す関数（省略時は単一ノードのみ移動）
         self.drag_data = {}
 
     def start_drag(self, event, node):
@@ -57,15 +57,17 @@ class DragDropHandler:
         target_node = self.find_node_at(cx, cy)
         dropped_node = self.drag_data["item"]
         
+        selection = self.get_selection() if self.get_selection else []
+        selected_ids = {n.id for n in selection}
+        if len(selection) > 1 and dropped_node.id in selected_ids:
+            # 選択中のノードをまとめて移動し、レイアウトは最後に1回だけ行う
+            if target_node and target_node.id not in selected_ids:
+                self.model.move_nodes(selection, target_node)
+            self.drag_data = {}
+            return
+
         if target_node and target_node != dropped_node and target_node != dropped_node.parent:
-            if not target_node.is_descendant_of(dropped_node) and dropped_node != self.model.root:
-                dropped_node.move_to(target_node)
-                if target_node == self.model.root:
-                    dropped_node.direction = self.model.get_balanced_direction(exclude_node=dropped_node)
-                else:
-                    dropped_node.direction = target_node.direction
-                dropped_node.update_direction_recursive(dropped_node.direction)
-                self.render_callback()
+            self.model.move_nodes([dropped_node], target_node) # 再描画はモデルのイベントで行われる
         
         self.drag_data = {}
 
@@ -79,67 +81,24 @@ class DragDropHandler:
             if event.y < margin: self.canvas.yview_scroll(-1, "units")
             elif event.y > cv_h - margin: self.canvas.yview_scroll(1, "units")
 
+    @traced("DragDropHandler.show_move_shadow")
     def show_move_shadow(self, dragged_node: Node, target_node: Node):
+        """移動先に影を表示する（配置はレイアウトエンジンで計算し、ツリーは変更しない）"""
         if self.drag_data.get("shadow_target_id") == target_node.id: return
         self.hide_move_shadow()
-        
-        base_x, base_y = target_node.x, target_node.y
-        old_parent = dragged_node.parent
-        old_index = old_parent.children.index(dragged_node) if old_parent else -1
-        old_direction = dragged_node.direction
-        
-        try:
-            if old_parent: old_parent.children.remove(dragged_node)
-            dragged_node.parent = target_node
-            target_node.children.append(dragged_node)
-            
-            if target_node == self.model.root:
-                dragged_node.direction = self.model.get_balanced_direction(exclude_node=dragged_node)
-            else:
-                dragged_node.direction = target_node.direction
-            
-            if target_node.collapsed:
-                # 親が折りたたまれている場合は手動で座標を計算
-                margin = 30
-                if dragged_node.direction == 'left':
-                    dragged_node.x = target_node.x - target_node.width/2 - margin - dragged_node.width/2
-                else:
-                    dragged_node.x = target_node.x + target_node.width/2 + margin + dragged_node.width/2
-                dragged_node.y = target_node.y
-            else:
-                # 通常のレイアウト計算
-                dragged_node.update_direction_recursive(dragged_node.direction)
-                self.layout_engine.calculate_subtree_height(self.model.root, self.graphics)
-                self.layout_engine.apply_layout(self.model, self.graphics, self.logical_center_x, self.logical_center_y)
-            
-            sx, sy = base_x + (dragged_node.x - target_node.x), base_y + (dragged_node.y - target_node.y)
-            sw, sh = dragged_node.width, dragged_node.height
-            shadow_id = self.canvas.create_rectangle(
-                sx - sw/2, sy - sh/2, sx + sw/2, sy + sh/2,
-                fill="#e0e0e0", outline="#cccccc", tags="move_shadow"
-            )
-            self.canvas.lower(shadow_id)
-            
-            # 接続線の影
-            tmp_x, tmp_y = dragged_node.x, dragged_node.y
-            dragged_node.x, dragged_node.y = sx, sy
-            target_tmp_x, target_tmp_y = target_node.x, target_node.y
-            target_node.x, target_node.y = base_x, base_y
-            
-            self.graphics.draw_move_shadow_connection(target_node, dragged_node)
-            
-            dragged_node.x, dragged_node.y = tmp_x, tmp_y
-            target_node.x, target_node.y = target_tmp_x, target_tmp_y
-            self.drag_data["shadow_target_id"] = target_node.id
-        finally:
-            if dragged_node in target_node.children: target_node.children.remove(dragged_node)
-            dragged_node.parent = old_parent
-            if old_parent and dragged_node not in old_parent.children:
-                old_parent.children.insert(old_index, dragged_node)
-            dragged_node.direction = old_direction
-            dragged_node.update_direction_recursive(old_direction)
-            self.layout_engine.calculate_subtree_height(self.model.root, self.graphics)
-            self.layout_engine.apply_layout(self.model, self.graphics, self.logical_center_x, self.logical_center_y)
+
+        x, y, side, sector = self.layout_engine.preview_child_position(self.model, target_node, dragged_node)
+        w, h = dragged_node.width, dragged_node.height
+        shadow_id = self.canvas.create_rectangle(
+            x - w/2, y - h/2, x + w/2, y + h/2,
+            fill="#e0e0e0", outline="#cccccc", tags="move_shadow"
+        )
+        self.canvas.lower(shadow_id)
+
+        # 接続線の影（接続線の計算に必要な属性だけを持つ仮のノード）
+        shadow = SimpleNamespace(x=x, y=y, width=w, height=h, side=side, sector=sector)
+        self.graphics.draw_move_shadow_connection(target_node, shadow)
+        self.drag_data["shadow_target_id"] = target_node.id
 
     def hide_move_shadow(self):
         self.canvas.delete("move_shadow")
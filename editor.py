@@ -4,14 +4,21 @@ from graphics import GraphicsEngine
 
 class NodeEditor:
     """ノードのテキスト編集（インライン編集）を管理するクラス"""
-    def __init__(self, canvas: tk.Canvas, root: tk.Tk, graphics: GraphicsEngine, on_finish):
+    REFLOW_DELAY_MS = 30 # 入力が途切れてからライブ再配置を行うまでの待ち時間
+
+    def __init__(self, canvas: tk.Canvas, root: tk.Tk, graphics: GraphicsEngine, on_finish, on_change=None,
+                 set_text=None):
         self.canvas = canvas
         self.root = root
         self.graphics = graphics
         self.on_finish = on_finish # 完了時に呼び出すコールバック (renderなど)
+        self.on_change = on_change # 入力中に呼び出すコールバック on_change(node, text)
+        self.set_text = set_text # 確定したテキストを反映する関数 set_text(node, text)（省略時は直接設定）
         self.editing_entry = None
+        self.node = None # 編集中のノード
         self.window_id = None
         self.finishing = False
+        self._change_after_id = None
 
     def is_editing(self):
         return self.editing_entry is not None
@@ -39,6 +46,7 @@ class NodeEditor:
             node.x, node.y, window=entry, width=edit_width, height=height*25 + 20, anchor="center"
         )
         self.editing_entry = entry
+        self.node = node
         self.finishing = False
         
         def set_focus():
@@ -56,6 +64,29 @@ class NodeEditor:
         entry.bind("<Escape>", lambda e: self.cancel_edit())
         entry.bind("<FocusOut>", lambda e: self.finish_edit(node))
         entry.bind("<Tab>", lambda e: "break")
+        entry.bind("<KeyRelease>", lambda e: self._schedule_change(node))
+
+    def _schedule_change(self, node: Node):
+        """キー入力をまとめ、一定時間入力がなければ on_change を呼び出す"""
+        if not self.on_change or not self.editing_entry:
+            return
+        if self._change_after_id:
+            self.root.after_cancel(self._change_after_id)
+        self._change_after_id = self.root.after(self.REFLOW_DELAY_MS, lambda: self._notify_change(node))
+
+    def _notify_change(self, node: Node):
+        self._change_after_id = None
+        if self.editing_entry and not self.finishing:
+            self.on_change(node, self.editing_entry.get("1.0", "end-1c"))
+
+    def relocate(self, node: Node):
+        """ノードの座標・サイズの変化に合わせて編集ウィンドウを移動・リサイズする"""
+        if not self.window_id:
+            return
+        lines = self.editing_entry.get("1.0", "end-1c").count("\n") + 1
+        height = min(10, max(1, lines))
+        self.canvas.coords(self.window_id, node.x, node.y)
+        self.canvas.itemconfig(self.window_id, width=max(150, node.width + 30), height=height*25 + 20)
 
     def finish_edit(self, node: Node):
         if self.finishing or not self.editing_entry:
@@ -65,7 +96,10 @@ class NodeEditor:
         # Textウィジェットからテキスト取得 (最後の改行を除く)
         new_text = self.editing_entry.get("1.0", "end-1c")
         if new_text is not None:
-            node.text = new_text
+            if self.set_text:
+                self.set_text(node, new_text)
+            else:
+                node.text = new_text
             
         self._cleanup()
         self.on_finish()
@@ -81,8 +115,12 @@ class NodeEditor:
         return "break"
 
     def _cleanup(self):
+        if self._change_after_id:
+            self.root.after_cancel(self._change_after_id)
+            self._change_after_id = None
         if self.editing_entry:
             self.editing_entry = None
+            self.node = None
         if self.window_id:
             self.canvas.delete(self.window_id)
             self.window_id = None
@@ -0,0 +1,47 @@
+# MindMapModel が変更のたびに購読者へ通知するイベント。
+# ノードの属性は変更後の状態になっており、取り消し・差分の計算に必要な変更前の値は old_* に入る。
+# 複数ノードへの一括操作は BatchBegin / BatchEnd で囲まれる（入れ子の場合は最も外側だけ）。
+
+class ModelEvent:
+    """モデルのイベントの基底クラス（属性は __slots__ の順に位置引数で受け取る）"""
+    __slots__ = ()
+
+    def __init__(self, *args):
+        for name, value in zip(self.__slots__, args):
+            setattr(self, name, value)
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+class NodeAdded(ModelEvent):
+    """node（子孫を含む）が parent の index 番目の子として追加された"""
+    __slots__ = ("node", "parent", "index")
+
+class NodeRemoved(ModelEvent):
+    """node（子孫を含む）が parent の index 番目の子から取り除かれた"""
+    __slots__ = ("node", "parent", "index")
+
+class NodeMoved(ModelEvent):
+    """node が parent の index 番目の子へ移動した（方向・色も変わる場合がある）"""
+    __slots__ = ("node", "parent", "index", "old_parent", "old_index", "old_direction", "old_color")
+
+class TextChanged(ModelEvent):
+    __slots__ = ("node", "text", "old")
+
+class AttributesChanged(ModelEvent):
+    """node の方向・色が変わった（子孫の方向は変わらない）"""
+    __slots__ = ("node", "direction", "color", "old_direction", "old_color")
+
+class CollapsedToggled(ModelEvent):
+    __slots__ = ("node", "collapsed")
+
+class ModelLoaded(ModelEvent):
+    """文書全体が root のツリーに置き換わった"""
+    __slots__ = ("root",)
+
+class BatchBegin(ModelEvent):
+    __slots__ = ()
+
+class BatchEnd(ModelEvent):
+    __slots__ = ()
@@ -0,0 +1,92 @@
+import os
+import re
+from typing import TextIO
+from xml.sax.saxutils import escape, quoteattr
+import tree_json
+from models import MindMapModel, Node
+from svg_export import export_svg
+
+# importers.py と対になる書き出し処理。いずれもTkを使わず、明示的なスタックで前順に書き出す。
+
+def _walk(root: Node):
+    """(ノード, 深さ) を前順で返す"""
+    stack = [(root, 0)]
+    while stack:
+        node, depth = stack.pop()
+        yield node, depth
+        stack.extend((child, depth + 1) for child in reversed(node.children))
+
+def _single_line(text: str) -> str:
+    """改行は <br> に置き換えて1行にする（描画時は改行として扱われる）"""
+    return text.replace("\r", "").replace("\n", "<br>")
+
+def export_indented_text(root: Node, f: TextIO):
+    """階層を4スペースのインデントで表したプレーンテキストを書き出す"""
+    for node, depth in _walk(root):
+        f.write("    " * depth + _single_line(node.text) + "\n")
+
+_TAG_BOLD = re.compile(r'<b>(.*?)</b>')
+_TAG_ITALIC = re.compile(r'<i>(.*?)</i>')
+
+def _markdown_text(text: str) -> str:
+    """pymindのマークアップをMarkdownの強調記法に変換する（その他のタグはそのまま残す）"""
+    text = _TAG_BOLD.sub(r'**\1**', _single_line(text))
+    return _TAG_ITALIC.sub(r'*\1*', text)
+
+def export_markdown(root: Node, f: TextIO):
+    """ルートを見出し1、第1階層を見出し2、それより深い階層を入れ子のリストとして書き出す"""
+    for node, depth in _walk(root):
+        text = _markdown_text(node.text)
+        if depth <= 1:
+            if depth == 1: f.write("\n")
+            f.write("#" * (depth + 1) + " " + text + "\n\n")
+        else:
+            f.write("  " * (depth - 2) + "- " + text + "\n")
+
+def export_opml(root: Node, f: TextIO):
+    """ルートを1つの outline 要素とするOPMLを書き出す"""
+    f.write('<?xml version="1.0" encoding="UTF-8"?>\n<opml version="2.0">\n')
+    f.write(f'<head><title>{escape(_single_line(root.text))}</title></head>\n<body>\n')
+    # 子の後に閉じタグを書くため、スタックには (ノード, 深さ) と閉じタグの印 (None, 深さ) を積む
+    stack = [(root, 0)]
+    while stack:
+        node, depth = stack.pop()
+        indent = "  " * (depth + 1)
+        if node is None:
+            f.write(f"{indent}</outline>\n")
+            continue
+        attr = quoteattr(_single_line(node.text))
+        if not node.children:
+            f.write(f"{indent}<outline text={attr}/>\n")
+            continue
+        f.write(f"{indent}<outline text={attr}>\n")
+        stack.append((None, depth))
+        stack.extend((child, depth + 1) for child in reversed(node.children))
+    f.write("</body>\n</opml>\n")
+
+def export_json(root: Node, f: TextIO):
+    """pymindのJSON形式（保存と同じ形式）で書き出す"""
+    tree_json.dump(root.to_dict(), f, ensure_ascii=False, indent=4)
+
+EXPORTERS = {
+    ".json": export_json,
+    ".txt": export_indented_text,
+    ".md": export_markdown,
+    ".markdown": export_markdown,
+    ".opml": export_opml,
+}
+
+def export_file(root: Node, file_path: str):
+    """拡張子に応じた形式でノードツリーを書き出す（.svg はTkを使わない推定計測で描画する）"""
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == ".svg":
+        model = MindMapModel()
+        model.load_root(root)
+        export_svg(model, file_path)
+        return
+
+    exporter = EXPORTERS.get(ext)
+    if exporter is None:
+        raise ValueError(f"対応していない形式です: {ext}")
+    with open(file_path, "w", encoding="utf-8") as f:
+        exporter(root, f)
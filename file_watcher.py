@@ -0,0 +1,56 @@
+import os
+
+class FileWatcher:
+    """開いているファイルの外部での更新を、更新時刻とサイズのポーリングで検出するクラス
+
+    自身の保存による更新は remember() で現在の状態を記録しておくことで無視する。
+    on_change(path) が False を返した場合（編集中など）は、次回のポーリングで再度通知する。
+    """
+    POLL_INTERVAL_MS = 1000
+
+    def __init__(self, widget, get_path, on_change):
+        self.widget = widget
+        self.get_path = get_path
+        self.on_change = on_change
+        self._path = None
+        self._signature = None
+        self._after_id = None
+
+    def start(self):
+        if self._after_id is None:
+            self._after_id = self.widget.after(self.POLL_INTERVAL_MS, self._poll)
+
+    def stop(self):
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+
+    def remember(self, path=None):
+        """ファイルの現在の状態を既知とする（保存・読み込みの直後に呼ぶ）"""
+        self._path = path if path is not None else self.get_path()
+        self._signature = self._stat(self._path)
+
+    @staticmethod
+    def _stat(path):
+        if not path:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _poll(self):
+        self._after_id = None
+        try:
+            path = self.get_path()
+            if path != self._path:
+                self.remember(path)
+            elif path:
+                signature = self._stat(path)
+                # 削除・置き換え中で読めない間は通知しない
+                if signature is not None and signature != self._signature:
+                    if self.on_change(path) is not False:
+                        self._signature = signature
+        finally:
+            self.start() # on_change で例外が起きても監視は続ける
@@ -1,16 +1,24 @@
-import tkinter as tk
-from typing import Dict, Optional
+from typing import TYPE_CHECKING, Dict, Optional
 from models import Node
+from tracing import traced
+
+if TYPE_CHECKING:
+    # 描画先の型注釈のみに使用（SVG出力やCLIなどTkを使わない経路でtkinterを読み込まない）
+    import tkinter as tk
 
 class GraphicsEngine:
     """tkinter.Canvas上での描画を管理するクラス"""
-    def __init__(self, canvas: tk.Canvas):
+    def __init__(self, canvas: 'tk.Canvas'):
         self.canvas = canvas
         self.node_items: Dict[str, list] = {}  # node_id -> list of item ids
         self.text_items: Dict[str, int] = {} 
         self.line_items: Dict[str, list] = {} 
+        self.shape_items: Dict[str, int] = {}     # node_id -> 枠（ルート）または下線のアイテム
+        self.highlight_items: Dict[str, int] = {} # node_id -> 選択時の強調表示のアイテム
+        self._measure_cache: Dict[tuple, Optional[tuple]] = {} # (text, font) -> (幅, 高さ)
         
         # 定数
+        self.MEASURE_CACHE_SIZE = 100000
         self.BEZIER_STEPS = 15
         self.TAPERED_BEZIER_STEPS = 30
         
@@ -29,23 +37,17 @@ class GraphicsEngine:
             "#96CEB4", # Green
         ]
 
+    def font_signature(self) -> list:
+        """テキストの計測結果を左右する設定（実際に使われるフォントと画面の拡大率）"""
+        if self.canvas is None:
+            return [type(self).__name__, list(self.font), list(self.root_font)]
+        call = self.canvas.tk.call
+        return [type(self).__name__, str(call("font", "actual", self.font)),
+                str(call("font", "actual", self.root_font)), str(call("tk", "scaling"))]
+
     def _get_node_color(self, node: Node):
-        """ノードの系統色を取得（ルートの子ノードに基づき決定）"""
-        if node.parent is None:
-            return self.root_outline
-        
-        # ルートの何番目の子孫か
-        curr = node
-        while curr.parent and curr.parent.parent:
-            curr = curr.parent
-        
-        if curr.parent is None: return self.root_outline
-        
-        try:
-            idx = curr.parent.children.index(curr)
-            return self.branch_colors[idx % len(self.branch_colors)]
-        except ValueError:
-            return self.branch_colors[0]
+        """ノードの系統色を取得（レイアウト時に計算済みの値を参照する）"""
+        return node.branch_color or self.root_outline
 
     def _create_rounded_rect(self, x1, y1, x2, y2, radius=10, **kwargs):
         points = [x1+radius, y1, x1+radius, y1, x2-radius, y1, x2-radius, y1, x2, y1, x2, y1+radius, x2, y1+radius, x2, y2-radius, x2, y2-radius, x2, y2, x2-radius, y2, x2-radius, y2, x1+radius, y2, x1+radius, y2, x1, y2, x1, y2-radius, x1, y2-radius, x1, y1+radius, x1, y1+radius, x1, y1]
@@ -96,58 +98,71 @@ class GraphicsEngine:
         
         return segments
 
+    def _measure_segment(self, txt: str, font):
+        """テキスト断片の描画サイズ (幅, 高さ) を返す。計測できない場合はNone
+
+        キャンバス上での計測は重いため、(テキスト, フォント) ごとに結果を保持する。
+        """
+        key = (txt, font)
+        cache = self._measure_cache
+        if key in cache:
+            return cache[key]
+
+        temp_id = self.canvas.create_text(0, 0, text=txt, font=font)
+        bbox = self.canvas.bbox(temp_id)
+        self.canvas.delete(temp_id)
+        size = (bbox[2] - bbox[0], bbox[3] - bbox[1]) if bbox else None
+
+        if len(cache) >= self.MEASURE_CACHE_SIZE:
+            cache.clear()
+        cache[key] = size
+        return size
+
+    def _measure_lines(self, text: str, base_font):
+        """行ごとに (行の幅, [(text, font, underline, color, 幅, 高さ), ...]) を返す"""
+        family = base_font[0]
+        size = base_font[1]
+        
+        measured = []
+        for line in text.split("\n"):
+            line_w = 0
+            segments = []
+            for txt, style, underline, color in self._parse_markup(line):
+                font = (family, size, style) if style != "normal" else (family, size)
+                seg_size = self._measure_segment(txt, font)
+                if seg_size:
+                    line_w += seg_size[0]
+                    segments.append((txt, font, underline, color, seg_size[0], seg_size[1]))
+            measured.append((line_w, segments))
+        return measured
+
+    @traced("GraphicsEngine.get_text_size")
     def get_text_size(self, text: str, base_font, max_width: int = 250):
         """マルチラインとマークアップを考慮したサイズ計算"""
-        lines = text.split("\n")
         max_w = 0
         total_h = 0
-        
-        family = base_font[0]
         size = base_font[1]
         
-        for line in lines:
-            segments = self._parse_markup(line)
-            line_w = 0
-            line_h = 0
-            for txt, style, underline, color in segments:
-                font = (family, size, style) if style != "normal" else (family, size)
-                temp_id = self.canvas.create_text(0, 0, text=txt, font=font)
-                bbox = self.canvas.bbox(temp_id)
-                self.canvas.delete(temp_id)
-                if bbox:
-                    line_w += (bbox[2] - bbox[0])
-                    line_h = max(line_h, bbox[3] - bbox[1])
+        for line_w, segments in self._measure_lines(text, base_font):
+            line_h = max((seg[5] for seg in segments), default=0)
             max_w = max(max_w, line_w)
             total_h += (line_h if line_h > 0 else size + 10)
             
         return max(100, max_w + 20), max(35, total_h + 12)
 
-    def _draw_rich_text(self, x, y, text, base_font, tags):
-        """リッチテキストをキャンバスに描画する"""
-        lines = text.split("\n")
-        family = base_font[0]
+    def _draw_rich_text(self, x, y, text, base_font, tags, h=None):
+        """リッチテキストをキャンバスに描画する（hはレイアウト計算済みの高さ）"""
         size = base_font[1]
         
         # 全体の高さを計算して開始Y座標を調整
-        w, h = self.get_text_size(text, base_font)
+        if h is None:
+            w, h = self.get_text_size(text, base_font)
         curr_y = y - h/2 + 10
         
         item_ids = []
         
-        for line in lines:
-            segments = self._parse_markup(line)
-            # 行の幅を計算して中央寄せの開始Xを決定
-            line_w = 0
-            temp_items = []
-            for txt, style, underline, color in segments:
-                font = (family, size, style) if style != "normal" else (family, size)
-                tid = self.canvas.create_text(0, 0, text=txt, font=font)
-                bbox = self.canvas.bbox(tid)
-                self.canvas.delete(tid)
-                if bbox:
-                    line_w += (bbox[2] - bbox[0])
-                    temp_items.append((txt, font, underline, color, bbox[2]-bbox[0], bbox[3]-bbox[1]))
-            
+        for line_w, temp_items in self._measure_lines(text, base_font):
+            # 行の幅から中央寄せの開始Xを決定
             curr_x = x - line_w / 2
             max_line_h = 0
             
@@ -187,12 +202,13 @@ class GraphicsEngine:
             points.append((x, y))
         return points
 
+    @traced("GraphicsEngine.draw_node")
     def draw_node(self, node: Node, is_selected: bool = False):
         x, y = node.x, node.y
-        is_root = node.parent is None
+        is_root = node.depth == 0 # レイアウトの根（ホイスト中はそのノード）
         font = self.root_font if is_root else self.font
         
-        node.width, node.height = self.get_text_size(node.text, font)
+        # サイズはレイアウト計算時に計測済みの値を使用する
         w, h = node.width, node.height
         
         if node.id in self.node_items:
@@ -202,16 +218,11 @@ class GraphicsEngine:
         
         items = []
         color = self._get_node_color(node)
+        self.highlight_items.pop(node.id, None)
         
         # 選択状態の強調表示（背面に配置）
         if is_selected:
-            # 淡いブルーのハイライトボックス
-            p_h = 4
-            highlight_id = self._create_rounded_rect(
-                x - w/2 - 10, y - h/2 - p_h, x + w/2 + 10, y + h/2 + p_h,
-                radius=6, fill="#E3F2FD", outline="#2196F3", width=1, tags=("node", node.id)
-            )
-            items.append(highlight_id)
+            items.append(self._create_highlight(node))
 
         if is_root:
             # ルートノード：太い枠線の角丸長方形
@@ -222,6 +233,7 @@ class GraphicsEngine:
                 radius=10, fill=fill_color, outline=color, width=outline_w, tags=("node", node.id)
             )
             items.append(rect_id)
+            self.shape_items[node.id] = rect_id
         else:
             # サブトピック：下線のみ
             line_y = y + h/2
@@ -231,42 +243,71 @@ class GraphicsEngine:
                 lx1, line_y, lx2, line_y, fill=color, width=u_width, tags=("node", node.id)
             )
             items.append(underline_id)
+            self.shape_items[node.id] = underline_id
 
         self.node_items[node.id] = items
         
         # テキスト（リッチテキスト対応）
         text_item_ids = self._draw_rich_text(
-            x, y, node.text, font, tags=("text", node.id)
+            x, y, node.text, font, tags=("text", node.id), h=h
         )
         self.text_items[node.id] = text_item_ids[0] if text_item_ids else None
         # 全てのアイテムを管理可能にするために node_items に追加
         self.node_items[node.id].extend(text_item_ids)
         
-        if node.children and node.parent:
+        if node.children and not is_root:
             self._draw_collapse_icon(node)
         
-        if node.parent:
+        if not is_root:
             self.draw_connection(node)
 
+    def _create_highlight(self, node: Node) -> int:
+        """淡いブルーのハイライトボックスを作成する"""
+        x, y, w, h = node.x, node.y, node.width, node.height
+        p_h = 4
+        highlight_id = self._create_rounded_rect(
+            x - w/2 - 10, y - h/2 - p_h, x + w/2 + 10, y + h/2 + p_h,
+            radius=6, fill="#E3F2FD", outline="#2196F3", width=1, tags=("node", node.id)
+        )
+        self.highlight_items[node.id] = highlight_id
+        return highlight_id
+
+    def set_selected(self, node: Node, is_selected: bool):
+        """描画済みのノードの選択状態の表示だけを切り替える（draw_node の is_selected と同じ見た目）"""
+        shape_id = self.shape_items.get(node.id)
+        if shape_id is None or node.id not in self.node_items:
+            return
+        highlight_id = self.highlight_items.get(node.id)
+        if is_selected and highlight_id is None:
+            highlight_id = self._create_highlight(node)
+            self.canvas.tag_lower(highlight_id, shape_id)
+            self.node_items[node.id].append(highlight_id)
+        elif not is_selected and highlight_id is not None:
+            self.canvas.delete(highlight_id)
+            del self.highlight_items[node.id]
+            self.node_items[node.id].remove(highlight_id)
+
+        if node.depth == 0:
+            self.canvas.itemconfig(shape_id, width=4 if is_selected else 3,
+                                   fill="#E3F2FD" if is_selected else "white")
+        else:
+            self.canvas.itemconfig(shape_id, width=3 if is_selected else 2)
+
     def _get_connection_points(self, node: Node, parent: Node):
         """接続の開始点、制御点、終了点を計算する"""
-        if parent.parent is None:
+        if parent.depth == 0:
             return self._get_root_connection_points(node, parent)
         else:
             return self._get_subtree_connection_points(node, parent)
 
     def _get_root_connection_points(self, node: Node, parent: Node):
         """ルートからの接続点を計算"""
-        side_siblings = [c for c in parent.children if c.direction == node.direction]
-        try:
-            side_idx = side_siblings.index(node) % 3
-        except ValueError:
-            side_idx = 0
+        side_idx = node.sector
         
         w_h = parent.width / 2 + 12
         h_h = parent.height / 2 + 10
         
-        if node.direction != 'left':
+        if node.side != 'left':
             if side_idx == 0: px, py = parent.x + w_h, parent.y - h_h
             elif side_idx == 1: px, py = parent.x + w_h, parent.y + h_h
             else: px, py = parent.x + w_h, parent.y
@@ -299,7 +340,7 @@ class GraphicsEngine:
         return (px, py), (cp1x, cp1y), (cp2x, cp2y), (nx, ny), False # not_tapered
 
     def draw_connection(self, node: Node):
-        if not node.parent or node.parent.collapsed: return
+        if node.depth == 0 or node.parent.collapsed: return
         if node.id in self.line_items:
             for item in self.line_items[node.id]: self.canvas.delete(item)
         
@@ -361,8 +402,7 @@ class GraphicsEngine:
 
     def _draw_collapse_icon(self, node: Node):
         """折り畳み/展開用のアイコンを描画する"""
-        # 実際には方向(direction)に基づいた方が正確
-        if node.direction == 'left':
+        if node.side == 'left':
             x = node.x - node.width/2 - 10
         else:
             x = node.x + node.width/2 + 10
@@ -380,8 +420,8 @@ class GraphicsEngine:
         self.node_items[node.id].append(circle_id)
         
         if node.collapsed:
-            # 折りたたみ中：子ノードの数を表示
-            count = len(node.children)
+            # 折りたたみ中：隠れている子孫ノードの数を表示
+            count = node.descendant_count
             text_id = self.canvas.create_text(
                 x, y, text=str(count), font=("Yu Gothic", 7), fill=color, tags=("collapse_icon", node.id)
             )
@@ -393,8 +433,28 @@ class GraphicsEngine:
             )
             self.node_items[node.id].append(line_id)
 
+    def translate_subtree(self, node: Node, dx, dy, children_of=None):
+        """描画済みのサブツリーを平行移動する（根の接続線のみ描き直す）
+
+        children_of を渡すと、children の代わりにその戻り値（描画された子）をたどる。
+        """
+        if children_of is None:
+            children_of = lambda n: n.children
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            self.canvas.move(n.id, dx, dy)
+            if n is not node:
+                for item in self.line_items.get(n.id, ()):
+                    self.canvas.move(item, dx, dy)
+            if not n.collapsed:
+                stack.extend(children_of(n))
+        self.draw_connection(node)
+
     def clear(self):
         self.canvas.delete("all")
         self.node_items.clear()
         self.text_items.clear()
         self.line_items.clear()
+        self.shape_items.clear()
+        self.highlight_items.clear()
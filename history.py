@@ -0,0 +1,167 @@
+from contextlib import contextmanager
+from typing import List, Optional
+from events import (AttributesChanged, BatchBegin, BatchEnd, CollapsedToggled, ModelLoaded, NodeAdded,
+                    NodeMoved, NodeRemoved, TextChanged)
+from models import MindMapModel, Node
+
+class UndoHistory:
+    """モデルのイベントを操作の記録として保持し、元に戻す・やり直すを行うクラス
+
+    文書全体の複製は保持せず、各操作を逆に適用するのに必要な値（イベントの変更前の値と、
+    削除したサブツリーへの参照）だけを記録するため、メモリは編集の量に比例する。
+    一括操作（BatchBegin / BatchEnd で囲まれたイベント）は1回の操作として扱う。
+    記録するのは新しい方から depth 回分まで。文書を読み込み直すと履歴は破棄する。
+    元に戻す・やり直す操作もモデルの操作として通知されるため、再描画や同期は通常の編集と同じく行われる。
+    """
+    DEFAULT_DEPTH = 200
+
+    def __init__(self, model: MindMapModel, depth: int = DEFAULT_DEPTH):
+        self.model = model
+        self.depth = depth
+        self._undo: List[list] = [] # 操作ごとの [(イベント, 変更後の方向, 変更後の色), ...]
+        self._redo: List[list] = []
+        self._pending: Optional[list] = None # 一括操作の途中で受け取ったイベント
+        self._applying = False
+        model.subscribe(self._on_event)
+
+    def close(self):
+        self.model.unsubscribe(self._on_event)
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+
+    @property
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    @property
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    @contextmanager
+    def suspended(self):
+        """with文の間の変更を記録しない"""
+        applying, self._applying = self._applying, True
+        try:
+            yield
+        finally:
+            self._applying = applying
+
+    def _on_event(self, event):
+        if isinstance(event, ModelLoaded):
+            self.clear() # 記録を止めている間（同期での読み込みなど）も、以前の文書の履歴は使えない
+            return
+        if self._applying:
+            return
+        if isinstance(event, BatchBegin):
+            self._pending = []
+            return
+        if isinstance(event, BatchEnd):
+            entry, self._pending = self._pending, None
+            if entry:
+                self._push(entry)
+            return
+        # 移動はイベントに変更後の方向・色が含まれないため、この時点の値を記録する
+        record = (event, event.node.direction, event.node.color) if isinstance(event, NodeMoved) else (event,)
+        if self._pending is not None:
+            self._pending.append(record)
+        else:
+            self._push([record])
+
+    def _push(self, entry: list):
+        self._undo.append(entry)
+        if len(self._undo) > self.depth:
+            del self._undo[:len(self._undo) - self.depth]
+        self._redo.clear()
+
+    def undo(self) -> Optional[Node]:
+        """直前の操作を元に戻し、選択すべきノードを返す（戻す操作がなければNone）"""
+        if not self._undo:
+            return None
+        entry = self._undo.pop()
+        focus = self._replay(reversed(entry), undo=True)
+        self._redo.append(entry)
+        return focus
+
+    def redo(self) -> Optional[Node]:
+        """元に戻した操作をやり直し、選択すべきノードを返す（やり直す操作がなければNone）"""
+        if not self._redo:
+            return None
+        entry = self._redo.pop()
+        focus = self._replay(entry, undo=False)
+        self._undo.append(entry)
+        return focus
+
+    def _replay(self, records, undo: bool) -> Optional[Node]:
+        focus = None
+        with self.suspended(), self.model.batch():
+            for record in records:
+                node = self._apply(record, undo)
+                if node is not None:
+                    focus = node
+        return focus
+
+    def _apply(self, record, undo: bool) -> Optional[Node]:
+        """1つのイベントを逆に（undo=Falseなら順に）適用し、選択すべきノードを返す
+
+        同期などで記録後にツリーが変わり、適用できなくなった操作は読み飛ばす。
+        """
+        model = self.model
+        event = record[0]
+        node = event.node
+        if isinstance(event, (NodeAdded, NodeRemoved)):
+            attach = isinstance(event, NodeAdded) != undo
+            if attach:
+                if node._in_parent or not _is_attached(model, event.parent):
+                    return None
+                model.insert_subtree(event.parent, node, min(event.index, len(event.parent.children)))
+                return node
+            if not node._in_parent or not _is_attached(model, node):
+                return None
+            parent = node.parent
+            model.remove_subtree(node)
+            return parent
+
+        if isinstance(event, NodeMoved):
+            if undo:
+                parent, index = event.old_parent, event.old_index
+                direction, color = event.old_direction, event.old_color
+            else:
+                parent, index = event.parent, event.index
+                direction, color = record[1], record[2]
+            if parent is None:
+                # 切り離されたノードからの移動（同期で削除済みのノードなど）は切り離した状態に戻す
+                if node._in_parent:
+                    model.remove_subtree(node)
+                return None
+            if not _is_attached(model, node) or not _is_attached(model, parent):
+                return None
+            if parent is node or parent.is_descendant_of(node):
+                return None
+            model.relocate_subtree(node, parent, min(index, len(parent.children)), direction=direction, color=color)
+            return node
+
+        if isinstance(event, TextChanged):
+            model.set_text(node, event.old if undo else event.text)
+            return node
+
+        if isinstance(event, AttributesChanged):
+            if undo:
+                model.set_style(node, event.old_direction, event.old_color)
+            else:
+                model.set_style(node, event.direction, event.color)
+            return node
+
+        if isinstance(event, CollapsedToggled):
+            model._set_collapsed(node, not event.collapsed if undo else event.collapsed)
+            return node
+        return None
+
+def _is_attached(model: MindMapModel, node: Node) -> bool:
+    """現在のルートから辿れるか"""
+    while node.parent is not None:
+        if not node._in_parent:
+            return False
+        node = node.parent
+    return node is model.root
@@ -0,0 +1,172 @@
+import os
+import re
+import xml.etree.ElementTree as ET
+from typing import Iterable, List, Tuple
+import tree_json
+from models import Node
+
+class OutlineBuilder:
+    """(階層レベル, テキスト) の列から明示的なスタックでノードツリーを組み立てるクラス
+
+    レベルは比較可能な値であれば何でもよく、直前の行より大きければ子、
+    そうでなければスタックを戻って兄弟・祖先の兄弟として追加する。
+    """
+    def __init__(self):
+        self.roots: List[Node] = []
+        self._stack: List[Tuple[object, Node]] = []
+
+    def add(self, level, text: str) -> Node:
+        stack = self._stack
+        while stack and stack[-1][0] >= level:
+            stack.pop()
+
+        if stack:
+            parent = stack[-1][1]
+            node = Node(text, parent=parent)
+            parent.children.append(node)
+        else:
+            node = Node(text)
+            self.roots.append(node)
+        stack.append((level, node))
+        return node
+
+    def build(self, default_root_text: str) -> Node:
+        """トップレベルが1つならそれをルートに、複数ならまとめるルートを作成する"""
+        if len(self.roots) == 1:
+            root = self.roots[0]
+        else:
+            root = Node(default_root_text)
+            for node in self.roots:
+                node.parent = root
+                root.children.append(node)
+        assign_balanced_directions(root)
+        root.recompute_aggregates()
+        return root
+
+def assign_balanced_directions(root: Node):
+    """ルートの子を左右交互に振り分け、子孫に方向を一括で伝播させる
+
+    get_balanced_direction を1ノードずつ呼んだ場合と同じ結果（右・左・右…）になる。
+    """
+    root.direction = None
+    stack = []
+    for i, child in enumerate(root.children):
+        child.direction = 'right' if i % 2 == 0 else 'left'
+        stack.append(child)
+
+    while stack:
+        node = stack.pop()
+        for child in node.children:
+            child.direction = node.direction
+            stack.append(child)
+
+def _indented_text_builder(lines: Iterable[str]) -> OutlineBuilder:
+    builder = OutlineBuilder()
+    for line in lines:
+        line = line.rstrip("\r\n").expandtabs(4)
+        text = line.strip()
+        if not text:
+            continue
+        builder.add(len(line) - len(line.lstrip()), text)
+    return builder
+
+def import_indented_text(lines: Iterable[str], default_root_text: str = "中心トピック") -> Node:
+    """インデント（スペース・タブ）で階層を表したプレーンテキストを読み込む"""
+    return _indented_text_builder(lines).build(default_root_text)
+
+def import_indented_nodes(lines: Iterable[str]) -> List[Node]:
+    """インデントテキストを、まとめるルートを作らずにトップレベルのノードの一覧として読み込む（貼り付け用）"""
+    roots = _indented_text_builder(lines).roots
+    for root in roots:
+        root.recompute_aggregates()
+    return roots
+
+_MD_HEADING = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+_MD_LIST_ITEM = re.compile(r'^(\s*)(?:[-*+]|\d+[.)])\s+(.*)$')
+_MD_BOLD = re.compile(r'(\*\*|__)(.+?)\1')
+_MD_ITALIC = re.compile(r'(?<![*\w])([*_])(?!\s)(.+?)(?<!\s)\1(?![*\w])')
+
+def _markdown_inline(text: str) -> str:
+    """Markdownの強調記法をpymindのマークアップに変換する"""
+    text = _MD_BOLD.sub(r'<b>\2</b>', text)
+    return _MD_ITALIC.sub(r'<i>\2</i>', text)
+
+def import_markdown(lines: Iterable[str], default_root_text: str = "中心トピック") -> Node:
+    """Markdownの見出しとリストを階層として読み込む
+
+    見出しは (見出しレベル, 0)、リストや段落の行はどの見出しよりも深い (7, インデント幅)
+    をレベルとするため、リストは直前の見出しの下にぶら下がり、次の見出しで閉じられる。
+    """
+    builder = OutlineBuilder()
+    in_code = False
+    for line in lines:
+        line = line.rstrip("\r\n").expandtabs(4)
+        if line.lstrip().startswith(("```", "~~~")):
+            in_code = not in_code
+            continue
+        if in_code or not line.strip():
+            continue
+
+        m = _MD_HEADING.match(line)
+        if m:
+            builder.add((len(m.group(1)), 0), _markdown_inline(m.group(2)))
+            continue
+
+        m = _MD_LIST_ITEM.match(line)
+        if m:
+            indent, text = len(m.group(1)), m.group(2)
+        else:
+            indent, text = len(line) - len(line.lstrip()), line.strip()
+        builder.add((7, indent), _markdown_inline(text))
+    return builder.build(default_root_text)
+
+def import_opml(source, default_root_text: str = "中心トピック") -> Node:
+    """OPMLの outline 要素を逐次解析で読み込む（読み終えた要素は即座に破棄する）"""
+    builder = OutlineBuilder()
+    title = None
+    elem_stack = []
+    depth = 0
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            elem_stack.append(elem)
+            if elem.tag == "outline":
+                depth += 1
+                builder.add(depth, elem.get("text", elem.get("title", "")))
+            continue
+
+        if elem.tag == "outline":
+            depth -= 1
+        elif elem.tag == "title" and title is None and elem.text:
+            title = elem.text.strip()
+        elem_stack.pop()
+        elem.clear()
+        # 親から切り離してメモリ使用量を入力サイズに依存させない
+        if elem_stack:
+            del elem_stack[-1][-1]
+    return builder.build(title or default_root_text)
+
+def import_json(source, default_root_text: str = "中心トピック") -> Node:
+    """pymindのJSON形式を読み込む"""
+    return Node.from_dict(tree_json.load(source))
+
+IMPORTERS = {
+    ".json": import_json,
+    ".txt": import_indented_text,
+    ".md": import_markdown,
+    ".markdown": import_markdown,
+    ".opml": import_opml,
+}
+
+def import_file(file_path: str) -> Node:
+    """拡張子に応じたインポーターでファイルを読み込み、ルートノードを返す"""
+    ext = os.path.splitext(file_path)[1].lower()
+    importer = IMPORTERS.get(ext)
+    if importer is None:
+        raise ValueError(f"対応していない形式です: {ext}")
+
+    default_root_text = os.path.splitext(os.path.basename(file_path))[0]
+    if importer is import_opml:
+        with open(file_path, "rb") as f:
+            return importer(f, default_root_text)
+    with open(file_path, "r", encoding="utf-8") as f:
+        return importer(f, default_root_text)
@@ -1,5 +1,9 @@
 from typing import List, Tuple
 from models import Node, MindMapModel
+from navigation import NavigationGraph, build_navigation_graph, navigation_graph_steps
+from paging import ChildWindows, Placeholder
+from tracing import traced, tracer
+from traversal import Batches, preorder, run_steps
 
 class LayoutEngine:
     """マインドマップの配置計算を担当するクラス"""
@@ -8,34 +12,149 @@ class LayoutEngine:
         self.h_margin = 80  # 横方向の余白
         self.v_gap = 40     # グループ間の垂直方向の最小隙間
         self.spacing_y = 30 # 垂直方向の最小間隔
+        self.nav_graph: NavigationGraph = None # 直近のレイアウトで作成した隣接表
+        self.depth_limit = None # 段階表示中はこの深さ以上のノードを折りたたみとして扱う
+        self.child_windows: ChildWindows = None # 子の多いノードの表示範囲（Noneの場合はすべての子を配置する）
+        self.hoisted: Node = None # レイアウトの根とするノード（Noneの場合は文書のルート）
+
+    def layout_root(self, model: MindMapModel) -> Node:
+        """配置・描画するツリーの根（ホイスト中はそのノード）"""
+        return self.hoisted if self.hoisted is not None else model.root
+
+    def hoist(self, node: Node):
+        """node をレイアウトの根にする（Noneで解除）
+
+        根は別のフォント・枠で計測されるため、新旧の根から祖先方向の計測の記録を破棄する。
+        """
+        for curr in (self.hoisted, node):
+            while curr is not None:
+                curr._layout_key = None
+                curr = curr.parent
+        self.hoisted = node
+
+    @staticmethod
+    def layout_parent(node: Node):
+        """配置上の親（レイアウトの根ではNone）。深さはレイアウトの根からの深さ"""
+        return None if node.depth == 0 else node.parent
+
+    def is_expanded(self, node: Node) -> bool:
+        """レイアウト上で子を展開して配置するかどうか"""
+        return not node.collapsed and (self.depth_limit is None or node.depth < self.depth_limit)
+
+    def laid_out_children(self, node: Node) -> list:
+        """配置する子の一覧（子の多いノードでは表示範囲の子とプレースホルダー）"""
+        if self.child_windows is None:
+            return node.children
+        return self.child_windows.visible_children(node)
 
     def calculate_subtree_height(self, node: Node, graphics):
-        """そのノードを含むサブツリー全体の必要高さを計算・更新する"""
-        font = graphics.root_font if node.parent is None else graphics.font
-        node.width, node.height = graphics.get_text_size(node.text, font)
-        
-        if not node.children or node.collapsed:
-            node.subtree_height = node.height
-            return node.height
-            
-        total_height = sum(self.calculate_subtree_height(c, graphics) for c in node.children)
-        total_height += self.spacing_y * (len(node.children) - 1)
-        
-        # サブツリーの高さは、自身の高さか子の合計か高い方（余白含む）
-        node.subtree_height = max(node.height, total_height)
+        """そのノードを含むサブツリー全体の必要高さを計算・更新する
+
+        内容のハッシュと計測方法が前回と同じサブツリーは、前回の計測結果をそのまま使う。
+        段階表示の途中はツリー全体のハッシュを求めないよう、記録を使わない。
+        子が先に計測されるよう後順に走査し、記録が一致したサブツリーはたどらない。
+        """
+        run_steps(self._measure_steps(node, graphics, Batches()))
         return node.subtree_height
 
+    def _measure_steps(self, node: Node, graphics, batches: Batches):
+        use_memo = self.depth_limit is None
+        if use_memo and batches.size is not None:
+            # 記録との比較で求めるハッシュも、まとめて計算せずに区切って求めておく
+            yield from _hash_steps(node, batches)
+        reused = set()
+
+        def prune(n):
+            key = None
+            if use_memo:
+                key = self.layout_key(n, graphics)
+                if n._layout_key == key:
+                    reused.add(n)
+                    return True
+            n._layout_key = key
+            return not n.children or not self.is_expanded(n)
+
+        # 前順を逆にたどると、子がすべて親より先になる
+        order = []
+        for n in preorder(node, self.laid_out_children, prune):
+            order.append(n)
+            if batches.tick(): yield
+        order.reverse()
+
+        get_text_size, spacing_y = graphics.get_text_size, self.spacing_y
+        for n in order:
+            if n in reused:
+                continue
+            font = graphics.root_font if n.depth == 0 else graphics.font
+            n.width, n.height = get_text_size(n.text, font)
+            if batches.tick(): yield
+            if not n.children or not self.is_expanded(n):
+                n.subtree_height = n.height
+                continue
+            children = self.laid_out_children(n)
+            total_height = sum(c.subtree_height for c in children) + spacing_y * (len(children) - 1)
+            # サブツリーの高さは、自身の高さか子の合計か高い方（余白含む）
+            n.subtree_height = max(n.height, total_height)
+
+    def layout_key(self, node: Node, graphics) -> tuple:
+        """サブツリーの計測結果が再利用できるかを判定するための記録"""
+        return (node.content_hash(), graphics, self.spacing_y, self.child_windows, node.depth == 0)
+
+    @traced("LayoutEngine.apply_layout")
     def apply_layout(self, model: MindMapModel, graphics, center_x, center_y):
-        """全体のレイアウトを計算し、各ノードの座標を決定する"""
-        root = model.root
-        self.calculate_subtree_height(root, graphics)
+        """全体（ホイスト中はそのサブツリー）のレイアウトを計算し、各ノードの座標を決定する"""
+        root = self.layout_root(model)
+        self.assign_render_attributes(root, graphics)
+        with tracer.span("LayoutEngine.calculate_subtree_height"):
+            self.calculate_subtree_height(root, graphics)
+        
+        root.x = center_x
+        root.y = center_y
         
+        r_groups, l_groups = self._layout_root_children(root)
+
+        # キーボード移動用の隣接表（画面上の上から順: 上部・中央・下部セクター）
+        self.nav_graph = build_navigation_graph(
+            root,
+            r_groups[0] + r_groups[2] + r_groups[1],
+            l_groups[0] + l_groups[2] + l_groups[1],
+            self.is_expanded,
+            self.laid_out_children,
+        )
+
+    def layout_steps(self, model: MindMapModel, graphics, center_x, center_y, batch_nodes: int):
+        """apply_layout と同じ計算を、batch_nodes 個のノードを処理するごとに中断しながら行うジェネレーター
+
+        段階表示で、全体のレイアウトをイベント処理の合間に少しずつ進めるために使う。
+        中断している間にツリーを変更した場合は、変更前の子の一覧をたどり続けるため、続きを実行せずに破棄すること。
+        """
+        batches = Batches(batch_nodes)
+        root = self.layout_root(model)
+        yield from self._render_attribute_steps(root, graphics, batches)
+        yield from self._measure_steps(root, graphics, batches)
         root.x = center_x
         root.y = center_y
+        r_groups, l_groups = yield from self._place_root_children(root, True, batches)
+        self.nav_graph = yield from navigation_graph_steps(
+            root,
+            r_groups[0] + r_groups[2] + r_groups[1],
+            l_groups[0] + l_groups[2] + l_groups[1],
+            self.is_expanded,
+            self.laid_out_children,
+            batches,
+        )
+
+    def _layout_root_children(self, root: Node, recursive: bool = True):
+        """ルートの子ノードを左右・上中下のセクターに分けて配置する"""
+        return run_steps(self._place_root_children(root, recursive, Batches()))
+
+    def _place_root_children(self, root: Node, recursive: bool, batches: Batches):
+        center_x, center_y = root.x, root.y
         
         # ルートの子ノードを左右に分ける
-        right_all = [c for c in root.children if c.direction != 'left']
-        left_all = [c for c in root.children if c.direction == 'left']
+        children = self.laid_out_children(root)
+        right_all = [c for c in children if c.side == 'right']
+        left_all = [c for c in children if c.side == 'left']
         
         r_groups = self._group_and_sort(right_all)
         l_groups = self._group_and_sort(left_all)
@@ -48,42 +167,107 @@ class LayoutEngine:
             
             # 1. 中央セクター
             if groups[2]:
-                self._layout_branch(groups[2], center_x, center_y, side)
+                yield from self._branch_steps(groups[2], center_y, side, recursive, batches)
             
             # 2. 上部セクター
             if groups[0]:
                 h_top = self._get_group_height(groups[0])
                 # 中央境界よりさらに上に配置
                 start_y_top = center_y - mid_boundary - self.v_gap - h_top/2
-                self._layout_branch(groups[0], center_x, start_y_top, side)
+                yield from self._branch_steps(groups[0], start_y_top, side, recursive, batches)
                 
             # 3. 下部セクター
             if groups[1]:
                 h_btm = self._get_group_height(groups[1])
                 # 中央境界よりさらに下に配置
                 start_y_btm = center_y + mid_boundary + self.v_gap + h_btm/2
-                self._layout_branch(groups[1], center_x, start_y_btm, side)
+                yield from self._branch_steps(groups[1], start_y_btm, side, recursive, batches)
+        
+        return r_groups, l_groups
+
+    def assign_render_attributes(self, root: Node, graphics):
+        """系統色・サイド・セクター・深さを全ノードについて一度の走査で計算する"""
+        run_steps(self._render_attribute_steps(root, graphics, Batches()))
+
+    def _render_attribute_steps(self, root: Node, graphics, batches: Batches):
+        root.depth = 0
+        root.side = None
+        root.sector = 0
+        root.branch_color = graphics.root_outline
+
+        side_counts = {'left': 0, 'right': 0}
+        # ホイストしたノードの子は方向を持たないため、前半を右・後半を左に振り分ける
+        right_count = (len(root.children) + 1) // 2
+        for i, child in enumerate(root.children):
+            if root.parent is None:
+                side = 'left' if child.direction == 'left' else 'right'
+            else:
+                side = 'right' if i < right_count else 'left'
+            child.side = side
+            # サイド内のインデックスに基づいて3つのセクター（上・下・中）に振り分ける
+            child.sector = side_counts[side] % 3
+            side_counts[side] += 1
+            child.branch_color = graphics.branch_colors[i % len(graphics.branch_colors)]
+            child.depth = 1
+
+        stack = list(self.laid_out_children(root))
+        for child in stack:
+            if isinstance(child, Placeholder):
+                # ルートのプレースホルダーは右側の上部（前の子）・下部（後の子）に置く
+                child.side = 'right'
+                child.sector = 0 if child.kind == "before" else 1
+                child.branch_color = graphics.root_outline
+                child.depth = 1
+
+        # 表示範囲外の子孫は、表示される時点のレイアウトで計算する
+        while stack:
+            node = stack.pop()
+            for child in self.laid_out_children(node):
+                child.side = node.side
+                child.sector = node.sector
+                child.branch_color = node.branch_color
+                child.depth = node.depth + 1
+                stack.append(child)
+                if batches.tick(): yield
 
     def _group_and_sort(self, nodes: List[Node]) -> dict:
         """ルート直下の子ノードを上下中の3つのグループに分ける"""
         # 0:上, 1:下, 2:中
         groups = {0: [], 1: [], 2: []}
-        for i, n in enumerate(nodes):
-            # サイド内のインデックスに基づいて3つのセクター（上・下・中）に振り分ける
-            groups[i % 3].append(n)
+        for n in nodes:
+            groups[n.sector].append(n)
         return groups
 
     def _get_group_height(self, nodes: List[Node]) -> float:
         if not nodes: return 0
         return sum(n.subtree_height for n in nodes) + self.spacing_y * (len(nodes) - 1)
 
-    def _layout_branch(self, nodes, parent_x, start_y, direction):
+    def _layout_branch(self, nodes, parent_x, start_y, direction, recursive=True):
+        """兄弟グループを start_y を中心に縦に並べ、recursive なら子孫のグループも前順に配置する
+
+        子のグループの位置は親の座標だけで決まるため、親を配置した後に前順でたどればよい。
+        """
+        run_steps(self._branch_steps(nodes, start_y, direction, recursive, Batches()))
+
+    def _branch_steps(self, nodes, start_y, direction, recursive: bool, batches: Batches):
+        self._stack_group(nodes, start_y, direction)
+        if not recursive:
+            return
+        collapsed = lambda n: not self.is_expanded(n)
+        for top in nodes:
+            for node in preorder(top, self.laid_out_children, collapsed):
+                if node.children and self.is_expanded(node):
+                    self._stack_group(self.laid_out_children(node), node.y, direction)
+                if batches.tick(): yield
+
+    def _stack_group(self, nodes, start_y, direction):
+        """兄弟のノードだけを配置する（子孫は動かさない）"""
         if not nodes:
             return
-            
+
         total_height = sum(n.subtree_height for n in nodes) + self.spacing_y * (len(nodes) - 1)
         current_y = start_y - total_height / 2
-        
+
         for node in nodes:
             # 水平位置の決定: 親の端から一定距離離れた場所に配置
             p = node.parent
@@ -91,11 +275,140 @@ class LayoutEngine:
                 node.x = p.x + p.width/2 + self.h_margin + node.width/2
             else:
                 node.x = p.x - p.width/2 - self.h_margin - node.width/2
-                
+
             node.y = current_y + node.subtree_height / 2
-            
-            # 孫以降の再帰配置
-            if node.children and not node.collapsed:
-                self._layout_branch(node.children, node.x, node.y, direction)
-            
             current_y += node.subtree_height + self.spacing_y
+
+    def preview_child_position(self, model: MindMapModel, parent: Node, node: Node) -> Tuple[float, float, str, int]:
+        """node を parent の子の末尾へ移動した場合の (x, y, サイド, セクター) を、ツリーを変更せずに求める
+
+        ドラッグ中の移動先の影の表示用。兄弟のサイズは現在のレイアウトのまま、parent からの相対位置を
+        兄弟を積み上げる配置（_stack_group と同じ計算）で求める。node が parent のサブツリー内から
+        移動する場合（兄弟のサイズが変わる）と、折りたたまれた parent（移動で展開される）では近似になる。
+        """
+        siblings = [c for c in self.laid_out_children(parent) if c is not node] if self.is_expanded(parent) else []
+        height = node.subtree_height
+        if parent.depth == 0:
+            if parent.parent is None:
+                side = 'left' if model.get_balanced_direction(exclude_node=node) == 'left' else 'right'
+            else:
+                # ホイストしたノードの子は前半が右・後半が左（_render_attribute_steps と同じ振り分け）
+                count = len(parent.children) + 1
+                side = 'right' if count - 1 < (count + 1) // 2 else 'left'
+            sector = sum(1 for c in parent.children if c is not node and c.side == side) % 3
+            groups = self._group_and_sort([c for c in siblings if c.side == side])
+            group = groups[sector]
+            total = self._get_group_height(group) + (self.spacing_y if group else 0) + height
+            mid_boundary = max(parent.height / 2, self._get_group_height(groups[2]) / 2)
+            if sector == 0:
+                y = parent.y - mid_boundary - self.v_gap - height / 2
+            elif sector == 1:
+                y = parent.y + mid_boundary + self.v_gap + total - height / 2
+            else:
+                y = parent.y + total / 2 - height / 2
+        else:
+            side, sector = parent.side, parent.sector
+            total = self._get_group_height(siblings) + (self.spacing_y if siblings else 0) + height
+            y = parent.y + total / 2 - height / 2
+
+        if side == 'right':
+            x = parent.x + parent.width/2 + self.h_margin + node.width/2
+        else:
+            x = parent.x - parent.width/2 - self.h_margin - node.width/2
+        return x, y, side, sector
+
+    def reflow_node(self, node: Node, width, height):
+        """1つのノードのサイズ変更を、全体を再計測せずに既存のレイアウトへ反映する
+
+        サイズが変わったノードから祖先をたどって subtree_height を更新し、
+        影響のある兄弟グループだけを再配置する。兄弟のサブツリーは内部の配置を
+        保ったまま平行移動する。
+        戻り値は (座標が再計算された経路上のノード, [(平行移動したサブツリーの根, dx, dy)])。
+        段階表示の途中では全体の配置が確定していないため、再配置せずNoneを返す。
+        """
+        if self.depth_limit is not None:
+            return None
+        node.width, node.height = width, height
+        # 編集中のテキストで計測したサイズのため、次の全体レイアウトでは経路上を計測し直す
+        curr = node
+        while curr is not None:
+            curr._layout_key = None
+            curr = curr.parent
+
+        # 1. subtree_height を変化がなくなるまで祖先方向へ更新
+        old_height = node.subtree_height
+        self._update_subtree_height(node)
+        changed = node.subtree_height != old_height
+        start = self.layout_parent(node) or node
+        curr = self.layout_parent(node)
+        while changed and curr is not None:
+            start = curr
+            old_height = curr.subtree_height
+            self._update_subtree_height(curr)
+            changed = curr.subtree_height != old_height
+            curr = self.layout_parent(curr)
+
+        path = []
+        curr = node
+        while curr is not start:
+            path.append(curr)
+            curr = curr.parent
+        path.append(start)
+        path.reverse()
+
+        # 2. 経路を上から順に、子グループだけを再配置する
+        moves = []
+        for i, parent in enumerate(path):
+            if not parent.children or parent.collapsed:
+                continue
+            next_on_path = path[i + 1] if i + 1 < len(path) else None
+            children = self.laid_out_children(parent)
+            old_pos = {c.id: (c.x, c.y) for c in children}
+            if parent.depth == 0:
+                self._layout_root_children(parent, recursive=False)
+            else:
+                self._layout_branch(children, parent.x, parent.y, parent.side, recursive=False)
+            for child in children:
+                if child is next_on_path:
+                    continue
+                ox, oy = old_pos[child.id]
+                dx, dy = child.x - ox, child.y - oy
+                if dx or dy:
+                    self._translate_descendants(child, dx, dy)
+                    moves.append((child, dx, dy))
+
+        if self.nav_graph is not None:
+            self.nav_graph.invalidate_positions()
+        return path[1:] or path, moves
+
+    def _update_subtree_height(self, node: Node):
+        """子の subtree_height が確定している前提で、1ノード分だけ再計算する"""
+        if not node.children or node.collapsed:
+            node.subtree_height = node.height
+        else:
+            children = self.laid_out_children(node)
+            total_height = sum(c.subtree_height for c in children)
+            total_height += self.spacing_y * (len(children) - 1)
+            node.subtree_height = max(node.height, total_height)
+
+    def _translate_descendants(self, node: Node, dx, dy):
+        """表示中の子孫の座標を平行移動する"""
+        stack = [] if node.collapsed else list(self.laid_out_children(node))
+        while stack:
+            n = stack.pop()
+            n.x += dx
+            n.y += dy
+            if not n.collapsed:
+                stack.extend(self.laid_out_children(n))
+
+def _hash_steps(root: Node, batches: Batches):
+    """未計算の内容ハッシュを、子から順に1ノードずつ求める（計算済みのサブツリーはたどらない）"""
+    order = []
+    for node in preorder(root, prune=lambda n: n._hash is not None):
+        if node._hash is None:
+            order.append(node)
+        if batches.tick(): yield
+    # 子のハッシュが揃っていれば、content_hash はそのノードの分だけを計算する
+    for node in reversed(order):
+        node.content_hash()
+        if batches.tick(): yield
@@ -0,0 +1,110 @@
+import json
+import os
+from typing import Optional
+from models import MindMapModel
+from traversal import visible
+
+# ファイルの横に保存するレイアウトのキャッシュ（<ファイル名>.layout）。
+# 文書の内容のハッシュ・フォント設定・レイアウト方式が一致する場合に限り、次回の読み込み時に
+# テキストを計測し直さずにノードのサイズ・subtree_height・座標を復元する。
+#   {"key": {...}, "windows": {node_id: [先頭の位置, 件数]}, "geometry": [幅, 高さ, subtree_height, x, y, ...]}
+# geometry は配置されるノード（プレースホルダーを含む）を前順にたどった順に並べる。
+# 内容のハッシュが同じならツリーの形も同じため、ノードIDは保存しない。
+
+LAYOUT_CACHE_VERSION = 1 # 保存形式・レイアウトの計算方法を変えたら上げる
+SUFFIX = ".layout"
+_FIELDS = 5
+
+def cache_path(file_path: str) -> str:
+    return file_path + SUFFIX
+
+def cache_key(model: MindMapModel, layout_engine, graphics) -> dict:
+    return {
+        "version": LAYOUT_CACHE_VERSION,
+        "engine": type(layout_engine).__name__,
+        "spacing": [layout_engine.h_margin, layout_engine.v_gap, layout_engine.spacing_y],
+        "page_size": layout_engine.child_windows.page_size if layout_engine.child_windows else None,
+        "fonts": graphics.font_signature(),
+        "content": model.content_hash().hex(),
+    }
+
+def _laid_out_nodes(root, layout_engine):
+    """配置されるノードを前順に返す"""
+    return list(visible(root, layout_engine.is_expanded, layout_engine.laid_out_children))
+
+def save_layout_cache(file_path: str, model: MindMapModel, layout_engine, graphics) -> bool:
+    """現在のレイアウトを保存する（段階表示・ホイストの途中など、全体が配置されていない場合は保存しない）"""
+    if layout_engine.depth_limit is not None or layout_engine.hoisted is not None:
+        return False
+    geometry = []
+    for node in _laid_out_nodes(model.root, layout_engine):
+        if node._layout_key is None:
+            return False # 編集中などで計測し直す予定のノードがある
+        geometry.extend((node.width, node.height, node.subtree_height, node.x, node.y))
+    windows = layout_engine.child_windows
+    data = {
+        "key": cache_key(model, layout_engine, graphics),
+        "windows": windows.snapshot() if windows else {},
+        "geometry": geometry,
+    }
+    path = cache_path(file_path)
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    except OSError:
+        discard_layout_cache(file_path)
+        return False
+    return True
+
+def restore_layout_cache(file_path: str, model: MindMapModel, layout_engine, graphics) -> Optional[list]:
+    """キャッシュが現在の文書・設定と一致すれば、レイアウト結果を各ノードへ復元する
+
+    復元したノードは次の全体レイアウトで計測を省く（内容のハッシュによる記録を設定する）。
+    戻り値は復元したノードの一覧。一致しない・壊れたキャッシュは削除してNoneを返す。
+    """
+    try:
+        with open(cache_path(file_path), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        discard_layout_cache(file_path)
+        return None
+
+    # 配置されるノードは表示範囲によって決まるため、表示範囲を仮に置き換えてからキャッシュ全体を
+    # 確かめ、一致しなければ元の表示範囲に戻す（壊れたキャッシュで表示範囲だけが変わらないようにする）
+    windows = layout_engine.child_windows
+    previous = windows.snapshot() if windows is not None else None
+    try:
+        if data["key"] != cache_key(model, layout_engine, graphics):
+            raise ValueError("stale layout cache")
+        if windows is not None:
+            windows.restore(data["windows"])
+        nodes = _laid_out_nodes(model.root, layout_engine)
+        geometry = data["geometry"]
+        if len(geometry) != len(nodes) * _FIELDS:
+            raise ValueError("layout cache does not match the tree")
+        if not all(type(value) in (int, float) for value in geometry):
+            raise ValueError("invalid layout cache geometry")
+    except (KeyError, TypeError, ValueError):
+        if windows is not None:
+            windows.restore(previous)
+        discard_layout_cache(file_path)
+        return None
+
+    layout_engine.assign_render_attributes(model.root, graphics)
+    layout_engine.nav_graph = None # 前の文書の隣接表は使わない（次の全体レイアウトで作る）
+    for i, node in enumerate(nodes):
+        j = i * _FIELDS
+        node.width, node.height, node.subtree_height, node.x, node.y = geometry[j:j + _FIELDS]
+        node._layout_key = layout_engine.layout_key(node, graphics)
+    return nodes
+
+def discard_layout_cache(file_path: str):
+    for path in (cache_path(file_path), cache_path(file_path) + ".tmp"):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
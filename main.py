@@ -1,10 +1,46 @@
+import argparse
+import sys
+import time
 import tkinter as tk
 from view import MindMapView
+from history import UndoHistory
+from tracing import install_dump_signal
 
 def main():
+    start = time.perf_counter()
+    parser = argparse.ArgumentParser(description="pymind - Python Mind Map Tool")
+    parser.add_argument("file", nargs="?", help="起動時に開くファイル（.json / .txt / .md / .opml）")
+    parser.add_argument("--timing", action="store_true", help="起動から各描画段階までの時間を表示する")
+    parser.add_argument("--trace", action="store_true",
+                        help="処理時間の記録を有効にする（表示メニューまたは SIGUSR1 で書き出し）")
+    parser.add_argument("--sync", metavar="ADDRESS",
+                        help="同期用リレー（relay.py）のアドレス。host:port または unix:パス")
+    parser.add_argument("--undo-depth", type=int, default=UndoHistory.DEFAULT_DEPTH, metavar="N",
+                        help=f"元に戻せる操作の回数（既定: {UndoHistory.DEFAULT_DEPTH}）")
+    parser.add_argument("--record", metavar="FILE",
+                        help="操作を記録する（replay.py で再生して応答時間を計測できる）")
+    args = parser.parse_args()
+
+    def report(stage):
+        if args.timing:
+            print(f"[timing] {stage}: {(time.perf_counter() - start) * 1000:.1f} ms", file=sys.stderr)
+
     root = tk.Tk()
     root.geometry("1000x800")
-    app = MindMapView(root)
+    app = MindMapView(root, undo_depth=args.undo_depth)
+    if args.trace:
+        app.set_tracing(True)
+    if args.file:
+        # ルートと第1階層を先に描画し、深い階層はアイドル時に段階的に追加する
+        app.open_file(args.file, on_progress=report)
+    else:
+        app.scheduler.after_frame(lambda: report("first_frame"))
+    if args.sync:
+        app.start_sync(args.sync)
+    if args.record:
+        # 読み込んだ文書を記録の先頭に含めるため、描画が揃ってから記録を始める
+        app.scheduler.after_frame(lambda: app.start_recording(args.record))
+    install_dump_signal(lambda path: print(f"[trace] {path}", file=sys.stderr))
     root.mainloop()
 
 if __name__ == "__main__":
@@ -1,13 +1,47 @@
+import hashlib
+import os
 import uuid
-from typing import List, Optional
+from contextlib import contextmanager
+from typing import Iterable, List, Optional
+from child_list import ChildList
+from events import (AttributesChanged, BatchBegin, BatchEnd, CollapsedToggled, ModelLoaded, NodeAdded,
+                    NodeMoved, NodeRemoved, TextChanged)
+from traversal import find, postorder, preorder
+
+# uuid4 のバージョン(4)とバリアント(RFC 4122)のビット
+_UUID4_MASK = ~((0xf000 << 64) | (0xc000 << 48)) & ((1 << 128) - 1)
+_UUID4_BITS = (0x4000 << 64) | (0x8000 << 48)
+
+def new_node_ids(count: int) -> List[str]:
+    """uuid4 と同じ形式のIDをまとめて生成する（乱数は os.urandom で一度に取得する）"""
+    raw = os.urandom(16 * count)
+    from_bytes = int.from_bytes
+    ids = []
+    for i in range(0, 16 * count, 16):
+        h = '%032x' % (from_bytes(raw[i:i + 16], 'big') & _UUID4_MASK | _UUID4_BITS)
+        ids.append(f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}")
+    return ids
 
 class Node:
     """マインドマップの単一のトピックを表すクラス"""
-    def __init__(self, text: str, parent: Optional['Node'] = None):
-        self.id = str(uuid.uuid4())
+    def __init__(self, text: str, parent: Optional['Node'] = None, node_id: Optional[str] = None):
+        # 内容のハッシュ（Noneは未計算）。変更時は祖先方向へ破棄し、必要になった時点で計算し直す
+        self._hash: Optional[bytes] = None
+        self.id = node_id or str(uuid.uuid4())
         self.text = text
         self.parent = parent
-        self.children: List['Node'] = []
+        self.children: ChildList = ChildList() # list互換（位置の検索・挿入・削除がO(log n)）
+        self._in_parent = False # 親の children に登録済みか（集計値の伝播に使用）
+
+        # サブツリーの集計値（追加・削除・移動・折りたたみ時に祖先方向へO(深さ)で更新）
+        self.descendant_count = 0  # 子孫ノードの総数
+        self.max_depth = 0         # サブツリーの深さ（葉は0）
+        self.right_child_count = 0 # 方向が右（'left'以外）の子の数
+        self.left_child_count = 0  # 方向が左の子の数
+        self._expanded_visible = 1 # 自身が展開されている場合の表示ノード数
+        self._depth_counts = None  # 子サブツリーの深さ -> 子の数
+
+        self._direction = None
         self.direction = None  # 'left' or 'right' (主にルートの子ノードで使用)
         
         # UI表示用のプロパティ
@@ -16,9 +50,158 @@ class Node:
         self.width = 100
         self.height = 40
         self.color = None
-        self.collapsed = False
+        self._collapsed = False
+        self._layout_key = None # 前回レイアウトした時の (内容のハッシュ, 計測方法, ...)。一致すればサブツリーの再計測を省く
+
+        # レイアウト時に一括計算される描画用の属性
+        self.depth = 0
+        self.side = None         # 'left' or 'right' (ルートはNone)
+        self.sector = 0          # ルートの子のサイド内セクター (0:上, 1:下, 2:中)
+        self.branch_color = None # 系統色
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    @text.setter
+    def text(self, text: str):
+        self._text = text
+        self._invalidate_hash()
+
+    @property
+    def color(self) -> Optional[str]:
+        return self._color
+
+    @color.setter
+    def color(self, color: Optional[str]):
+        self._color = color
+        self._invalidate_hash()
+
+    @property
+    def direction(self) -> Optional[str]:
+        return self._direction
+
+    @direction.setter
+    def direction(self, direction: Optional[str]):
+        if self._in_parent and (direction == 'left') != (self._direction == 'left'):
+            delta = 1 if direction == 'left' else -1
+            self.parent.left_child_count += delta
+            self.parent.right_child_count -= delta
+        self._direction = direction
+        self._invalidate_hash()
+
+    @property
+    def collapsed(self) -> bool:
+        return self._collapsed
+
+    @collapsed.setter
+    def collapsed(self, collapsed: bool):
+        collapsed = bool(collapsed)
+        if collapsed == self._collapsed:
+            return
+        self._collapsed = collapsed
+        self._invalidate_hash()
+        # 表示ノード数は「折りたたみ中なら1」なので、その差分を祖先へ伝える
+        delta = self._expanded_visible - 1
+        if self._in_parent:
+            self.parent._add_counts(0, -delta if collapsed else delta)
+
+    @property
+    def visible_count(self) -> int:
+        """自身を含む、サブツリー内の表示中ノード数"""
+        return 1 if self._collapsed else self._expanded_visible
+
+    @property
+    def side_counts(self) -> dict:
+        """方向別の子ノード数"""
+        return {'right': self.right_child_count, 'left': self.left_child_count}
+
+    def _invalidate_hash(self):
+        """自身と祖先のハッシュを破棄する（未計算のノードの祖先は必ず未計算なので、そこで止める）
 
-    def add_child(self, text: str, direction: Optional[str] = None) -> 'Node':
+        内容が元に戻ってもノード自体は入れ替わっている場合があるため、レイアウトの記録も併せて破棄する。
+        """
+        node = self
+        while node is not None and node._hash is not None:
+            node._hash = None
+            node._layout_key = None
+            node = node.parent if node._in_parent else None
+
+    def content_hash(self) -> bytes:
+        """テキスト・方向・色・折りたたみ状態と子のハッシュ（順序どおり）から求めたサブツリーのハッシュ
+
+        IDは含まないため、内容が同じであれば別々に作られたツリーでも一致する。
+        計算済みの部分は再利用し、変更のあった経路だけを後順に計算し直す。
+        """
+        if self._hash is not None:
+            return self._hash
+        stack = [(self, False)]
+        while stack:
+            node, ready = stack.pop()
+            if not ready:
+                stack.append((node, True))
+                stack.extend((c, False) for c in node.children if c._hash is None)
+                continue
+            h = hashlib.blake2b(repr((node._text, node._direction, node._color, node._collapsed)).encode(),
+                                digest_size=16)
+            for child in node.children:
+                h.update(child._hash)
+            node._hash = h.digest()
+        return self._hash
+
+    def _add_counts(self, d_desc: int, d_visible: int):
+        """子孫数・表示ノード数の差分を自身から祖先へ伝播させる"""
+        node = self
+        while node is not None:
+            node.descendant_count += d_desc
+            if d_visible:
+                node._expanded_visible += d_visible
+                if node._collapsed:
+                    d_visible = 0 # 折りたたまれた祖先より上の表示数は変わらない
+            if not d_desc and not d_visible:
+                break
+            node = node.parent if node._in_parent else None
+
+    def _child_depth_changed(self, old: Optional[int], new: Optional[int]):
+        """子サブツリーの深さ（子のmax_depth+1）の変化を反映し、必要なら祖先へ伝播させる"""
+        node = self
+        while node is not None:
+            counts = node._depth_counts
+            if counts is None:
+                counts = node._depth_counts = {}
+            if old is not None:
+                remaining = counts[old] - 1
+                if remaining: counts[old] = remaining
+                else: del counts[old]
+            if new is not None:
+                counts[new] = counts.get(new, 0) + 1
+
+            prev = node.max_depth
+            node.max_depth = max(counts) if counts else 0
+            if node.max_depth == prev or not node._in_parent:
+                break
+            old, new = prev + 1, node.max_depth + 1
+            node = node.parent
+
+    # 親子の付け替えは MindMapModel のメソッドからだけ行う（変更をイベントとして通知するため）
+
+    def _attach_child(self, child: 'Node', index: Optional[int] = None):
+        """切り離されたノード（とそのサブツリー）を子として追加する"""
+        child.parent = self
+        if index is None:
+            self.children.append(child)
+        else:
+            self.children.insert(index, child)
+        child._in_parent = True
+        if child._direction == 'left':
+            self.left_child_count += 1
+        else:
+            self.right_child_count += 1
+        self._invalidate_hash()
+        self._add_counts(child.descendant_count + 1, child.visible_count)
+        self._child_depth_changed(None, child.max_depth + 1)
+
+    def _add_child(self, text: str, direction: Optional[str] = None) -> 'Node':
         child = Node(text, parent=self)
         if direction:
             child.direction = direction
@@ -26,35 +209,53 @@ class Node:
             # 親の方向を継承
             child.direction = self.direction
         child.color = self.color # 親の色を継承
-        self.children.append(child)
+        self._attach_child(child)
         return child
 
-    def remove_child(self, node: 'Node'):
-        if node in self.children:
-            self.children.remove(node)
-
-    def move_to(self, new_parent: 'Node'):
-        """このノードを新しい親ノードの下に移動する"""
-        if self.parent:
-            self.parent.remove_child(self)
-        self.parent = new_parent
-        new_parent.children.append(self)
-        self.color = new_parent.color # 移動した先の親の色を継承
-        # 方向は新しい親の方向を引き継ぐか、ルート直下なら再計算が必要だが
-        if new_parent.parent is None: # ルート直下への移動
-             self.direction = None # 再計算させる
+    def _remove_child(self, node: 'Node'):
+        if node.parent is not self or not node._in_parent:
+            return
+        self.children.remove(node)
+        node._in_parent = False
+        self._invalidate_hash()
+        if node._direction == 'left':
+            self.left_child_count -= 1
         else:
-             self.direction = new_parent.direction
-        
-        # 移動先の親が折りたたまれている場合は展開する
-        if new_parent.collapsed:
-            new_parent.collapsed = False
+            self.right_child_count -= 1
+        self._add_counts(-(node.descendant_count + 1), -node.visible_count)
+        self._child_depth_changed(node.max_depth + 1, None)
+
+    def index_in_parent(self) -> int:
+        """親の children の中での位置（ルートは-1）"""
+        if self.parent is None or not self._in_parent:
+            return -1
+        return self.parent.children.index(self)
 
-    def update_direction_recursive(self, direction):
-        """ノードとその子孫の方向を再帰的に更新"""
-        self.direction = direction
-        for child in self.children:
-            child.update_direction_recursive(direction)
+    def recompute_aggregates(self):
+        """サブツリー全体の集計値を後順走査で一括して計算し直す（読み込み時など）"""
+        for node in postorder(self):
+            desc, expanded, right, left = 0, 1, 0, 0
+            depth_counts = {}
+            for child in node.children:
+                child.parent = node
+                child._in_parent = True
+                desc += child.descendant_count + 1
+                expanded += child.visible_count
+                if child._direction == 'left': left += 1
+                else: right += 1
+                d = child.max_depth + 1
+                depth_counts[d] = depth_counts.get(d, 0) + 1
+            node.descendant_count = desc
+            node._expanded_visible = expanded
+            node.right_child_count = right
+            node.left_child_count = left
+            node._depth_counts = depth_counts or None
+            node.max_depth = max(depth_counts) if depth_counts else 0
+
+    def _update_direction_recursive(self, direction):
+        """ノードとその子孫の方向を更新する（明示的なスタックで走査する）"""
+        for node in preorder(self):
+            node.direction = direction
 
     def is_descendant_of(self, potential_ancestor):
         """このノードが指定したノードの子孫かどうかをチェック"""
@@ -65,34 +266,132 @@ class Node:
             curr = curr.parent
         return False
 
+    def clone(self, direction=...) -> 'Node':
+        """サブツリーを新しいIDで複製する（親からは切り離された状態）
+
+        明示的なスタックで1回だけ走査し、IDはまとめて生成する。集計値は構造が同じため複製元からコピーする。
+        direction を指定するとサブツリー全体の方向をその値にする。
+        """
+        ids = new_node_ids(self.descendant_count + 1)
+        next_id = iter(ids).__next__
+        override = direction is not ...
+
+        root = Node(self.text, node_id=next_id())
+        stack = [(self, root)]
+        while stack:
+            src, dst = stack.pop()
+            dst._direction = direction if override else src._direction
+            dst.color = src.color
+            dst._collapsed = src._collapsed
+            dst._hash = None if override else src._hash # 内容が同じためハッシュもそのまま使える
+            dst.descendant_count = src.descendant_count
+            dst.max_depth = src.max_depth
+            dst._expanded_visible = src._expanded_visible
+            dst._depth_counts = dict(src._depth_counts) if src._depth_counts else None
+            if override:
+                n = len(src.children)
+                dst.left_child_count, dst.right_child_count = (n, 0) if direction == 'left' else (0, n)
+            else:
+                dst.left_child_count = src.left_child_count
+                dst.right_child_count = src.right_child_count
+
+            children = []
+            for child in src.children:
+                copy = Node(child.text, dst, next_id())
+                copy._in_parent = True
+                children.append(copy)
+                stack.append((child, copy))
+            dst.children.extend(children)
+        return root
+
     def to_dict(self) -> dict:
-        """シリアライズ用の辞書変換"""
+        """シリアライズ用の辞書変換（深いツリーでも再帰しないよう、明示的なスタックで組み立てる）"""
+        result = self._shallow_dict()
+        stack = [(self, result)]
+        while stack:
+            node, data = stack.pop()
+            children = data["children"]
+            for child in node.children:
+                child_data = child._shallow_dict()
+                children.append(child_data)
+                stack.append((child, child_data))
+        return result
+
+    def _shallow_dict(self) -> dict:
         return {
             "id": self.id,
             "text": self.text,
             "direction": self.direction,
             "color": self.color,
             "collapsed": self.collapsed,
-            "children": [child.to_dict() for child in self.children]
+            "children": []
         }
 
     @classmethod
     def from_dict(cls, data: dict, parent: Optional['Node'] = None) -> 'Node':
-        """辞書からの復元"""
+        """辞書からの復元（to_dict と同じく明示的なスタックで組み立てる）"""
+        root = cls._from_shallow_dict(data, parent)
+        stack = [(data, root)]
+        while stack:
+            node_data, node = stack.pop()
+            children = []
+            for child_data in node_data.get("children", []):
+                child = cls._from_shallow_dict(child_data, node)
+                children.append(child)
+                stack.append((child_data, child))
+            node.children.extend(children)
+        if parent is None:
+            root.recompute_aggregates()
+        return root
+
+    @classmethod
+    def _from_shallow_dict(cls, data: dict, parent: Optional['Node']) -> 'Node':
         node = cls(data["text"], parent=parent)
         node.id = data.get("id", str(uuid.uuid4()))
         node.direction = data.get("direction")
         node.color = data.get("color")
         node.collapsed = data.get("collapsed", False)
-        for child_data in data.get("children", []):
-            child = cls.from_dict(child_data, parent=node)
-            node.children.append(child)
         return node
 
 class MindMapModel:
-    """マインドマップ全体を管理するモデル"""
+    """マインドマップ全体を管理するモデル
+
+    ツリーの変更はすべてこのクラスのメソッドを通して行い、変更ごとに events モジュールの
+    イベントを購読者へ通知する（再描画・同期・保存状態の管理などで使用）。
+    """
     def __init__(self, root_text: str = "中心トピック"):
         self.root = Node(root_text)
+        self._subscribers = [] # (handler, 対象のイベントの型のタプル。空ならすべて)
+        self._batch_depth = 0
+
+    def subscribe(self, handler, *event_types):
+        """handler(event) を登録する。イベントの型を指定した場合はそれらだけを通知する"""
+        self._subscribers.append((handler, event_types))
+
+    def unsubscribe(self, handler):
+        self._subscribers = [s for s in self._subscribers if s[0] != handler]
+
+    def _publish(self, event):
+        for handler, event_types in list(self._subscribers):
+            if not event_types or isinstance(event, event_types):
+                handler(event)
+
+    @contextmanager
+    def batch(self):
+        """with文で囲んだ変更をひとまとまりとして BatchBegin / BatchEnd で囲んで通知する"""
+        self._batch_depth += 1
+        if self._batch_depth == 1:
+            self._publish(BatchBegin())
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self._publish(BatchEnd())
+
+    @property
+    def in_batch(self) -> bool:
+        return self._batch_depth > 0
 
     def add_node(self, parent_node: Node, text: str = "新規トピック") -> Node:
         """指定したノードに子ノードを追加する。ルート直下の場合は方向を自動調整する。"""
@@ -100,33 +399,182 @@ class MindMapModel:
         if parent_node == self.root:
             direction = self.get_balanced_direction()
         
-        return parent_node.add_child(text, direction)
+        child = parent_node._add_child(text, direction)
+        self._publish(NodeAdded(child, parent_node, len(parent_node.children) - 1))
+        return child
+
+    # --- 差分の適用・同期などで使う基本操作 ---
+
+    def insert_subtree(self, parent: Node, node: Node, index: Optional[int] = None):
+        """切り離されたノード（とそのサブツリー）を parent の index 番目（省略時は末尾）の子として追加する"""
+        node.parent = parent
+        parent._attach_child(node, index)
+        self._publish(NodeAdded(node, parent, len(parent.children) - 1 if index is None else index))
+
+    def remove_subtree(self, node: Node) -> int:
+        """ノードをサブツリーごと親から切り離し、切り離す前の位置を返す"""
+        parent = node.parent
+        index = node.index_in_parent()
+        parent._remove_child(node)
+        self._publish(NodeRemoved(node, parent, index))
+        return index
+
+    def relocate_subtree(self, node: Node, parent: Node, index: Optional[int] = None,
+                         direction=..., color=...):
+        """ノードをサブツリーごと parent の index 番目（省略時は末尾）の子へ移動する
+
+        direction を指定した場合はサブツリー全体の方向を、color を指定した場合はノードの色を変更する。
+        """
+        old_parent = node.parent if node._in_parent else None
+        old_index = node.index_in_parent()
+        old_direction, old_color = node.direction, node.color
+        if old_parent is not None:
+            old_parent._remove_child(node)
+        node.parent = parent
+        parent._attach_child(node, index)
+        if color is not ...:
+            node.color = color
+        if direction is not ...:
+            node._update_direction_recursive(direction)
+        self._publish(NodeMoved(node, parent, len(parent.children) - 1 if index is None else index,
+                                old_parent, old_index, old_direction, old_color))
+
+    def paste_subtrees(self, parent: Node, templates: Iterable[Node]) -> List[Node]:
+        """サブツリーを新しいIDで複製して parent の子の末尾に追加し、追加したノードを返す"""
+        pasted = []
+        with self.batch():
+            if parent.collapsed:
+                self._set_collapsed(parent, False)
+            for template in templates:
+                direction = self.get_balanced_direction() if parent is self.root else parent.direction
+                node = template.clone(direction)
+                node.color = parent.color # 移動と同じく、貼り付け先の親の色を継承
+                self.insert_subtree(parent, node)
+                pasted.append(node)
+        return pasted
+
+    def set_text(self, node: Node, text: str):
+        """ノードのテキストを変更する"""
+        if node.text == text:
+            return
+        old = node.text
+        node.text = text
+        self._publish(TextChanged(node, text, old))
+
+    def set_style(self, node: Node, direction: Optional[str], color: Optional[str]):
+        """ノード自身の方向と色を変更する（子孫の方向は変更しない）"""
+        if node.direction == direction and node.color == color:
+            return
+        old_direction, old_color = node.direction, node.color
+        node.direction = direction
+        node.color = color
+        self._publish(AttributesChanged(node, direction, color, old_direction, old_color))
 
     def get_balanced_direction(self, exclude_node: Optional[Node] = None) -> str:
         """ルートの子ノードの左右バランスを考慮した方向を返す"""
-        right_nodes = [c for c in self.root.children if c.direction != 'left' and c != exclude_node]
-        left_nodes = [c for c in self.root.children if c.direction == 'left' and c != exclude_node]
+        right_count = self.root.right_child_count
+        left_count = self.root.left_child_count
+        if exclude_node is not None and exclude_node.parent is self.root and exclude_node._in_parent:
+            if exclude_node.direction == 'left': left_count -= 1
+            else: right_count -= 1
         
-        if len(right_nodes) <= len(left_nodes):
+        if right_count <= left_count:
             return 'right'
         else:
             return 'left'
 
+    # --- 複数ノードへの一括操作（呼び出し側は最後に1回だけ再描画する） ---
+
+    @staticmethod
+    def top_level_nodes(nodes: Iterable[Node]) -> List[Node]:
+        """祖先が同じ集合に含まれるノードを除き、最上位のノードだけを順序を保って返す"""
+        nodes = list(nodes)
+        ids = {n.id for n in nodes}
+        result = []
+        for node in nodes:
+            p = node.parent
+            while p is not None and p.id not in ids:
+                p = p.parent
+            if p is None:
+                result.append(node)
+        return result
+
+    def delete_nodes(self, nodes: Iterable[Node]) -> Optional[Node]:
+        """ノードをまとめて削除し、削除後に選択すべきノード（最初に削除したノードの親）を返す"""
+        fallback = None
+        with self.batch():
+            # ルートは削除しない（選択に含まれていても他のノードは削除する）
+            for node in self.top_level_nodes(n for n in nodes if n.parent is not None):
+                if fallback is None:
+                    fallback = node.parent
+                self.remove_subtree(node)
+        return fallback
+
+    def move_nodes(self, nodes: Iterable[Node], target: Node) -> List[Node]:
+        """ノードをまとめて target の子の末尾へ移動し、移動したノードを返す"""
+        moved = []
+        with self.batch():
+            for node in self.top_level_nodes(n for n in nodes if n is not self.root):
+                if node.parent is target or target.is_descendant_of(node):
+                    continue
+                if target.collapsed:
+                    self._set_collapsed(target, False) # 移動先を展開する
+                if target is self.root:
+                    direction = self.get_balanced_direction(exclude_node=node)
+                else:
+                    direction = target.direction
+                self.relocate_subtree(node, target, direction=direction, color=target.color)
+                moved.append(node)
+        return moved
+
+    def set_collapsed(self, nodes: Iterable[Node], collapsed: bool):
+        """子を持つノードの折りたたみ状態をまとめて設定する"""
+        with self.batch():
+            for node in nodes:
+                if node.children:
+                    self._set_collapsed(node, collapsed)
+
+    def _set_collapsed(self, node: Node, collapsed: bool):
+        if node.collapsed == collapsed:
+            return
+        node.collapsed = collapsed
+        self._publish(CollapsedToggled(node, collapsed))
+
+    def expand_to_level(self, node: Node, level: int):
+        """node から level 階層下までを展開し、その深さで子を持つノードを折りたたむ"""
+        stack = [(node, 0)]
+        with self.batch():
+            while stack:
+                curr, depth = stack.pop()
+                if not curr.children:
+                    continue
+                self._set_collapsed(curr, depth >= level)
+                if not curr.collapsed:
+                    stack.extend((child, depth + 1) for child in curr.children)
+
     def find_node_by_id(self, node_id: str, current: Optional[Node] = None) -> Optional[Node]:
-        if current is None:
-            current = self.root
-        
-        if current.id == node_id:
-            return current
-        
-        for child in current.children:
-            found = self.find_node_by_id(node_id, child)
-            if found:
-                return found
-        return None
+        """current（省略時はルート）のサブツリーから前順で最初に見つかったノード"""
+        return find(self.root if current is None else current, lambda node: node.id == node_id)
 
     def save(self) -> dict:
         return self.root.to_dict()
 
+    def content_hash(self) -> bytes:
+        """マップ全体の内容のハッシュ（変更のない部分は再計算しない）"""
+        return self.root.content_hash()
+
+    def content_equals(self, other: 'MindMapModel') -> bool:
+        """2つのマップの内容（テキスト・方向・色・折りたたみ状態と構造）が同じかどうか"""
+        return self.root.content_hash() == other.root.content_hash()
+
     def load(self, data: dict):
         self.root = Node.from_dict(data)
+        self._publish(ModelLoaded(self.root))
+
+    def load_root(self, root: Node):
+        """組み立て済みのノードツリーをそのままルートとして設定する"""
+        root.parent = None
+        root._in_parent = False
+        root.recompute_aggregates()
+        self.root = root
+        self._publish(ModelLoaded(root))
@@ -1,51 +1,119 @@
+from typing import Dict, List, Optional
 from models import Node
+from traversal import Batches, run_steps
+
+class NavigationGraph:
+    """レイアウト時に作成される、表示中ノードの上下左右の隣接表"""
+    def __init__(self):
+        self.neighbors: Dict[str, Dict[str, Node]] = {}
+        self.nodes: List[Node] = []
+        self._nearest_cache: Dict[tuple, Optional[Node]] = {}
+
+    def add_node(self, node: Node):
+        self.nodes.append(node)
+        self.neighbors[node.id] = {}
+
+    def link(self, node: Node, direction: str, target: Node):
+        self.neighbors[node.id][direction] = target
+
+    def link_column(self, column: List[Node]):
+        """上から順に並んだノード列を上下に連結する"""
+        for upper, lower in zip(column, column[1:]):
+            self.neighbors[upper.id]["down"] = lower
+            self.neighbors[lower.id]["up"] = upper
+
+    def neighbor(self, node: Node, direction: str) -> Optional[Node]:
+        links = self.neighbors.get(node.id)
+        return links.get(direction) if links else None
+
+    def nearest(self, node: Node, direction: str) -> Optional[Node]:
+        """押された方向にある最も近いトピックを返す（幾何モード、結果はキャッシュ）"""
+        key = (node.id, direction)
+        if key in self._nearest_cache:
+            return self._nearest_cache[key]
+
+        best, best_score = None, None
+        for cand in self.nodes:
+            if cand is node: continue
+            dx, dy = cand.x - node.x, cand.y - node.y
+            if direction == "right": primary, secondary = dx, dy
+            elif direction == "left": primary, secondary = -dx, dy
+            elif direction == "down": primary, secondary = dy, dx
+            else: primary, secondary = -dy, dx
+            if primary <= 0: continue
+            # 進行方向の距離に対して、横ずれを重めに評価する
+            score = primary + 2 * abs(secondary)
+            if best_score is None or score < best_score:
+                best, best_score = cand, score
+
+        self._nearest_cache[key] = best
+        return best
+
+    def invalidate_positions(self):
+        """座標だけが変わった場合に幾何モードのキャッシュを破棄する"""
+        self._nearest_cache.clear()
+
+def build_navigation_graph(root: Node, right_column: List[Node], left_column: List[Node],
+                           is_expanded=None, children_of=None) -> NavigationGraph:
+    """表示中のノードを一度だけ走査して隣接表を作成する
+
+    right_column / left_column はルートの子ノードを画面上の上から順に並べたもの。
+    is_expanded を渡すと、折りたたみ状態の代わりにその判定で子をたどるかを決める。
+    children_of を渡すと、children の代わりにその戻り値（配置された子）をたどる。
+    """
+    return run_steps(navigation_graph_steps(root, right_column, left_column, is_expanded, children_of, Batches()))
+
+def navigation_graph_steps(root: Node, right_column: List[Node], left_column: List[Node],
+                           is_expanded, children_of, batches: Batches):
+    """build_navigation_graph のジェネレーター版（batches の区切りごとに中断し、最後に隣接表を返す）"""
+    if is_expanded is None:
+        is_expanded = lambda n: not n.collapsed
+    if children_of is None:
+        children_of = lambda n: n.children
+    graph = NavigationGraph()
+    graph.add_node(root)
+    if right_column: graph.link(root, "right", right_column[0])
+    if left_column: graph.link(root, "left", left_column[0])
+
+    stack = []
+    for column in (right_column, left_column):
+        for node in column:
+            graph.add_node(node)
+        graph.link_column(column)
+        stack.extend(column)
+
+    while stack:
+        node = stack.pop()
+        outward, inward = ("left", "right") if node.side == 'left' else ("right", "left")
+        graph.link(node, inward, node.parent)
+        if batches.tick(): yield
+        if not node.children or not is_expanded(node):
+            continue
+
+        children = children_of(node)
+        graph.link(node, outward, children[0])
+        for child in children:
+            graph.add_node(child)
+        graph.link_column(children)
+        stack.extend(children)
+    return graph
 
 class KeyboardNavigator:
     """キーボードによるノード間移動を管理するクラス"""
-    def __init__(self, model, render_callback):
+    def __init__(self, model, layout_engine, render_callback):
         self.model = model
+        self.layout_engine = layout_engine
         self.render_callback = render_callback
+        self.geometric = False # Trueの場合は座標上で最も近いトピックへ移動する
 
     def navigate(self, current_node, direction):
-        """左右対称レイアウトに対応したナビゲーション"""
-        curr = current_node
-        new_node = curr
-        
-        if direction == "right":
-            if curr == self.model.root:
-                right_children = [c for c in curr.children if c.direction != 'left']
-                if right_children: new_node = right_children[0]
-            elif curr.direction != 'left':
-                if curr.children: new_node = curr.children[0]
-            else:
-                if curr.parent: new_node = curr.parent
-        elif direction == "left":
-            if curr == self.model.root:
-                left_children = [c for c in curr.children if c.direction == 'left']
-                if left_children: new_node = left_children[0]
-            elif curr.direction == 'left':
-                if curr.children: new_node = curr.children[0]
-            else:
-                if curr.parent: new_node = curr.parent
-        elif direction in ("up", "down") and curr.parent:
-            siblings = [c for c in curr.parent.children if c.direction == curr.direction]
-            if not siblings: siblings = curr.parent.children
-            
-            if curr.parent == self.model.root:
-                def get_y_rank(node):
-                    side_siblings = [c for c in curr.parent.children if c.direction == node.direction]
-                    try:
-                        side_idx = side_siblings.index(node)
-                        point_type = side_idx % 3
-                        y_rank = 0 if point_type == 0 else (1 if point_type == 2 else 2)
-                        return (y_rank, side_idx // 3)
-                    except ValueError: return (0, 0)
-                siblings.sort(key=get_y_rank)
-            
-            try:
-                idx = siblings.index(curr)
-                if direction == "up" and idx > 0: new_node = siblings[idx-1]
-                elif direction == "down" and idx < len(siblings) - 1: new_node = siblings[idx+1]
-            except ValueError: pass
-                
-        return new_node
+        """レイアウト時に作成した隣接表を引いて移動先を決定する"""
+        graph = self.layout_engine.nav_graph
+        if graph is None:
+            return current_node
+
+        if self.geometric:
+            new_node = graph.nearest(current_node, direction)
+        else:
+            new_node = graph.neighbor(current_node, direction)
+        return new_node or current_node
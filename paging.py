@@ -0,0 +1,133 @@
+from typing import Dict, Optional, Tuple
+from models import Node
+
+class Placeholder(Node):
+    """表示範囲の外にある子をまとめて表す仮のトピック（モデルのツリーには含まれない）
+
+    kind は "before"（表示範囲より前の子）または "after"（表示範囲より後の子）。
+    """
+    def __init__(self, owner: Node, kind: str):
+        super().__init__("", parent=owner, node_id=f"{owner.id}:{kind}")
+        self.owner = owner
+        self.kind = kind
+        self.hidden_count = 0
+
+    def set_hidden_count(self, count: int):
+        self.hidden_count = count
+        text = f"▲ 前の {count:,} 件" if self.kind == "before" else f"▼ 他 {count:,} 件"
+        if self.text != text:
+            self.text = text
+
+class ChildWindows:
+    """子の多いノードについて、レイアウト・描画する子の範囲（表示範囲）を管理するクラス
+
+    子が page_size より多いノードは、表示範囲の子と、範囲外の子を表すプレースホルダーだけを配置する。
+    これにより、子の数によらずノード1つあたりの配置・描画の量は page_size 程度に抑えられる。
+    プレースホルダーを開くと1ページ分を追加で表示し、reveal() は指定したノードが表示範囲に
+    入るように範囲をずらす（キーボードで範囲の端を越えた場合など）。
+    """
+    PAGE_SIZE = 50
+
+    def __init__(self, page_size: int = PAGE_SIZE):
+        self.page_size = page_size
+        self._windows: Dict[str, Tuple[int, int]] = {} # node_id -> (先頭の位置, 件数)
+        self._placeholders: Dict[str, Placeholder] = {} # プレースホルダーのID -> Placeholder
+
+    def window(self, node: Node) -> Tuple[int, int]:
+        """表示範囲 [start, end) を返す"""
+        n = len(node.children)
+        start, size = self._windows.get(node.id, (0, self.page_size))
+        start = max(0, min(start, n - size))
+        return start, min(n, start + size)
+
+    def visible_children(self, node: Node) -> list:
+        """配置する子の一覧（表示範囲の子と、範囲外の子があればその前後のプレースホルダー）"""
+        children = node.children
+        n = len(children)
+        if n <= self.page_size:
+            return children
+        start, end = self.window(node)
+        result = []
+        if start > 0:
+            result.append(self._placeholder(node, "before", start))
+        result.extend(children[start:end])
+        if end < n:
+            result.append(self._placeholder(node, "after", n - end))
+        return result
+
+    def placeholder(self, placeholder_id: str) -> Optional[Placeholder]:
+        return self._placeholders.get(placeholder_id)
+
+    def _placeholder(self, node: Node, kind: str, count: int) -> Placeholder:
+        placeholder_id = f"{node.id}:{kind}"
+        placeholder = self._placeholders.get(placeholder_id)
+        if placeholder is None or placeholder.owner is not node:
+            placeholder = self._placeholders[placeholder_id] = Placeholder(node, kind)
+        placeholder.set_hidden_count(count)
+        return placeholder
+
+    def open(self, placeholder: Placeholder) -> Node:
+        """プレースホルダーの側に1ページ分だけ表示範囲を広げ、新たに表示された最初の子を返す"""
+        node = placeholder.owner
+        start, end = self.window(node)
+        if placeholder.kind == "before":
+            new_start = max(0, start - self.page_size)
+            self._set(node, new_start, end - new_start)
+            return node.children[start - 1]
+        self._set(node, start, end - start + self.page_size)
+        return node.children[end]
+
+    def page(self, placeholder: Placeholder) -> Node:
+        """表示範囲を次（前）のページへ移し、範囲の端を越えた隣の子を返す（キーボード移動用）"""
+        node = placeholder.owner
+        start, end = self.window(node)
+        target = node.children[start - 1] if placeholder.kind == "before" else node.children[end]
+        self.reveal(target)
+        return target
+
+    def is_visible(self, node: Node) -> bool:
+        """祖先の表示範囲にすべて入っているか（折りたたみ状態は考慮しない）"""
+        child, parent = node, node.parent
+        while parent is not None:
+            if len(parent.children) > self.page_size:
+                start, end = self.window(parent)
+                if not start <= child.index_in_parent() < end:
+                    return False
+            child, parent = parent, parent.parent
+        return True
+
+    def reveal(self, node: Node) -> bool:
+        """node とその祖先が親の表示範囲に入るように範囲をずらし、変更したかどうかを返す
+
+        範囲の後ろにある場合は node が先頭になるページへ、前にある場合は node が末尾になるページへ移る。
+        """
+        changed = False
+        child, parent = node, node.parent
+        while parent is not None and child._in_parent:
+            if len(parent.children) > self.page_size:
+                start, end = self.window(parent)
+                index = child.index_in_parent()
+                if index >= end:
+                    self._set(parent, index, end - start)
+                    changed = True
+                elif index < start:
+                    self._set(parent, max(0, index - (end - start) + 1), end - start)
+                    changed = True
+            child, parent = parent, parent.parent
+        return changed
+
+    def snapshot(self) -> dict:
+        """表示範囲の状態（レイアウトのキャッシュに保存する）"""
+        return {node_id: list(window) for node_id, window in self._windows.items()}
+
+    def restore(self, state: dict):
+        """snapshot() で保存した状態に置き換える"""
+        self._windows = {node_id: (int(start), int(size)) for node_id, (start, size) in state.items()}
+
+    def _set(self, node: Node, start: int, size: int):
+        self._windows[node.id] = (start, max(size, self.page_size))
+        # 表示範囲は内容のハッシュに含まれないため、祖先のレイアウトの記録を破棄する
+        curr = node
+        while curr is not None:
+            curr._layout_key = None
+            curr = curr.parent
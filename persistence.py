@@ -1,6 +1,9 @@
-import json
+import os
 import re
 from tkinter import filedialog, messagebox
+import tree_json
+from importers import import_file
+from tracing import traced, tracer
 
 class PersistenceHandler:
     """ファイルの保存・読み込みを管理するクラス"""
@@ -8,9 +11,25 @@ class PersistenceHandler:
         self.model = model
         self.render_callback = render_callback
         self.current_file_path = None
+        self.on_written = None # 保存後に呼ばれる関数 on_written(file_path)（自身の書き込みを監視から除くため）
+        self._saved = None # 最後に保存・読み込みした (ファイルパス, 内容のハッシュ)
+
+    def remember_saved(self):
+        """現在の内容を current_file_path に保存済みのものとして記録する"""
+        if self.current_file_path:
+            self._saved = (self.current_file_path, self.model.content_hash())
+        else:
+            self._saved = None
+
+    def is_modified(self) -> bool:
+        """最後に保存・読み込みしてから内容が変わったかどうか"""
+        return self._saved != (self.current_file_path, self.model.content_hash())
 
     def on_save(self, event=None):
         if self.current_file_path:
+            if not self.is_modified() and os.path.exists(self.current_file_path):
+                messagebox.showinfo("保存", f"変更はありません。\n{self.current_file_path}")
+                return
             self._write_to_file(self.current_file_path, "保存が完了しました。")
         else:
             self.on_save_as(event)
@@ -39,25 +58,61 @@ class PersistenceHandler:
     def _write_to_file(self, file_path, success_msg):
         """共通のファイル書き込み処理"""
         try:
-            data = self.model.save()
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=4)
+            with tracer.span("PersistenceHandler.save", file=file_path):
+                data = self.model.save()
+                with open(file_path, "w", encoding="utf-8") as f:
+                    tree_json.dump(data, f, ensure_ascii=False, indent=4)
             self.current_file_path = file_path
+            self.remember_saved()
+            if self.on_written: self.on_written(file_path)
             messagebox.showinfo("保存", f"{success_msg}\n{file_path}")
         except Exception as e:
             messagebox.showerror("エラー", f"保存に失敗しました: {e}")
 
+    @traced("PersistenceHandler.load_path")
+    def load_path(self, file_path):
+        """ファイルをモデルへ読み込む。JSON以外はインポーターで読み込み、上書き保存先にはしない"""
+        if os.path.splitext(file_path)[1].lower() == ".json":
+            self.model.load(self.read_data(file_path))
+            self.current_file_path = file_path
+        else:
+            self.model.load_root(import_file(file_path))
+            self.current_file_path = None
+        self.remember_saved()
+
+    def read_data(self, file_path) -> dict:
+        """保存形式（JSON）のファイルを辞書として読み込む"""
+        with open(file_path, "r", encoding="utf-8") as f:
+            return tree_json.load(f)
+
     def on_open(self, event=None):
         file_path = filedialog.askopenfilename(
             filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
         )
         if file_path:
             try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                self.model.load(data)
+                with tracer.span("PersistenceHandler.open", file=file_path):
+                    with open(file_path, "r", encoding="utf-8") as f:
+                        data = tree_json.load(f)
+                    self.model.load(data)
                 self.current_file_path = file_path
+                self.remember_saved()
                 self.render_callback(root_node=self.model.root)
                 messagebox.showinfo("読み込み", "読み込みが完了しました。")
             except Exception as e:
                 messagebox.showerror("エラー", f"読み込みに失敗しました: {e}")
+
+    def on_import(self, event=None):
+        file_path = filedialog.askopenfilename(
+            filetypes=[("アウトライン", "*.txt *.md *.markdown *.opml"), ("All files", "*.*")]
+        )
+        if file_path:
+            try:
+                with tracer.span("PersistenceHandler.import", file=file_path):
+                    self.model.load_root(import_file(file_path))
+                # インポート元はJSONではないため、上書き保存先にはしない
+                self.current_file_path = None
+                self.remember_saved()
+                self.render_callback(root_node=self.model.root)
+            except Exception as e:
+                messagebox.showerror("エラー", f"インポートに失敗しました: {e}")
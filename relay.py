@@ -0,0 +1,122 @@
+"""pymind同士の同期用の小さなリレーサーバー
+
+接続したクライアントから届いた1行（JSONメッセージ）を、送信元以外の全クライアントへそのまま転送する。
+
+    python relay.py --port 8765              # TCP
+    python relay.py --unix /tmp/pymind.sock  # Unixソケット
+
+各pymindは `python main.py map.json --sync localhost:8765` のように接続する。
+"""
+import argparse
+import os
+import queue
+import socketserver
+import threading
+from typing import List
+
+class _RelayHandler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.clients.append(self)
+        self.send_lock = threading.Lock()
+
+    def handle(self):
+        for line in self.rfile:
+            self.server.broadcast(self, line)
+
+    def finish(self):
+        with self.server.lock:
+            if self in self.server.clients:
+                self.server.clients.remove(self)
+        super().finish()
+
+    def send_line(self, line: bytes):
+        with self.send_lock:
+            self.wfile.write(line)
+            self.wfile.flush()
+
+class _RelayMixin:
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def init_relay(self):
+        self.lock = threading.Lock()
+        self.clients: List[_RelayHandler] = []
+
+    def broadcast(self, sender, line: bytes):
+        with self.lock:
+            targets = [c for c in self.clients if c is not sender]
+        for client in targets:
+            try:
+                client.send_line(line)
+            except OSError:
+                pass # 切断されたクライアントは finish で取り除かれる
+
+class TcpRelayServer(_RelayMixin, socketserver.ThreadingTCPServer):
+    def __init__(self, address):
+        super().__init__(address, _RelayHandler)
+        self.init_relay()
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class UnixRelayServer(_RelayMixin, socketserver.ThreadingUnixStreamServer):
+        def __init__(self, path):
+            super().__init__(path, _RelayHandler)
+            self.init_relay()
+
+class LocalRelay:
+    """ソケットを使わずに同一プロセス内でメッセージを転送するリレー（動作確認用の代替）
+
+    connect() が返すトランスポートは SocketTransport と同じ send / receive_all / close を持つ。
+    """
+    def __init__(self):
+        self.transports: List["LocalTransport"] = []
+
+    def connect(self) -> "LocalTransport":
+        transport = LocalTransport(self)
+        self.transports.append(transport)
+        return transport
+
+    def broadcast(self, sender, message: dict):
+        for transport in self.transports:
+            if transport is not sender:
+                transport.inbox.put(message)
+
+class LocalTransport:
+    def __init__(self, relay: LocalRelay):
+        self.relay = relay
+        self.inbox = queue.Queue()
+
+    def send(self, message: dict):
+        self.relay.broadcast(self, message)
+
+    def receive_all(self) -> List[dict]:
+        messages = []
+        while not self.inbox.empty():
+            messages.append(self.inbox.get_nowait())
+        return messages
+
+    def close(self):
+        if self in self.relay.transports:
+            self.relay.transports.remove(self)
+
+def main():
+    parser = argparse.ArgumentParser(description="pymind 同期用リレーサーバー")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="TCPの代わりに使うUnixソケットのパス")
+    args = parser.parse_args()
+
+    if args.unix:
+        if os.path.exists(args.unix):
+            os.remove(args.unix)
+        server = UnixRelayServer(args.unix)
+        print(f"relay: unix:{args.unix}")
+    else:
+        server = TcpRelayServer((args.host, args.port))
+        print(f"relay: {args.host}:{args.port}")
+    with server:
+        server.serve_forever()
+
+if __name__ == "__main__":
+    main()
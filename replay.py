@@ -0,0 +1,219 @@
+"""操作の記録と再生による応答時間の計測
+
+pymind の操作（キー・マウスの入力と、それが呼び出したハンドラ・編集中のテキスト）を
+JSON Lines 形式で記録し、同じ文書・同じ操作を MindMapView に再生して、入力ごとに
+ハンドラの実行から描画の完了までの時間を計測する。
+
+    python main.py map.json --record session.jsonl   # 記録（終了時まで追記）
+    python replay.py session.jsonl                    # 再生して p50/p95/p99/最大 を表示
+    python replay.py session.jsonl --json             # 入力の種類ごとの集計を1行1つのJSONで出力
+
+再生には表示が必要（ヘッドレス環境では Xvfb などを使う）。記録の1行目は文書全体と
+ウィンドウの大きさを含むため、記録したファイルだけで同じ状態から再生できる。
+ファイルダイアログ・メッセージを表示する操作（保存・開く）は再生しない。
+"""
+import argparse
+import json
+import sys
+import time
+from types import SimpleNamespace
+import tree_json
+
+SESSION_VERSION = 1
+# 再生するとダイアログで止まる入力
+REPLAY_SKIP = {"<Control-s>", "<Control-S>", "<Control-o>"}
+
+class SessionRecorder:
+    """MindMapView の入力と編集を1行1つのJSONとしてファイルへ追記するクラス"""
+    def __init__(self, view, file_path: str):
+        self.view = view
+        self.file = open(file_path, "w", encoding="utf-8")
+        self._start = time.perf_counter()
+        self._write({
+            "type": "session", "version": SESSION_VERSION,
+            "width": view.root.winfo_width(), "height": view.root.winfo_height(),
+            "layout": type(view.layout_engine).__name__,
+            "document": view.model.save(),
+        })
+
+    def close(self):
+        self.file.close()
+
+    def _write(self, record: dict):
+        self.file.write(tree_json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self.file.flush() # 異常終了しても、それまでの操作は残す
+
+    def record_input(self, sequence: str, handler_name, event):
+        """入力イベント。座標は表示位置によらないキャンバス上の座標で記録する"""
+        canvas = self.view.canvas
+        record = {"t": round(time.perf_counter() - self._start, 4), "type": "input", "seq": sequence}
+        if handler_name:
+            record["handler"] = handler_name
+        x, y = getattr(event, "x", None), getattr(event, "y", None)
+        if x is not None and y is not None:
+            record["x"], record["y"] = canvas.canvasx(x), canvas.canvasy(y)
+        for name in ("keysym", "state", "delta"):
+            value = getattr(event, name, None)
+            if isinstance(value, (int, str)) and value not in ("", "??"):
+                record[name] = value
+        self._write(record)
+
+    def record_edit(self, kind: str, text: str = None):
+        """インライン編集。kind は "change"（入力中）, "commit"（確定）, "end"（終了）"""
+        record = {"t": round(time.perf_counter() - self._start, 4), "type": "edit", "kind": kind}
+        if text is not None:
+            record["text"] = text
+        self._write(record)
+
+def load_session(file_path: str):
+    """記録を (ヘッダー, 操作の一覧) として読み込む"""
+    with open(file_path, "r", encoding="utf-8") as f:
+        records = [tree_json.loads(line) for line in f if line.strip()]
+    if not records or records[0].get("type") != "session":
+        raise ValueError("操作の記録ではありません")
+    header = records[0]
+    if header.get("version") != SESSION_VERSION:
+        raise ValueError(f"未対応の記録形式です: {header.get('version')}")
+    return header, records[1:]
+
+class SessionPlayer:
+    """記録した操作を MindMapView に再生し、入力ごとの応答時間を計測するクラス
+
+    1つの入力の応答時間は、ハンドラを呼んでから、保留中の描画を実行してキャンバスへの
+    反映（update_idletasks）が終わるまでとする。入力の間では保留中のタイマー処理を実行し、
+    realtime=True の場合は記録時の間隔も再現する。
+    """
+    def __init__(self, view, realtime: bool = False):
+        self.view = view
+        self.realtime = realtime
+        self.samples = [] # (ラベル, 応答時間[秒])
+        self.skipped = 0
+
+    def prepare(self, header: dict):
+        """記録開始時の文書・ウィンドウの大きさ・レイアウト方式を再現する"""
+        view = self.view
+        view.root.geometry(f"{header['width']}x{header['height']}")
+        view.root.update()
+        for name, engine_class in view.LAYOUT_ENGINES.items():
+            if engine_class.__name__ == header.get("layout"):
+                view.set_layout_engine(name)
+        view.model.load(header["document"])
+        view.persistence.current_file_path = None
+        view.persistence.remember_saved()
+        view._on_load_complete(view.model.root)
+        self._settle()
+
+    def play(self, records):
+        start = time.perf_counter()
+        for record in records:
+            if self.realtime:
+                while time.perf_counter() - start < record["t"]:
+                    self.view.root.update()
+                    time.sleep(0.001)
+            else:
+                self.view.root.update()
+
+            if record["type"] == "edit":
+                label, action = f"edit:{record['kind']}", lambda record=record: self._apply_edit(record)
+            else:
+                if record["seq"] in REPLAY_SKIP or record["seq"] not in self.view.input_handlers:
+                    self.skipped += 1
+                    continue
+                label = record["seq"] + (f" {record['handler']}" if "handler" in record else "")
+                action = lambda record=record: self._dispatch(record)
+
+            t0 = time.perf_counter()
+            action()
+            self._settle()
+            self.samples.append((label, time.perf_counter() - t0))
+
+    def _settle(self):
+        """保留中の描画を実行し、キャンバスへの反映を終える"""
+        view = self.view
+        view.scheduler.flush()
+        view.root.update_idletasks()
+
+    def _dispatch(self, record: dict):
+        canvas = self.view.canvas
+        event = SimpleNamespace(widget=canvas, x=0, y=0, state=record.get("state", 0),
+                                keysym=record.get("keysym", ""), char="", delta=record.get("delta", 0))
+        if "x" in record:
+            # キャンバス上の座標を、現在のスクロール位置での表示座標に戻す
+            event.x = int(record["x"] - canvas.canvasx(0))
+            event.y = int(record["y"] - canvas.canvasy(0))
+        self.view.input_handlers[record["seq"]](event)
+
+    def _apply_edit(self, record: dict):
+        editor = self.view.editor
+        if not editor.is_editing():
+            return
+        kind = record["kind"]
+        if kind == "end":
+            editor.cancel_edit() # 確定されずに終わった編集
+            return
+        entry = editor.editing_entry
+        entry.delete("1.0", "end")
+        entry.insert("1.0", record["text"])
+        if kind == "change":
+            self.view._on_edit_change(editor.node, record["text"])
+        else:
+            editor.finish_edit(editor.node)
+
+def _percentile(sorted_values, p: float) -> float:
+    """最近傍順位法によるパーセンタイル"""
+    index = max(0, min(len(sorted_values) - 1, -(-len(sorted_values) * p // 100) - 1))
+    return sorted_values[int(index)]
+
+def latency_table(samples):
+    """ラベルごとの件数・p50・p95・p99・最大[ms]を、最大の大きい順に返す（先頭は全体）"""
+    groups = {"(all)": []}
+    for label, seconds in samples:
+        groups.setdefault(label, []).append(seconds * 1000)
+        groups["(all)"].append(seconds * 1000)
+    rows = []
+    for label, values in groups.items():
+        if not values:
+            continue
+        values.sort()
+        rows.append({"event": label, "count": len(values),
+                     "p50": _percentile(values, 50), "p95": _percentile(values, 95),
+                     "p99": _percentile(values, 99), "max": values[-1]})
+    rows.sort(key=lambda row: (row["event"] != "(all)", -row["max"]))
+    return rows
+
+def print_table(rows, file=sys.stdout):
+    print(f"{'event':<40}{'count':>7}{'p50[ms]':>10}{'p95[ms]':>10}{'p99[ms]':>10}{'max[ms]':>10}", file=file)
+    for row in rows:
+        print(f"{row['event']:<40}{row['count']:>7}{row['p50']:>10.1f}{row['p95']:>10.1f}"
+              f"{row['p99']:>10.1f}{row['max']:>10.1f}", file=file)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="pymind 操作の記録の再生と応答時間の計測")
+    parser.add_argument("session", help="main.py --record で記録したファイル")
+    parser.add_argument("--realtime", action="store_true", help="記録時の入力の間隔を再現する")
+    parser.add_argument("--json", action="store_true", help="集計を1行1つのJSONで出力する")
+    args = parser.parse_args(argv)
+
+    import tkinter as tk
+    from view import MindMapView
+
+    header, records = load_session(args.session)
+    root = tk.Tk()
+    view = MindMapView(root)
+    player = SessionPlayer(view, realtime=args.realtime)
+    player.prepare(header)
+    player.play(records)
+    root.destroy()
+
+    rows = latency_table(player.samples)
+    if args.json:
+        for row in rows:
+            print(json.dumps(row, ensure_ascii=False), flush=True)
+    else:
+        print_table(rows)
+    if player.skipped:
+        print(f"再生しなかった入力: {player.skipped} 件", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
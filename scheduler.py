@@ -0,0 +1,56 @@
+class RenderScheduler:
+    """描画要求を集約し、イベントループ1周につき1回だけ描画処理を実行するクラス
+
+    各ハンドラは直接描画せず、invalidate() で無効になった範囲を通知する。
+    実際の処理は after_idle で1回だけ呼ばれる on_frame(flags, force_center) が行う。
+    """
+    SELECTION = 1 # 選択状態のみ変化（レイアウトは再計算しない）
+    GEOMETRY = 2  # スクロール領域と表示位置の更新のみ
+    LAYOUT = 4    # レイアウト計算から描画までやり直す
+
+    def __init__(self, widget, on_frame):
+        self.widget = widget
+        self.on_frame = on_frame
+        self.flags = 0
+        self.force_center = False
+        self._after_id = None
+        self._post_frame = []
+
+    def invalidate(self, flags, force_center=False):
+        self.flags |= flags
+        self.force_center = self.force_center or force_center
+        self._schedule()
+
+    def after_frame(self, callback):
+        """次のフレームの描画が終わった後に実行する処理を登録する"""
+        self._post_frame.append(callback)
+        self._schedule()
+
+    def cancel(self, flags):
+        """保留中の要求から flags を取り除く（別の方法で反映済みの場合）"""
+        self.flags &= ~flags
+
+    def is_pending(self, flags) -> bool:
+        return bool(self.flags & flags)
+
+    def flush(self):
+        """保留中のフレームがあれば即座に実行する"""
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._run()
+
+    def _schedule(self):
+        if self._after_id is None:
+            self._after_id = self.widget.after_idle(self._run)
+
+    def _run(self):
+        self._after_id = None
+        flags, force_center = self.flags, self.force_center
+        self.flags = 0
+        self.force_center = False
+        callbacks, self._post_frame = self._post_frame, []
+
+        if flags:
+            self.on_frame(flags, force_center)
+        for callback in callbacks:
+            callback()
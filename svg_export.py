@@ -0,0 +1,271 @@
+import json
+import os
+import unicodedata
+from collections import OrderedDict
+from xml.sax.saxutils import escape, quoteattr
+from graphics import GraphicsEngine
+from layout import LayoutEngine
+from models import MindMapModel, Node
+from traversal import visible
+
+SVG_HEADER = ('<svg xmlns="http://www.w3.org/2000/svg" width="{w:.0f}" height="{h:.0f}" '
+              'viewBox="{x:.1f} {y:.1f} {w:.1f} {h:.1f}">\n'
+              '<rect x="{x:.1f}" y="{y:.1f}" width="{w:.1f}" height="{h:.1f}" fill="#fafafa"/>\n')
+SVG_FOOTER = '</svg>\n'
+
+class SvgFileSink:
+    """SVG要素を1つのファイルへ逐次書き出す"""
+    def __init__(self, file_path, bounds):
+        x1, y1, x2, y2 = bounds
+        self.f = open(file_path, "w", encoding="utf-8")
+        self.f.write(SVG_HEADER.format(x=x1, y=y1, w=x2 - x1, h=y2 - y1))
+
+    def write(self, element: str, bbox):
+        self.f.write(element)
+
+    def close(self):
+        self.f.write(SVG_FOOTER)
+        self.f.close()
+
+class SvgTileSink:
+    """SVG要素を固定サイズのタイルへ振り分けて書き出し、最後にインデックスを作成する
+
+    同時に開くファイル数は MAX_OPEN_FILES までとし、超えた分は追記モードで開き直す。
+    """
+    MAX_OPEN_FILES = 64
+
+    def __init__(self, index_path, bounds, tile_size):
+        self.index_path = index_path
+        self.directory = os.path.dirname(os.path.abspath(index_path))
+        self.stem = os.path.splitext(os.path.basename(index_path))[0]
+        self.bounds = bounds
+        self.tile_size = tile_size
+        self.tiles = {}              # (row, col) -> ファイル名
+        self._open = OrderedDict()   # (row, col) -> ファイルオブジェクト
+
+    def _tile_file(self, row, col):
+        key = (row, col)
+        f = self._open.get(key)
+        if f is not None:
+            self._open.move_to_end(key)
+            return f
+
+        if len(self._open) >= self.MAX_OPEN_FILES:
+            _, oldest = self._open.popitem(last=False)
+            oldest.close()
+
+        name = f"{self.stem}_r{row}_c{col}.svg"
+        path = os.path.join(self.directory, name)
+        if key in self.tiles:
+            f = open(path, "a", encoding="utf-8")
+        else:
+            f = open(path, "w", encoding="utf-8")
+            x = self.bounds[0] + col * self.tile_size
+            y = self.bounds[1] + row * self.tile_size
+            f.write(SVG_HEADER.format(x=x, y=y, w=self.tile_size, h=self.tile_size))
+            self.tiles[key] = name
+        self._open[key] = f
+        return f
+
+    def write(self, element: str, bbox):
+        x0, y0 = self.bounds[0], self.bounds[1]
+        size = self.tile_size
+        c1, c2 = int((bbox[0] - x0) // size), int((bbox[2] - x0) // size)
+        r1, r2 = int((bbox[1] - y0) // size), int((bbox[3] - y0) // size)
+        for row in range(r1, r2 + 1):
+            for col in range(c1, c2 + 1):
+                self._tile_file(row, col).write(element)
+
+    def close(self):
+        for f in self._open.values():
+            f.close()
+        self._open.clear()
+        for row, col in self.tiles:
+            path = os.path.join(self.directory, self.tiles[(row, col)])
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(SVG_FOOTER)
+
+        index = {
+            "bounds": list(self.bounds),
+            "tile_size": self.tile_size,
+            "tiles": [
+                {"file": name, "row": row, "col": col,
+                 "x": self.bounds[0] + col * self.tile_size, "y": self.bounds[1] + row * self.tile_size}
+                for (row, col), name in sorted(self.tiles.items())
+            ],
+        }
+        with open(self.index_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False, indent=4)
+
+class SvgRenderer(GraphicsEngine):
+    """GraphicsEngineと同じ見た目をSVG要素として出力する描画エンジン
+
+    metrics に画面上の GraphicsEngine を渡すとTkの実測値で、
+    省略するとTkを使わない推定値でテキストサイズを計算する。
+    """
+    DPI = 96
+    MARGIN = 50
+
+    def __init__(self, metrics: GraphicsEngine = None):
+        super().__init__(canvas=None)
+        self.metrics = metrics
+
+    def _measure_segment(self, txt: str, font):
+        if self.metrics is not None:
+            return self.metrics._measure_segment(txt, font)
+        px = self._font_px(font)
+        bold = len(font) > 2 and "bold" in font[2]
+        width = 0.0
+        for ch in txt:
+            if unicodedata.east_asian_width(ch) in ("W", "F"):
+                width += px
+            else:
+                width += px * (0.6 if bold else 0.55)
+        return round(width), round(px * 1.35)
+
+    def _font_px(self, font):
+        """Tkのフォントサイズ（正ならポイント、負ならピクセル）をピクセルに換算する"""
+        size = font[1]
+        return -size if size < 0 else size * self.DPI / 72
+
+    def _font_attrs(self, font):
+        style = font[2] if len(font) > 2 else ""
+        attrs = f'font-family={quoteattr(font[0])} font-size="{self._font_px(font):.1f}"'
+        if "bold" in style: attrs += ' font-weight="bold"'
+        if "italic" in style: attrs += ' font-style="italic"'
+        return attrs
+
+    def export(self, model: MindMapModel, file_path: str, tile_size: int = None,
+               center_x: float = 0, center_y: float = 0, layout_engine: LayoutEngine = None):
+        """SVGをファイルへ逐次書き出す
+
+        layout_engine を渡すと、そのエンジンで配置済みの結果（画面上のレイアウト・ホイスト・
+        子の表示範囲）をそのまま書き出す。省略するとツリーを複製して標準レイアウトで配置する。
+        いずれの場合もモデルのノードの座標・計測結果は変更しない。
+        tile_size を指定した場合、file_path はタイルのインデックス(JSON)のパスとなり、
+        タイルのSVGは同じディレクトリに出力される。
+        """
+        if layout_engine is None:
+            layout_engine = LayoutEngine()
+            model = _detached_copy(model)
+            layout_engine.apply_layout(model, self, center_x, center_y)
+        root = layout_engine.layout_root(model)
+        nodes = list(visible(root, layout_engine.is_expanded, layout_engine.laid_out_children))
+        bounds = self._content_bounds(nodes)
+        if tile_size:
+            sink = SvgTileSink(file_path, bounds, tile_size)
+        else:
+            sink = SvgFileSink(file_path, bounds)
+
+        try:
+            for node in nodes:
+                self._emit_node(sink, node)
+        finally:
+            sink.close()
+
+    def _content_bounds(self, nodes):
+        """表示中ノードの外接矩形（余白込み）を求める"""
+        x1 = y1 = float("inf")
+        x2 = y2 = float("-inf")
+        for n in nodes:
+            x1, x2 = min(x1, n.x - n.width/2 - 30), max(x2, n.x + n.width/2 + 30)
+            y1, y2 = min(y1, n.y - n.height/2 - 10), max(y2, n.y + n.height/2 + 10)
+        m = self.MARGIN
+        return (x1 - m, y1 - m, x2 + m, y2 + m)
+
+    def _emit_node(self, sink, node: Node):
+        x, y = node.x, node.y
+        w, h = node.width, node.height
+        is_root = node.depth == 0
+        font = self.root_font if is_root else self.font
+        color = self._get_node_color(node)
+        parts = []
+
+        if is_root:
+            parts.append(
+                f'<rect x="{x - w/2 - 12:.1f}" y="{y - h/2 - 10:.1f}" width="{w + 24:.1f}" height="{h + 20:.1f}" '
+                f'rx="10" fill="white" stroke="{color}" stroke-width="3"/>\n'
+            )
+        else:
+            line_y = y + h/2
+            parts.append(
+                f'<line x1="{x - w/2 - 5:.1f}" y1="{line_y:.1f}" x2="{x + w/2 + 5:.1f}" y2="{line_y:.1f}" '
+                f'stroke="{color}" stroke-width="2"/>\n'
+            )
+
+        # リッチテキスト（_draw_rich_text と同じ配置）
+        curr_y = y - h/2 + 10
+        for line_w, segments in self._measure_lines(node.text, font):
+            curr_x = x - line_w / 2
+            max_line_h = 0
+            for txt, seg_font, underline, seg_color, seg_w, seg_h in segments:
+                parts.append(
+                    f'<text x="{curr_x + seg_w/2:.1f}" y="{curr_y + seg_h/2:.1f}" text-anchor="middle" '
+                    f'dominant-baseline="central" fill="{seg_color}" {self._font_attrs(seg_font)} '
+                    f'xml:space="preserve">{escape(txt)}</text>\n'
+                )
+                if underline:
+                    ly = curr_y + seg_h - 2
+                    parts.append(
+                        f'<line x1="{curr_x:.1f}" y1="{ly:.1f}" x2="{curr_x + seg_w:.1f}" y2="{ly:.1f}" '
+                        f'stroke="{seg_color}" stroke-width="1"/>\n'
+                    )
+                curr_x += seg_w
+                max_line_h = max(max_line_h, seg_h)
+            curr_y += (max_line_h if max_line_h > 0 else font[1] + 10)
+
+        if node.children and not is_root:
+            parts.append(self._collapse_icon_svg(node, color))
+
+        bbox = (x - w/2 - 30, y - h/2 - 10, x + w/2 + 30, y + h/2 + 10)
+        sink.write("".join(parts), bbox)
+
+        if not is_root:
+            self._emit_connection(sink, node, color)
+
+    def _collapse_icon_svg(self, node: Node, color):
+        x = node.x - node.width/2 - 10 if node.side == 'left' else node.x + node.width/2 + 10
+        y = node.y + node.height/2
+        svg = f'<circle cx="{x:.1f}" cy="{y:.1f}" r="8" fill="white" stroke="{color}" stroke-width="1"/>\n'
+        if node.collapsed:
+            svg += (f'<text x="{x:.1f}" y="{y:.1f}" text-anchor="middle" dominant-baseline="central" '
+                    f'fill="{color}" {self._font_attrs(("Yu Gothic", 7))}>{node.descendant_count}</text>\n')
+        else:
+            svg += f'<line x1="{x - 4:.1f}" y1="{y:.1f}" x2="{x + 4:.1f}" y2="{y:.1f}" stroke="{color}" stroke-width="1"/>\n'
+        return svg
+
+    def _emit_connection(self, sink, node: Node, color):
+        p1, cp1, cp2, p2, is_tapered = self._get_connection_points(node, node.parent)
+        if is_tapered:
+            steps = self.TAPERED_BEZIER_STEPS
+            points = self._calculate_bezier_points(p1, cp1, cp2, p2, steps)
+            lines = []
+            for i in range(len(points) - 1):
+                # draw_connection と同様に太さを8から2へ線形に変化させる
+                width = 8 + (2 - 8) * (i / steps)
+                lines.append(
+                    f'<line x1="{points[i][0]:.1f}" y1="{points[i][1]:.1f}" '
+                    f'x2="{points[i+1][0]:.1f}" y2="{points[i+1][1]:.1f}" stroke-width="{width:.2f}"/>'
+                )
+            body = "".join(lines)
+        else:
+            points = self._calculate_bezier_points(p1, cp1, cp2, p2, self.BEZIER_STEPS)
+            coords = " ".join(f"{px:.1f},{py:.1f}" for px, py in points)
+            body = f'<polyline points="{coords}" stroke-width="2" stroke-linejoin="round"/>'
+
+        xs = [p[0] for p in points]
+        ys = [p[1] for p in points]
+        bbox = (min(xs) - 4, min(ys) - 4, max(xs) + 4, max(ys) + 4)
+        sink.write(f'<g fill="none" stroke="{color}" stroke-linecap="round">{body}</g>\n', bbox)
+
+def _detached_copy(model: MindMapModel) -> MindMapModel:
+    """配置の計算用に、ツリーを複製した購読者のいないモデルを作る"""
+    copy = MindMapModel()
+    copy.load_root(model.root.clone())
+    return copy
+
+def export_svg(model: MindMapModel, file_path: str, metrics: GraphicsEngine = None,
+               tile_size: int = None, center_x: float = 0, center_y: float = 0,
+               layout_engine: LayoutEngine = None):
+    """マインドマップをSVGとして出力する（tile_size指定時はタイル分割）"""
+    SvgRenderer(metrics).export(model, file_path, tile_size, center_x, center_y, layout_engine)
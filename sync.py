@@ -0,0 +1,419 @@
+import queue
+import socket
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from typing import Dict, List, Optional
+import tree_json
+from events import (AttributesChanged, CollapsedToggled, ModelLoaded, NodeAdded, NodeMoved, NodeRemoved,
+                    TextChanged)
+from models import MindMapModel, Node
+
+# 複数のpymind間で、編集操作の差分（ノードIDをキーとした追加・削除・移動・テキスト・方向と色・折りたたみ）
+# をリレー経由でやり取りする。送受信するメッセージは1行1つのJSON。
+#   {"type": "op", "op": {...}, "clock": [Lamport時刻, サイトID]}
+#   {"type": "hello", "site": サイトID, "clock": Lamport時刻, "request": 要求ID}  参加時に現在の文書を要求する
+#   {"type": "snapshot", "to": サイトID, "request": 要求ID, "data": {...}, "ops": [[時刻, 操作], ...], ...}
+#                                    hello への応答（参加時のみ文書全体を送る）
+# snapshot の data は、取り消しに備えて保持している操作（ops）をすべて取り消した文書で、
+# 受け取った側は ops を適用し直すことで、後から届く古い操作も時刻の順に組み込めるようにする。
+# hello と snapshot にも送信元の時刻を含め、各参加者が今後送る操作の時刻の下限として使う。
+
+SYNCED_EVENTS = (NodeAdded, NodeRemoved, NodeMoved, TextChanged, AttributesChanged, CollapsedToggled, ModelLoaded)
+
+class SocketTransport:
+    """リレーへのTCP（host:port）またはUnixソケット（unix:パス）接続
+
+    受信は別スレッドで行い、復号したメッセージをキューに入れる。
+    受け取る側（Tkのメインスレッド）は receive_all() で取り出す。
+    """
+    def __init__(self, address: str):
+        if address.startswith("unix:"):
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(address[len("unix:"):])
+        else:
+            host, _, port = address.rpartition(":")
+            self.sock = socket.create_connection((host or "localhost", int(port)))
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._send_lock = threading.Lock()
+        self._inbox = queue.Queue()
+        self.closed = False
+        threading.Thread(target=self._read_loop, daemon=True).start()
+
+    def _read_loop(self):
+        try:
+            with self.sock.makefile("r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self._inbox.put(tree_json.loads(line))
+        except (OSError, ValueError):
+            pass
+        self.closed = True
+
+    def send(self, message: dict):
+        data = (tree_json.dumps(message, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        with self._send_lock:
+            self.sock.sendall(data)
+
+    def receive_all(self) -> List[dict]:
+        messages = []
+        while True:
+            try:
+                messages.append(self._inbox.get_nowait())
+            except queue.Empty:
+                return messages
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+class SyncSession:
+    """ローカルの編集操作を送信し、受信した操作をLamport時刻の順に適用するクラス
+
+    すべての操作は (Lamport時刻, サイトID) の全順序で並べた順に適用されたのと同じ結果になる。
+    自分より新しい操作を適用済みのところへ古い操作が届いた場合は、新しい操作を取り消してから
+    古い操作を適用し、取り消した操作をやり直す。このため、同じノードへの同時の変更は
+    後の時刻の操作が勝ち（last-writer-wins）、互いを子へ移動するような同時の移動も
+    循環を生じる側が無視されて、全員が同じツリーに収束する。
+    取り消しに備えて操作を保持し、LOG_SIZE 件を超えた分は、既知の全参加者の時刻がそれを過ぎた
+    （それより古い操作がもう届かない）ものから破棄する。切断した参加者に備え、LOG_LIMIT 件を超えた分は
+    無条件に破棄する。破棄した操作より古い操作が届いた場合（未知の参加者からなど）は、
+    正しい順序で適用し直せないため、他の参加者から文書全体を受け取り直す。
+    """
+    LOG_SIZE = 1000
+    LOG_LIMIT = 100000
+    SNAPSHOT_TIMEOUT = 2.0 # 参加時に他の参加者からの文書を待つ秒数（応答がなければ自分の文書を使う）
+
+    def __init__(self, model: MindMapModel, transport, site_id: Optional[str] = None):
+        self.model = model
+        self.transport = transport
+        self.site_id = site_id or uuid.uuid4().hex
+        self.clock = 0
+        self._log: List[tuple] = []      # (時刻, 操作, 取り消し用の関数)。時刻順
+        self._stamps: List[tuple] = []   # _log と同じ順の時刻（二分探索用）
+        self._nodes: Dict[str, Node] = {} # node_id -> Node（削除済みのノードもやり直しのために保持する）
+        self._site_clocks: Dict[str, int] = {} # 他の参加者のサイトID -> 受け取った最新の時刻
+        self._floor: Optional[tuple] = None    # 破棄した操作のうち最新の時刻（これより古い操作は取り消せない）
+        self._applying = False
+        self._changed = False
+        self._pending: List[dict] = []   # 参加処理中に届いた操作
+        self._established = False
+        self._joined_at = time.monotonic()
+        self._request: Optional[str] = None # 応答を待っている hello の要求ID（古い要求への応答は使わない）
+        self._index_nodes(model.root)
+        model.subscribe(self._on_local_event, *SYNCED_EVENTS)
+        self._send_hello()
+
+    def close(self):
+        self.model.unsubscribe(self._on_local_event)
+        self.transport.close()
+
+    def _index_nodes(self, root: Node):
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            self._nodes[node.id] = node
+            stack.extend(node.children)
+
+    def _reset(self):
+        self._log.clear()
+        self._stamps.clear()
+        self._floor = None
+        self._nodes.clear()
+        self._index_nodes(self.model.root)
+
+    # --- ローカルの操作 ---
+
+    def _on_local_event(self, event):
+        if self._applying:
+            return
+        if isinstance(event, ModelLoaded):
+            # 別の文書を開いた場合は、参加者全員の文書を置き換える
+            self._reset()
+            self.clock += 1
+            self.transport.send(self._snapshot_message(None, None))
+            return
+
+        op, undo = self._local_op(event)
+        self.clock += 1
+        stamp = (self.clock, self.site_id)
+        self._append(stamp, op, undo)
+        message = {"type": "op", "op": op, "clock": list(stamp)}
+        self.transport.send(message)
+        if not self._established:
+            # 応答の文書には含まれないため、文書を受け取った後に適用し直す
+            self._pending.append(message)
+
+    def _local_op(self, event):
+        """イベントから送信する操作と、適用済みのローカル操作の取り消し処理を作る"""
+        model = self.model
+        node = event.node
+        if isinstance(event, NodeAdded):
+            op = {"op": "add", "id": node.id, "parent": event.parent.id, "index": event.index}
+            if node.children or node.collapsed:
+                # 貼り付けたサブツリーはIDと折りたたみ状態ごと送る
+                op.update(op="add_subtree", data=node.to_dict())
+                self._index_nodes(node)
+            else:
+                op.update(text=node.text, direction=node.direction, color=node.color)
+                self._nodes[node.id] = node
+            return op, lambda: model.remove_subtree(node)
+        if isinstance(event, NodeRemoved):
+            parent, index = event.parent, event.index
+            op = {"op": "delete", "id": node.id, "parent": parent.id, "index": index}
+            return op, lambda: model.insert_subtree(parent, node, index)
+        if isinstance(event, NodeMoved):
+            op = {"op": "move", "id": node.id, "parent": event.parent.id, "index": event.index,
+                  "direction": node.direction, "color": node.color}
+            return op, self._move_undo(node, event.old_parent, event.old_index, event.old_direction, event.old_color)
+        if isinstance(event, TextChanged):
+            op = {"op": "text", "id": node.id, "text": event.text}
+            return op, lambda: model.set_text(node, event.old)
+        if isinstance(event, AttributesChanged):
+            op = {"op": "style", "id": node.id, "direction": event.direction, "color": event.color}
+            return op, lambda: model.set_style(node, event.old_direction, event.old_color)
+        op = {"op": "collapse", "id": node.id, "collapsed": event.collapsed}
+        return op, lambda: model._set_collapsed(node, not event.collapsed)
+
+    # --- 受信した操作 ---
+
+    def poll(self) -> bool:
+        """受信済みのメッセージを処理し、モデルが変化したかどうかを返す"""
+        self._changed = False
+        messages = self.transport.receive_all()
+        if not messages and self._established:
+            return False
+        with self.model.batch():
+            for message in messages:
+                kind = message.get("type")
+                if kind == "op":
+                    if self._established:
+                        self._receive_op(message)
+                    else:
+                        self._pending.append(message)
+                elif kind == "hello":
+                    self._note_site(message["site"], message.get("clock", 0))
+                    if self._established and message["site"] != self.site_id:
+                        self.transport.send(self._snapshot_message(message["site"], message.get("request")))
+                elif kind == "snapshot":
+                    if message["to"] is None or (message["to"] == self.site_id and not self._established
+                                                 and message.get("request") == self._request):
+                        self._load_snapshot(message)
+
+            if not self._established and time.monotonic() - self._joined_at > self.SNAPSHOT_TIMEOUT:
+                # 他に参加者がいない場合は自分の文書を基準にする
+                self._established = True
+                self._flush_pending()
+        return self._changed
+
+    def _snapshot_message(self, to: Optional[str], request: Optional[str]) -> dict:
+        """現在の文書を、保持している操作を取り消した文書とその操作の一覧として送るメッセージを作る"""
+        self._applying = True
+        try:
+            for _, _, undo in reversed(self._log):
+                if undo: undo()
+            data = self.model.save()
+            detached = [node.to_dict() for node in self._detached_roots()]
+            self._log[:] = [(stamp, op, self._apply(op)) for stamp, op, _ in self._log]
+        finally:
+            self._applying = False
+        return {"type": "snapshot", "to": to, "request": request, "site": self.site_id, "data": data, "detached": detached,
+                "clock": self.clock, "ops": [[list(stamp), op] for stamp, op, _ in self._log],
+                "floor": list(self._floor) if self._floor else None, "sites": dict(self._site_clocks)}
+
+    def _detached_roots(self) -> List[Node]:
+        """削除済みで現在のツリーから辿れないノードのうち、切り離されたサブツリーの根にあたるもの"""
+        attached = set()
+        stack = [self.model.root]
+        while stack:
+            node = stack.pop()
+            attached.add(node.id)
+            stack.extend(node.children)
+        return [node for node_id, node in self._nodes.items()
+                if node_id not in attached and (node.parent is None or not node._in_parent)]
+
+    def _load_snapshot(self, message: dict):
+        self._applying = True
+        try:
+            self.model.load(message["data"])
+        finally:
+            self._applying = False
+        self._reset()
+        # 送信元と同じく、削除済みのノードへの操作も適用できるようにする
+        for node_data in message.get("detached", []):
+            self._index_nodes(Node.from_dict(node_data))
+        self.clock = max(self.clock, message["clock"])
+        if message.get("site"):
+            self._note_site(message["site"], message["clock"])
+        for site, clock in message.get("sites", {}).items():
+            self._note_site(site, clock)
+        floor = message.get("floor")
+        self._floor = tuple(floor) if floor else None
+        self._established = True
+        self._changed = True
+        for stamp, op in message.get("ops", []):
+            self._pending.append({"type": "op", "op": op, "clock": stamp})
+        self._flush_pending()
+
+    def _flush_pending(self):
+        """参加処理中に届いた操作と受け取った文書の操作のうち、文書に反映されていないものを時刻の順に適用する
+
+        受け取った文書の送信元が破棄した時刻以前の操作は、送信元で適用済みのものとして扱う。
+        """
+        floor = self._floor
+        pending = {}
+        for message in self._pending:
+            stamp = tuple(message["clock"])
+            if floor is None or stamp > floor:
+                pending[stamp] = message
+        self._pending = []
+        # 古い順に適用するため、適用済みの操作を取り消すことはない
+        for stamp in sorted(pending):
+            self._receive_op(pending[stamp])
+
+    def _note_site(self, site: str, clock: int):
+        """参加者から受け取った時刻を記録する（その参加者が今後送る操作はこれより後の時刻になる）"""
+        if site != self.site_id:
+            self._site_clocks[site] = max(self._site_clocks.get(site, 0), clock)
+
+    def _resync(self, message: dict):
+        """取り消せないほど古い操作が届いた場合に、他の参加者から文書全体を受け取り直す
+
+        保持している操作・届いた操作・文書を受け取るまでに届く操作は、参加時と同じく
+        受け取った文書に含まれないものだけを適用し直す。
+        """
+        self._established = False
+        self._joined_at = time.monotonic()
+        self._pending.extend({"type": "op", "op": op, "clock": list(stamp)} for stamp, op, _ in self._log)
+        self._pending.append(message)
+        self._send_hello()
+
+    def _send_hello(self):
+        self._request = uuid.uuid4().hex
+        self.transport.send({"type": "hello", "site": self.site_id, "clock": self.clock, "request": self._request})
+
+    def _receive_op(self, message: dict):
+        stamp = tuple(message["clock"])
+        self._note_site(stamp[1], stamp[0])
+        self.clock = max(self.clock, stamp[0]) + 1
+        if self._floor is not None and stamp < self._floor:
+            self._resync(message)
+            return
+        i = bisect_left(self._stamps, stamp)
+        if i < len(self._stamps) and self._stamps[i] == stamp:
+            return # 適用済み
+
+        self._applying = True
+        try:
+            # 新しい操作を取り消し、届いた操作を適用してからやり直す
+            redo = self._log[i:]
+            for _, _, undo in reversed(redo):
+                if undo: undo()
+            del self._log[i:]
+            del self._stamps[i:]
+            self._append(stamp, message["op"], self._apply(message["op"]))
+            for s, op, _ in redo:
+                self._append(s, op, self._apply(op))
+        finally:
+            self._applying = False
+        self._changed = True
+
+    def _append(self, stamp, op, undo):
+        if self._stamps and stamp < self._stamps[-1]:
+            i = bisect_left(self._stamps, stamp)
+            self._stamps.insert(i, stamp)
+            self._log.insert(i, (stamp, op, undo))
+        else:
+            self._stamps.append(stamp)
+            self._log.append((stamp, op, undo))
+        excess = len(self._log) - self.LOG_SIZE
+        if excess > 0:
+            self._trim_log(excess)
+
+    def _trim_log(self, excess: int):
+        """古い方から最大 excess 件の操作を、もう取り消す必要のないものに限って破棄する"""
+        # 各参加者（自身を含む）が今後送る操作は、その参加者の最新の時刻より後になる
+        stable = min(self.clock, *self._site_clocks.values()) if self._site_clocks else self.clock
+        forced = len(self._log) - self.LOG_LIMIT
+        n = 0
+        while n < excess and (self._stamps[n][0] <= stable or n < forced):
+            n += 1
+        if n:
+            self._floor = self._stamps[n - 1]
+            del self._log[:n]
+            del self._stamps[:n]
+
+    def _apply(self, op: dict):
+        """操作を適用し、取り消し用の関数を返す（適用できない操作は何もせずNone）"""
+        model = self.model
+        kind = op["op"]
+        node = self._nodes.get(op["id"])
+
+        if kind in ("add", "add_subtree"):
+            parent = self._nodes.get(op["parent"])
+            if parent is None:
+                return None
+            if node is None:
+                if kind == "add":
+                    node = Node(op["text"], node_id=op["id"])
+                    node.direction = op["direction"]
+                    node.color = op["color"]
+                    self._nodes[node.id] = node
+                else:
+                    node = Node.from_dict(op["data"])
+                    self._index_nodes(node)
+            elif node._in_parent:
+                return None
+            model.insert_subtree(parent, node, min(op["index"], len(parent.children)))
+            return lambda: model.remove_subtree(node)
+
+        if node is None:
+            return None
+        if kind == "delete":
+            parent = node.parent
+            if parent is None or not node._in_parent:
+                return None
+            index = model.remove_subtree(node)
+            return lambda: model.insert_subtree(parent, node, index)
+
+        if kind == "move":
+            target = self._nodes.get(op["parent"])
+            if target is None or node is self.model.root or target is node or target.is_descendant_of(node):
+                return None # 循環する移動は無視する
+            old_parent = node.parent if node._in_parent else None
+            undo = self._move_undo(node, old_parent, node.index_in_parent(), node.direction, node.color)
+            model.relocate_subtree(node, target, min(op["index"], len(target.children)),
+                                   direction=op["direction"], color=op["color"])
+            return undo
+
+        if kind == "text":
+            old = node.text
+            model.set_text(node, op["text"])
+            return lambda: model.set_text(node, old)
+
+        if kind == "style":
+            old_direction, old_color = node.direction, node.color
+            model.set_style(node, op["direction"], op["color"])
+            return lambda: model.set_style(node, old_direction, old_color)
+
+        if kind == "collapse":
+            old = node.collapsed
+            model._set_collapsed(node, op["collapsed"])
+            return lambda: model._set_collapsed(node, old)
+        return None
+
+    def _move_undo(self, node: Node, old_parent: Optional[Node], old_index: int, old_direction, old_color):
+        model = self.model
+        def undo():
+            if old_parent is not None:
+                model.relocate_subtree(node, old_parent, old_index, direction=old_direction, color=old_color)
+                return
+            # 削除済みのノードが移動されていた場合は、切り離された状態に戻す
+            if node._in_parent:
+                model.remove_subtree(node)
+            node.color = old_color
+            node._update_direction_recursive(old_direction)
+        return undo
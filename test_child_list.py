@@ -0,0 +1,146 @@
+"""子ノード用のコンテナ（child_list.ChildList）が list と同じ結果になることの確認
+
+    python -m unittest test_child_list
+"""
+import random
+import unittest
+from child_list import ChildList
+
+class SmallChildList(ChildList):
+    """少ない要素数でもブロックが複数になるように、ブロックを小さくしたもの"""
+    BLOCK_SIZE = 2
+
+class Item:
+    """子ノードの代わり（ノードと同じく、同一性で比較・ハッシュされる）"""
+    def __init__(self, n):
+        self.n = n
+
+    def __repr__(self):
+        return f"Item({self.n})"
+
+class RandomOperationTest(unittest.TestCase):
+    def _check(self, actual, expected):
+        self.assertEqual(len(actual), len(expected))
+        self.assertEqual(list(actual), expected)
+        self.assertEqual(list(reversed(actual)), expected[::-1])
+        self.assertTrue(actual == expected)
+        self.assertEqual(bool(actual), bool(expected))
+
+    def _run(self, factory, seed, steps=2000):
+        rng = random.Random(seed)
+        created = [Item(n) for n in range(40)]
+        actual, expected = factory(created[:10]), created[:10]
+        self._check(actual, expected)
+        outside = [item for item in created if item not in expected]
+        for _ in range(steps):
+            size = len(expected)
+            op = rng.randrange(9)
+            if op <= 1 and outside:
+                # 範囲外・負の位置も list と同じように扱う
+                item = outside.pop(rng.randrange(len(outside)))
+                index = rng.randint(-size - 3, size + 3)
+                actual.insert(index, item)
+                expected.insert(index, item)
+            elif op == 2 and outside:
+                item = outside.pop()
+                actual.append(item)
+                expected.append(item)
+            elif op == 3 and expected:
+                item = rng.choice(expected)
+                actual.remove(item)
+                expected.remove(item)
+                outside.append(item)
+            elif op == 4 and expected:
+                index = rng.randint(-size, size - 1)
+                item = actual.pop(index)
+                self.assertIs(item, expected.pop(index))
+                outside.append(item)
+            elif op == 5 and expected:
+                item = rng.choice(expected)
+                new_index = rng.randrange(size)
+                actual.move(item, new_index)
+                expected.remove(item)
+                expected.insert(new_index, item)
+            elif op == 6 and expected and outside:
+                index = rng.randint(-size, size - 1)
+                item = outside.pop()
+                outside.append(expected[index])
+                actual[index] = item
+                expected[index] = item
+            elif op == 7 and expected:
+                index = rng.randint(-size, size - 1)
+                outside.append(expected[index])
+                del actual[index]
+                del expected[index]
+            else:
+                start = rng.randint(-size - 2, size + 2)
+                stop = rng.randint(-size - 2, size + 2)
+                step = rng.choice([None, 1, 2, 3, -1, -2])
+                self.assertEqual(actual[start:stop:step], expected[start:stop:step])
+                self.assertEqual(actual[start:], expected[start:])
+                self.assertEqual(actual[:stop], expected[:stop])
+
+            self._check(actual, expected)
+            for index, item in enumerate(expected):
+                self.assertEqual(actual.index(item), index)
+                self.assertIs(actual[index], item)
+                self.assertIs(actual[index - len(expected)], item)
+                self.assertIn(item, actual)
+            for item in outside[:5]:
+                self.assertNotIn(item, actual)
+                with self.assertRaises(ValueError):
+                    actual.index(item)
+
+    def test_single_block(self):
+        """ブロックが1つの場合（通常の子の数）"""
+        for seed in range(5):
+            self._run(ChildList, seed)
+
+    def test_multiple_blocks(self):
+        """ブロックの分割・空になったブロックの削除が起きる場合"""
+        for seed in range(20):
+            self._run(SmallChildList, seed)
+
+class EdgeCaseTest(unittest.TestCase):
+    def test_empty(self):
+        """空のときの位置の指定・検索は list と同じ例外になる"""
+        children = SmallChildList()
+        self.assertEqual(list(children), [])
+        self.assertFalse(children)
+        self.assertEqual(children[0:5], [])
+        with self.assertRaises(IndexError):
+            children[0]
+        with self.assertRaises(IndexError):
+            children.pop()
+        with self.assertRaises(ValueError):
+            children.index(Item(0))
+        with self.assertRaises(ValueError):
+            children.remove(Item(0))
+
+    def test_out_of_range(self):
+        """範囲外の位置は IndexError になる"""
+        items = [Item(n) for n in range(20)]
+        children = SmallChildList(items)
+        for index in (20, -21):
+            with self.assertRaises(IndexError):
+                children[index]
+            with self.assertRaises(IndexError):
+                children.pop(index)
+            with self.assertRaises(IndexError):
+                children[index] = Item(99)
+
+    def test_delete_slice_and_clear(self):
+        """スライスでの削除と clear の後も検索できる"""
+        items = [Item(n) for n in range(30)]
+        children = SmallChildList(items)
+        del children[3:25:2]
+        del items[3:25:2]
+        self.assertEqual(list(children), items)
+        self.assertEqual([children.index(item) for item in items], list(range(len(items))))
+        children.clear()
+        self.assertEqual(list(children), [])
+        children.append(items[0])
+        self.assertEqual(children.index(items[0]), 0)
+
+if __name__ == "__main__":
+    unittest.main()
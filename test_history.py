@@ -0,0 +1,182 @@
+"""元に戻す・やり直す（history.UndoHistory）の確認
+
+    python -m unittest test_history
+"""
+import unittest
+from events import BatchBegin, BatchEnd
+from history import UndoHistory
+from models import MindMapModel
+
+def _build() -> tuple:
+    """ルートの下に A, B, C、A の下に A1 を持つモデルと、その履歴を作る"""
+    model = MindMapModel()
+    a = model.add_node(model.root, "A")
+    model.add_node(model.root, "B")
+    model.add_node(model.root, "C")
+    model.add_node(a, "A1")
+    return model, UndoHistory(model)
+
+class SingleEditTest(unittest.TestCase):
+    def _check_round_trip(self, model: MindMapModel, history: UndoHistory, edit):
+        before = model.save()
+        edit()
+        after = model.save()
+        self.assertNotEqual(after, before)
+        history.undo()
+        self.assertEqual(model.save(), before)
+        history.redo()
+        self.assertEqual(model.save(), after)
+
+    def test_edits(self):
+        """追加・テキスト・方向と色・削除・移動・折りたたみを、それぞれ元に戻す・やり直す"""
+        model, history = _build()
+        a, b, c = model.root.children
+        self._check_round_trip(model, history, lambda: model.add_node(b, "B1"))
+        self._check_round_trip(model, history, lambda: model.set_text(c, "C2"))
+        self._check_round_trip(model, history, lambda: model.set_style(c, "left", "#112233"))
+        self._check_round_trip(model, history, lambda: model.delete_nodes([a]))
+        self._check_round_trip(model, history, lambda: model.move_nodes([c], b))
+        self._check_round_trip(model, history, lambda: model.set_collapsed([b], True))
+
+    def test_focus(self):
+        """元に戻すと、変更のあったノード（追加の取り消しでは親）を返す"""
+        model, history = _build()
+        a, b, c = model.root.children
+        model.add_node(b, "B1")
+        self.assertIs(history.undo(), b)
+        model.set_text(c, "C2")
+        self.assertIs(history.undo(), c)
+        self.assertIsNone(history.undo())
+        self.assertFalse(history.can_undo)
+
+class BatchTest(unittest.TestCase):
+    def test_batch_is_one_step(self):
+        """一括操作は1回で元に戻り、1回でやり直される"""
+        model, history = _build()
+        a, b, c = model.root.children
+        before = model.save()
+        model.delete_nodes([a, c])
+        after = model.save()
+        history.undo()
+        self.assertEqual(model.save(), before)
+        self.assertEqual([n.text for n in model.root.children], ["A", "B", "C"])
+        self.assertFalse(history.can_undo)
+        history.redo()
+        self.assertEqual(model.save(), after)
+        self.assertFalse(history.can_redo)
+
+    def test_nested_batch(self):
+        """入れ子の一括操作も、外側の1回分として記録する"""
+        model, history = _build()
+        a, b, c = model.root.children
+        before = model.save()
+        with model.batch():
+            model.set_text(a, "A2")
+            with model.batch():
+                model.add_node(b, "B1")
+                model.set_collapsed([b], True)
+            model.move_nodes([c], a)
+        history.undo()
+        self.assertEqual(model.save(), before)
+        self.assertFalse(history.can_undo)
+
+    def test_empty_batch(self):
+        """何も変更しなかった一括操作は記録しない（やり直しの記録も残る）"""
+        model, history = _build()
+        model.set_text(model.root.children[0], "A2")
+        history.undo()
+        with model.batch():
+            model.set_text(model.root.children[0], "A")
+        self.assertFalse(history.can_undo)
+        self.assertTrue(history.can_redo)
+
+    def test_undo_published_as_batch(self):
+        """元に戻す操作も一括操作として通知される"""
+        model, history = _build()
+        model.delete_nodes(model.root.children[:2])
+        events = []
+        model.subscribe(events.append)
+        history.undo()
+        self.assertIsInstance(events[0], BatchBegin)
+        self.assertIsInstance(events[-1], BatchEnd)
+        self.assertEqual(len(events), 4)
+
+class DepthTest(unittest.TestCase):
+    def test_oldest_entries_are_dropped(self):
+        """depth 回を超えた古い操作から破棄する"""
+        model = MindMapModel()
+        node = model.add_node(model.root, "0")
+        history = UndoHistory(model, depth=3)
+        states = []
+        for i in range(1, 6):
+            states.append(model.save())
+            model.set_text(node, str(i))
+        for _ in range(3):
+            history.undo()
+        self.assertFalse(history.can_undo)
+        self.assertEqual(node.text, "2")
+        self.assertEqual(model.save(), states[2])
+        for _ in range(3):
+            history.redo()
+        self.assertEqual(node.text, "5")
+        self.assertFalse(history.can_redo)
+
+    def test_batches_count_as_one(self):
+        """一括操作は含むイベントの数によらず1回として数える"""
+        model, history = _build()
+        history.close()
+        history = UndoHistory(model, depth=2)
+        a, b, c = model.root.children
+        before = model.save()
+        model.delete_nodes([a, b, c])
+        model.add_node(model.root, "D")
+        history.undo()
+        history.undo()
+        self.assertEqual(model.save(), before)
+
+class ClearTest(unittest.TestCase):
+    def test_new_edit_clears_redo(self):
+        """元に戻した後に編集すると、やり直しの記録は破棄される"""
+        model, history = _build()
+        a = model.root.children[0]
+        model.set_text(a, "A2")
+        history.undo()
+        self.assertTrue(history.can_redo)
+        model.set_text(a, "A3")
+        self.assertFalse(history.can_redo)
+        self.assertIsNone(history.redo())
+        self.assertEqual(a.text, "A3")
+
+    def test_load_clears_history(self):
+        """文書を読み込むと、記録を止めている間でも履歴を破棄する"""
+        model, history = _build()
+        data = model.save()
+        model.set_text(model.root.children[0], "A2")
+        history.undo()
+        model.set_text(model.root.children[0], "A3")
+        with history.suspended():
+            model.load(data)
+        self.assertFalse(history.can_undo)
+        self.assertFalse(history.can_redo)
+
+    def test_suspended(self):
+        """記録を止めている間の変更は元に戻す対象にならない"""
+        model, history = _build()
+        a = model.root.children[0]
+        model.set_text(a, "A2")
+        with history.suspended():
+            model.add_node(a, "A3")
+        history.undo()
+        self.assertEqual(a.text, "A")
+        self.assertEqual([n.text for n in a.children], ["A1", "A3"])
+        self.assertFalse(history.can_undo)
+
+    def test_close(self):
+        """close() の後の変更は記録しない"""
+        model, history = _build()
+        history.close()
+        model.set_text(model.root.children[0], "A2")
+        self.assertFalse(history.can_undo)
+
+if __name__ == "__main__":
+    unittest.main()
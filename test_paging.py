@@ -0,0 +1,141 @@
+"""子の多いノードの表示範囲（paging.ChildWindows）の確認
+
+    python -m unittest test_paging
+"""
+import unittest
+from models import MindMapModel
+from paging import ChildWindows, Placeholder
+
+PAGE_SIZE = 5
+
+def _build(count: int) -> tuple:
+    """ルートの下に count 個の子を持つモデルを作る"""
+    model = MindMapModel()
+    children = [model.add_node(model.root, f"c{i}") for i in range(count)]
+    return model, children
+
+def _layout(windows: ChildWindows, node) -> list:
+    """配置される子を、子はテキスト、プレースホルダーは (種類, 隠れている件数) で返す"""
+    return [(item.kind, item.hidden_count) if isinstance(item, Placeholder) else item.text
+            for item in windows.visible_children(node)]
+
+class WindowEdgeTest(unittest.TestCase):
+    def test_few_children(self):
+        """子が page_size 以下ならすべて配置し、プレースホルダーは作らない"""
+        model, children = _build(PAGE_SIZE)
+        windows = ChildWindows(PAGE_SIZE)
+        self.assertIs(windows.visible_children(model.root), model.root.children)
+        self.assertEqual(windows.window(model.root), (0, PAGE_SIZE))
+
+    def test_one_over_page_size(self):
+        """page_size を1つ超えると、最後の子がプレースホルダーになる"""
+        model, children = _build(PAGE_SIZE + 1)
+        windows = ChildWindows(PAGE_SIZE)
+        self.assertEqual(_layout(windows, model.root), ["c0", "c1", "c2", "c3", "c4", ("after", 1)])
+        self.assertTrue(windows.is_visible(children[4]))
+        self.assertFalse(windows.is_visible(children[5]))
+
+    def test_reveal_last_and_first(self):
+        """範囲の後ろへ移ると末尾で止まり、前へ戻ると先頭から始まる"""
+        model, children = _build(12)
+        windows = ChildWindows(PAGE_SIZE)
+        self.assertTrue(windows.reveal(children[11]))
+        self.assertEqual(windows.window(model.root), (7, 12))
+        self.assertEqual(_layout(windows, model.root), [("before", 7), "c7", "c8", "c9", "c10", "c11"])
+        self.assertFalse(windows.reveal(children[7]))
+
+        self.assertTrue(windows.reveal(children[0]))
+        self.assertEqual(windows.window(model.root), (0, 5))
+
+    def test_reveal_next_and_previous(self):
+        """範囲のすぐ後ろの子はその子が先頭に、すぐ前の子はその子が末尾になる"""
+        model, children = _build(12)
+        windows = ChildWindows(PAGE_SIZE)
+        windows.reveal(children[5])
+        self.assertEqual(windows.window(model.root), (5, 10))
+        self.assertEqual(_layout(windows, model.root),
+                         [("before", 5), "c5", "c6", "c7", "c8", "c9", ("after", 2)])
+        windows.reveal(children[4])
+        self.assertEqual(windows.window(model.root), (0, 5))
+
+    def test_page(self):
+        """プレースホルダーで次・前のページへ移り、範囲の端を越えた隣の子を返す"""
+        model, children = _build(12)
+        windows = ChildWindows(PAGE_SIZE)
+        after = windows.visible_children(model.root)[-1]
+        self.assertIs(windows.page(after), children[5])
+        self.assertEqual(windows.window(model.root), (5, 10))
+
+        before = windows.visible_children(model.root)[0]
+        self.assertIs(windows.page(before), children[4])
+        self.assertEqual(windows.window(model.root), (0, 5))
+
+    def test_open(self):
+        """プレースホルダーを開くと、その側に1ページ分だけ範囲が広がる"""
+        model, children = _build(12)
+        windows = ChildWindows(PAGE_SIZE)
+        windows.reveal(children[11])
+        before = windows.visible_children(model.root)[0]
+        self.assertIs(windows.open(before), children[6])
+        self.assertEqual(windows.window(model.root), (2, 12))
+        self.assertEqual(_layout(windows, model.root)[0], ("before", 2))
+
+        before = windows.visible_children(model.root)[0]
+        self.assertIs(windows.open(before), children[1])
+        self.assertEqual(windows.window(model.root), (0, 12))
+        self.assertEqual(_layout(windows, model.root), [f"c{i}" for i in range(12)])
+
+    def test_children_removed(self):
+        """子が減ると、範囲は末尾に合わせて前へずれる"""
+        model, children = _build(12)
+        windows = ChildWindows(PAGE_SIZE)
+        windows.reveal(children[11])
+        for child in children[:3]:
+            model.remove_subtree(child)
+        self.assertEqual(windows.window(model.root), (4, 9))
+        self.assertEqual(_layout(windows, model.root), [("before", 4), "c7", "c8", "c9", "c10", "c11"])
+
+    def test_placeholder_reused(self):
+        """プレースホルダーは同じオブジェクトを使い回し、件数に合わせて表示を変える"""
+        model, children = _build(12)
+        windows = ChildWindows(PAGE_SIZE)
+        after = windows.visible_children(model.root)[-1]
+        self.assertIs(windows.placeholder(after.id), after)
+        self.assertEqual(after.text, "▼ 他 7 件")
+        windows.reveal(children[5])
+        self.assertIs(windows.visible_children(model.root)[-1], after)
+        self.assertEqual(after.text, "▼ 他 2 件")
+
+class NestedWindowTest(unittest.TestCase):
+    def test_reveal_ancestors(self):
+        """孫を表示すると、祖先の表示範囲もずれ、祖先のレイアウトの記録が破棄される"""
+        model, children = _build(12)
+        grandchildren = [model.add_node(children[8], f"g{i}") for i in range(12)]
+        windows = ChildWindows(PAGE_SIZE)
+        target = grandchildren[10]
+        self.assertFalse(windows.is_visible(target))
+
+        model.root._layout_key = children[8]._layout_key = "cached"
+        self.assertTrue(windows.reveal(target))
+        self.assertTrue(windows.is_visible(target))
+        self.assertEqual(windows.window(model.root), (7, 12))
+        self.assertEqual(windows.window(children[8]), (7, 12))
+        self.assertIsNone(model.root._layout_key)
+        self.assertIsNone(children[8]._layout_key)
+
+    def test_snapshot_restore(self):
+        """snapshot() の状態を別のインスタンスに復元すると、同じ範囲になる"""
+        model, children = _build(12)
+        grandchildren = [model.add_node(children[3], f"g{i}") for i in range(8)]
+        windows = ChildWindows(PAGE_SIZE)
+        windows.reveal(grandchildren[6])
+        state = windows.snapshot()
+
+        restored = ChildWindows(PAGE_SIZE)
+        restored.restore(state)
+        for node in (model.root, children[3]):
+            self.assertEqual(restored.window(node), windows.window(node))
+            self.assertEqual(_layout(restored, node), _layout(windows, node))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+"""同期（sync.SyncSession）の収束の確認
+
+    python -m unittest test_sync
+"""
+import unittest
+from history import UndoHistory
+from models import MindMapModel
+from relay import LocalRelay
+from sync import SyncSession
+
+def _base_document() -> dict:
+    model = MindMapModel()
+    model.add_node(model.root, "n")
+    model.add_node(model.root, "other")
+    return model.save()
+
+def _join(relay: LocalRelay, data: dict, site_id: str, transport=None) -> SyncSession:
+    """同じ文書を持つ参加者を作る（参加時の文書の受け渡しは省く）"""
+    model = MindMapModel()
+    model.load(data)
+    session = SyncSession(model, transport or relay.connect(), site_id=site_id)
+    session._established = True
+    return session
+
+def _poll_all(sessions, rounds=4):
+    for _ in range(rounds):
+        for session in sessions:
+            session.poll()
+
+class LateOperationTest(unittest.TestCase):
+    """保持している操作の件数を超えて遅れて届いた操作も、全順序どおりに収束するか"""
+    LOG_SIZE = 20
+    EDITS = 25
+
+    def _edit_concurrently(self, a: SyncSession, b: SyncSession):
+        # A と B が同時に n を変更し、B はそのまま別のノードを何度も変更する（A の操作はまだ届いていない）
+        a.model.set_text(a.model.root.children[0], "A")
+        n, other = b.model.root.children
+        b.model.set_text(n, "B0")
+        for i in range(self.EDITS):
+            b.model.set_text(other, f"other {i}")
+        _poll_all([a, b])
+
+        self.assertEqual(a.model.save(), b.model.save())
+        # 同じ時刻の変更はサイトIDの大きい方（B）が勝つ
+        self.assertEqual(a.model.root.children[0].text, "B0")
+        self.assertEqual(a.model.root.children[1].text, f"other {self.EDITS - 1}")
+
+    def test_known_site_keeps_operations(self):
+        """相手の参加を知っていれば、相手の時刻が過ぎるまで操作を破棄しない"""
+        relay, data = LocalRelay(), _base_document()
+        transports = [relay.connect(), relay.connect()] # 互いの hello が届くよう先に接続する
+        a = _join(relay, data, "A", transports[0])
+        b = _join(relay, data, "B", transports[1])
+        a.LOG_SIZE = b.LOG_SIZE = self.LOG_SIZE
+        b.poll()
+        self._edit_concurrently(a, b)
+        self.assertGreater(len(b._log), self.LOG_SIZE)
+
+    def test_unknown_site_resyncs(self):
+        """参加を知らない相手から破棄済みの範囲の操作が届いた場合は、文書全体を受け取り直す"""
+        relay, data = LocalRelay(), _base_document()
+        a = _join(relay, data, "A") # B の接続前に参加したため、B は A を知らない
+        b = _join(relay, data, "B")
+        a.LOG_SIZE = b.LOG_SIZE = self.LOG_SIZE
+        self._edit_concurrently(a, b)
+        self.assertLessEqual(len(b._log), self.LOG_SIZE + 1)
+
+class StyleTest(unittest.TestCase):
+    def test_style_change_is_synced_and_undoable(self):
+        """方向・色の変更が他の参加者に届き、取り消しも届く"""
+        relay, data = LocalRelay(), _base_document()
+        transports = [relay.connect(), relay.connect()]
+        a = _join(relay, data, "A", transports[0])
+        b = _join(relay, data, "B", transports[1])
+        n = a.model.root.children[0]
+        a.model.set_style(n, "left", "#ff0000")
+        _poll_all([a, b])
+        self.assertEqual((b.model.root.children[0].direction, b.model.root.children[0].color), ("left", "#ff0000"))
+
+        history = UndoHistory(a.model)
+        a.model.set_style(n, "right", None)
+        history.undo()
+        _poll_all([a, b])
+        self.assertEqual((n.direction, n.color), ("left", "#ff0000"))
+        self.assertEqual(a.model.save(), b.model.save())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+"""外部での変更の差分適用（tree_diff.apply_tree_diff）の確認
+
+    python -m unittest test_tree_diff
+"""
+import copy
+import random
+import unittest
+from history import UndoHistory
+from models import MindMapModel
+from traversal import preorder
+from tree_diff import apply_tree_diff
+
+def _shape(model: MindMapModel) -> list:
+    return [(child.text, [c.text for c in child.children]) for child in model.root.children]
+
+def _data_children(node_data: dict) -> list:
+    return node_data["children"]
+
+def _outline(data: dict) -> list:
+    """比較用に、保存形式の辞書を前順の (id, テキスト, 方向, 色, 子のid) の一覧にする"""
+    return [(d["id"], d["text"], d.get("direction"), d.get("color"), [c["id"] for c in d["children"]])
+            for d in preorder(data, _data_children)]
+
+def _build_model(*texts_and_parents) -> tuple:
+    """(テキスト, 親の番号) の並びからモデルを作る（番号0がルート）"""
+    model = MindMapModel()
+    nodes = [model.root]
+    for text, parent in texts_and_parents:
+        nodes.append(model.add_node(nodes[parent], text))
+    return model, nodes
+
+class ApplyDiffTest(unittest.TestCase):
+    def _round_trip(self, model: MindMapModel, new_data: dict) -> list:
+        """差分を適用し、元に戻す・やり直すと前後の内容に一致することを確認する"""
+        history = UndoHistory(model)
+        before = model.save()
+        changes = apply_tree_diff(model, new_data)
+        self.assertIsNotNone(changes)
+        self.assertEqual(_outline(model.save()), _outline(new_data))
+        history.undo()
+        self.assertEqual(_outline(model.save()), _outline(before))
+        self.assertFalse(history.can_undo)
+        history.redo()
+        self.assertEqual(_outline(model.save()), _outline(new_data))
+        return changes
+
+    def test_insert(self):
+        """新しいノードの挿入"""
+        model, nodes = _build_model(("A", 0), ("B", 0))
+        data = model.save()
+        data["children"].insert(1, {"id": "new", "text": "N", "children": []})
+        changes = self._round_trip(model, data)
+        self.assertEqual([kind for kind, *_ in changes], ["insert"])
+        self.assertEqual([c.text for c in model.root.children], ["A", "N", "B"])
+
+    def test_delete(self):
+        """ノードの削除（子孫ごと）"""
+        model, nodes = _build_model(("A", 0), ("B", 0), ("C", 1))
+        data = model.save()
+        del data["children"][0]
+        changes = self._round_trip(model, data)
+        self.assertEqual([(kind, node.text) for kind, node, *_ in changes], [("delete", "A")])
+
+    def test_move_and_reorder(self):
+        """別の親への移動と兄弟間の並べ替え"""
+        model, nodes = _build_model(("A", 0), ("B", 0), ("C", 0), ("D", 1))
+        data = model.save()
+        a, b, c = data["children"]
+        data["children"] = [c, a, b]
+        b["children"].append(a["children"].pop())
+        self._round_trip(model, data)
+        self.assertEqual(_shape(model), [("C", []), ("A", []), ("B", ["D"])])
+
+    def test_update_attributes(self):
+        """テキスト・方向・色の変更（ノードは作り直さない）"""
+        model, nodes = _build_model(("A", 0), ("B", 1))
+        data = model.save()
+        a_data = data["children"][0]
+        a_data["text"] = "A2"
+        a_data["direction"] = "left"
+        a_data["children"][0]["color"] = "#112233"
+        changes = self._round_trip(model, data)
+        self.assertEqual([(kind, node.text) for kind, node, *_ in changes], [("update", "A2"), ("update", "B")])
+        self.assertIs(model.root.children[0], nodes[1])
+        self.assertEqual(nodes[2].color, "#112233")
+
+    def test_collapsed_is_not_applied(self):
+        """折りたたみ状態は既存のノードには反映しない"""
+        model, nodes = _build_model(("A", 0), ("B", 1))
+        data = model.save()
+        data["children"][0]["collapsed"] = True
+        self.assertEqual(apply_tree_diff(model, data), [])
+        self.assertFalse(nodes[1].collapsed)
+
+    def test_not_representable(self):
+        """ルートのIDが異なる・IDが欠けている・重複している場合はNoneを返し、何も変更しない"""
+        model, nodes = _build_model(("A", 0), ("B", 0))
+        before = _outline(model.save())
+
+        data = model.save()
+        data["id"] = "other"
+        self.assertIsNone(apply_tree_diff(model, data))
+
+        data = model.save()
+        del data["children"][0]["id"]
+        self.assertIsNone(apply_tree_diff(model, data))
+
+        data = model.save()
+        data["children"][1]["id"] = data["children"][0]["id"]
+        self.assertIsNone(apply_tree_diff(model, data))
+        self.assertEqual(_outline(model.save()), before)
+
+    def test_random_edits(self):
+        """無作為な挿入・削除・移動・変更の組み合わせでも、適用と元に戻す・やり直すが一致する"""
+        for seed in range(300):
+            with self.subTest(seed=seed):
+                rng = random.Random(seed)
+                model, nodes = _build_model()
+                for i in range(rng.randint(1, 20)):
+                    nodes.append(model.add_node(rng.choice(nodes), f"n{i}"))
+                data = copy.deepcopy(model.save())
+                for step in range(rng.randint(1, 6)):
+                    _random_edit(rng, data, f"new{seed}-{step}")
+                self._round_trip(model, data)
+
+def _random_edit(rng: random.Random, data: dict, new_id: str):
+    """保存形式の辞書に、外部のツールが行うような変更を1つ加える"""
+    flat = list(preorder(data, _data_children))
+    parent_of = {id(c): p for p in flat for c in p["children"]}
+    op = rng.randrange(4)
+    if op == 0 and len(flat) > 1:
+        # 削除（子孫の一部は削除せずに別の場所へ移す）
+        node_data = rng.choice(flat[1:])
+        parent_of[id(node_data)]["children"].remove(node_data)
+        rest = list(preorder(data, _data_children))
+        for owner in list(preorder(node_data, _data_children)):
+            for child in list(owner["children"]):
+                if rng.random() < 0.4:
+                    owner["children"].remove(child)
+                    target = rng.choice(rest)
+                    target["children"].insert(rng.randint(0, len(target["children"])), child)
+                    rest = list(preorder(data, _data_children))
+    elif op == 1 and len(flat) > 1:
+        # 移動（自分の子孫の下へは移動しない）
+        node_data = rng.choice(flat[1:])
+        subtree = {id(d) for d in preorder(node_data, _data_children)}
+        targets = [d for d in flat if id(d) not in subtree]
+        parent_of[id(node_data)]["children"].remove(node_data)
+        target = rng.choice(targets)
+        target["children"].insert(rng.randint(0, len(target["children"])), node_data)
+    elif op == 2:
+        target = rng.choice(flat)
+        target["children"].insert(rng.randint(0, len(target["children"])),
+                                  {"id": new_id, "text": "x", "direction": None, "color": None,
+                                   "collapsed": False, "children": []})
+    else:
+        node_data = rng.choice(flat)
+        node_data["text"] += "!"
+        node_data["color"] = rng.choice([None, "#112233"])
+
+class UndoAfterDiffTest(unittest.TestCase):
+    def test_move_out_of_deleted_parent(self):
+        """削除されたノードの子が別のノードへ移動された差分を元に戻すと、子も元の親に戻る"""
+        model = MindMapModel()
+        p = model.add_node(model.root, "P")
+        model.add_node(model.root, "Q")
+        model.add_node(p, "X")
+        history = UndoHistory(model)
+
+        data = model.save()
+        p_data, q_data = data["children"]
+        q_data["children"] = p_data["children"]
+        data["children"] = [q_data]
+        apply_tree_diff(model, data)
+        self.assertEqual(_shape(model), [("Q", ["X"])])
+
+        history.undo()
+        self.assertEqual(_shape(model), [("P", ["X"]), ("Q", [])])
+        history.redo()
+        self.assertEqual(_shape(model), [("Q", ["X"])])
+
+if __name__ == "__main__":
+    unittest.main()
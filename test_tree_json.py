@@ -0,0 +1,44 @@
+"""深いツリーのJSONの書き出し・読み込み（tree_json）の確認
+
+    python -m unittest test_tree_json
+"""
+import json
+import unittest
+import tree_json
+from benchmarks import build_chain_data
+
+class TreeJsonTest(unittest.TestCase):
+    def test_same_as_json_module(self):
+        """浅いデータでは標準の json と同じ文字列・値になる"""
+        data = {"text": "日本語\n\"", "n": [1, -2.5, 1e100, None, True, False, []], "d": {}, "children": [{"a": "b"}]}
+        for options in ({}, {"indent": 4, "ensure_ascii": False}, {"separators": (",", ":")}):
+            text = json.dumps(data, **options)
+            self.assertEqual("".join(tree_json._encode(data, options.get("indent"), options.get("separators"),
+                                                       options.get("ensure_ascii", True))), text)
+            self.assertEqual(tree_json._decode(text), data)
+
+    def test_deep_round_trip(self):
+        """Pythonの再帰の上限を超える深さでも書き出し・読み込みできる"""
+        depth = 20000
+        for options in ({"indent": 4, "ensure_ascii": False}, {"separators": (",", ":")}):
+            data = tree_json.loads(tree_json.dumps(build_chain_data(depth), **options))
+            count = 0
+            while data["children"]:
+                data = data["children"][0]
+                count += 1
+            self.assertEqual(count, depth)
+            self.assertEqual(data["text"], f"深さ{depth - 1}")
+
+    def test_indent_is_limited(self):
+        """字下げは INDENT_LIMIT 段まで"""
+        text = tree_json.dumps(build_chain_data(100), indent=1)
+        self.assertEqual(max(len(line) - len(line.lstrip(" ")) for line in text.splitlines()),
+                         tree_json.INDENT_LIMIT)
+
+    def test_invalid_json(self):
+        for text in ("", "[1,]", '{"a" 1}', "[1 2]", "[1]x", "["):
+            with self.assertRaises(ValueError):
+                tree_json._decode(text)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,257 @@
+from typing import Dict, List, Optional, Tuple
+from layout import LayoutEngine
+from models import Node
+from traversal import Batches, preorder
+
+INF = float("inf")
+
+# 輪郭(contour)はサブツリーの左端(接続側の端)からの距離xに対する上端・下端の区分関数。
+# ノード1つが占める区間は、子を展開しているノードでは [開始, 開始 + 幅 + h_margin)（子はその終わりから始まる）、
+# それ以外では [開始, 開始 + 幅)（折りたたみアイコンの分を含む）。
+#
+# サブツリーの輪郭は、Reingold–Tilford 法を可変サイズのノードへ拡張した van der Ploeg の方法
+# （Drawing Non-layered Tidy Trees in Linear Time）と同じく、輪郭上のノードの連なりとして表す。
+# 上端の輪郭は「先頭の子」、下端は「末尾の子」をたどり、子のないノードから先は、兄弟を詰めた時に
+# 張るスレッド（より深くまで続く兄弟のサブツリーの輪郭上のノードへの参照）をたどる。
+# 兄弟を詰める際は、重なる範囲の輪郭だけを短い方が尽きるまでたどればよく、輪郭を複製・結合しないため
+# 配置全体でノード数に比例した時間で済む（深い鎖状のツリーでもノード1つあたりの処理は一定）。
+#
+# ルートの子のセクター（上・中・下）を詰める処理だけは、セクターごとの輪郭を
+# [(区間の終わりのx, 上端y, 下端y), ...] をxの昇順に並べたリストとして取り出して比較する。
+# 区間は x=0 から隙間なく連続し、何もない区間は上端=+inf, 下端=-inf とする。
+
+def _separation(upper: list, lower: list) -> float:
+    """upper と重ならないために lower を下げる必要がある最小量（重なる区間がなければ -inf）"""
+    sep = -INF
+    i = j = 0
+    while i < len(upper) and j < len(lower):
+        u_end, _, u_bottom = upper[i]
+        l_end, l_top, _ = lower[j]
+        if u_bottom > -INF and l_top < INF:
+            sep = max(sep, u_bottom - l_top)
+        if u_end <= l_end: i += 1
+        if l_end <= u_end: j += 1
+    return sep
+
+def _merge(a: list, dy_a: float, b: list, dy_b: float) -> list:
+    """2つの輪郭をそれぞれy方向にずらして重ね合わせる"""
+    result = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        a_end, a_top, a_bottom = a[i]
+        b_end, b_top, b_bottom = b[j]
+        result.append((min(a_end, b_end), min(a_top + dy_a, b_top + dy_b), max(a_bottom + dy_a, b_bottom + dy_b)))
+        if a_end <= b_end: i += 1
+        if b_end <= a_end: j += 1
+    for end, top, bottom in a[i:]:
+        result.append((end, top + dy_a, bottom + dy_a))
+    for end, top, bottom in b[j:]:
+        result.append((end, top + dy_b, bottom + dy_b))
+    return result
+
+# 輪郭上の位置: (ノード, ノードの区間の開始x, ノードのy)。座標は比較しているサブツリー（兄弟の並び）が基準
+_Cursor = Tuple[Optional[Node], float, float]
+# サブツリーの端（輪郭の最後のノード）: (上端のノード, x, y, 下端のノード, x, y)。サブツリーの根が基準
+_Extremes = Tuple[Node, float, float, Node, float, float]
+
+class TidyLayoutEngine(LayoutEngine):
+    """輪郭(contour)ベースのTidy Treeアルゴリズムによるレイアウト
+
+    サブツリー全体の外接矩形を積み上げる LayoutEngine と異なり、兄弟のサブツリーは
+    互いの輪郭が重ならない範囲で隙間に入り込むため、深く細い枝があってもマップが縦に伸びない。
+    左右への振り分けとルートの子の上中下3セクター配置は LayoutEngine と同じ。
+    輪郭はスレッドでつないだノードの連なりで表すため、計算量はノード数に比例する。
+    """
+    def __init__(self):
+        super().__init__()
+        self._offsets: Dict[str, float] = {} # node_id -> 親(またはセクター基準)からのy方向の相対位置
+        # 以下は配置の計算中だけ使う（node_id をキーとする）
+        self._shapes: Dict[str, tuple] = {}   # (区間の長さ, 上端, 下端, 展開している子の一覧 or None)。上端・下端はノードのyが基準
+        self._extremes: Dict[str, _Extremes] = {}
+        self._top_threads: Dict[str, tuple] = {}    # 子のないノード -> (上端の輪郭の次のノード, dx, dy)
+        self._bottom_threads: Dict[str, tuple] = {} # 子のないノード -> (下端の輪郭の次のノード, dx, dy)
+
+    def _place_root_children(self, root: Node, recursive: bool, batches: Batches):
+        children = self.laid_out_children(root)
+        right_all = [c for c in children if c.side == 'right']
+        left_all = [c for c in children if c.side == 'left']
+        r_groups = self._group_and_sort(right_all)
+        l_groups = self._group_and_sort(left_all)
+
+        self._offsets.clear()
+        for side, groups in [('right', r_groups), ('left', l_groups)]:
+            for nodes in groups.values():
+                for node in nodes:
+                    yield from self._build_contours(node, batches)
+
+            # 中央セクターをルートの高さに揃え、上部・下部セクターをその上下に輪郭で詰めて配置
+            mid = self._group_contour(groups[2])
+            top = self._group_contour(groups[0])
+            btm = self._group_contour(groups[1])
+            placed = mid
+
+            if groups[0]:
+                sep = _separation(top, placed) if placed else -INF
+                dy_top = -max(sep + self.v_gap, root.height/2 + self.v_gap + top[0][2])
+                self._shift_group(groups[0], dy_top)
+                placed = _merge(placed, 0, top, dy_top) if placed else [(e, t + dy_top, b + dy_top) for e, t, b in top]
+            if groups[1]:
+                sep = _separation(placed, btm) if placed else -INF
+                dy_btm = max(sep + self.v_gap, root.height/2 + self.v_gap - btm[0][1])
+                self._shift_group(groups[1], dy_btm)
+
+            if recursive:
+                for nodes in groups.values():
+                    for node in nodes:
+                        node.y = root.y + self._offsets[node.id]
+                        yield from self._place_subtree(node, root, side, batches)
+
+        for table in (self._shapes, self._extremes, self._top_threads, self._bottom_threads):
+            table.clear()
+        return r_groups, l_groups
+
+    def _build_contours(self, top_node: Node, batches: Batches):
+        """サブツリーの輪郭と子の相対位置を後順に計算する"""
+        collapsed = lambda n: not self.is_expanded(n)
+        # 前順を逆にたどると、子がすべて親より先になる
+        order = []
+        for node in preorder(top_node, self.laid_out_children, collapsed):
+            order.append(node)
+            if batches.tick(): yield
+        for node in reversed(order):
+            if batches.tick(): yield
+            h = node.height
+            if not node.children or not self.is_expanded(node):
+                # 折りたたみアイコンの分だけ右へ広げる
+                w = node.width + (20 if node.children else 0)
+                self._shapes[node.id] = (w, -h/2, h/2, None)
+                self._extremes[node.id] = (node, 0.0, 0.0, node, 0.0, 0.0)
+                continue
+
+            children = self.laid_out_children(node)
+            t_node, t_x, t_y, b_node, b_x, b_y = self._stack_siblings(children)
+            first, last = children[0], children[-1]
+            reach = node.width + self.h_margin
+            # 自身のボックスと、子への接続線が通る範囲を自身の区間とする
+            top = min(-h/2, self._offsets[first.id] + first.height/2)
+            bottom = max(h/2, self._offsets[last.id] + last.height/2)
+            self._shapes[node.id] = (reach, top, bottom, children)
+            self._extremes[node.id] = (t_node, t_x + reach, t_y, b_node, b_x + reach, b_y)
+
+    def _next_top(self, node: Node, x: float, y: float) -> _Cursor:
+        span, _, _, children = self._shapes[node.id]
+        if children:
+            child = children[0]
+            return child, x + span, y + self._offsets[child.id]
+        thread = self._top_threads.get(node.id)
+        if thread is None:
+            return None, x, y
+        target, dx, dy = thread
+        return target, x + dx, y + dy
+
+    def _next_bottom(self, node: Node, x: float, y: float) -> _Cursor:
+        span, _, _, children = self._shapes[node.id]
+        if children:
+            child = children[-1]
+            return child, x + span, y + self._offsets[child.id]
+        thread = self._bottom_threads.get(node.id)
+        if thread is None:
+            return None, x, y
+        target, dx, dy = thread
+        return target, x + dx, y + dy
+
+    def _stack_siblings(self, nodes: List[Node]) -> _Extremes:
+        """兄弟を輪郭が重ならないように上から詰め、中央揃えにした相対位置を設定する
+
+        それまでに詰めた兄弟の下端の輪郭と、次の兄弟の上端の輪郭を、どちらかが尽きるまで並べてたどる。
+        短い方の端からは、長い方の輪郭の続きへスレッドを張る。
+        戻り値は兄弟全体の輪郭の端（先頭の兄弟の開始位置・中央揃え後の位置が基準）。
+        """
+        shapes, spacing_y = self._shapes, self.spacing_y
+        offsets = [0.0]
+        t_node, t_x, t_y, b_node, b_x, b_y = self._extremes[nodes[0].id]
+        for i in range(1, len(nodes)):
+            node = nodes[i]
+            # 直前の兄弟の位置から始め、輪郭が重なるたびに必要な分だけ下げる
+            y = offsets[-1]
+            sr, sr_x, sr_y = nodes[i - 1], 0.0, offsets[-1] # 詰めた兄弟の下端の輪郭
+            cl, cl_x, cl_y = node, 0.0, 0.0                 # 次の兄弟の上端の輪郭（yは node が基準）
+            while sr is not None and cl is not None:
+                sr_span, _, sr_bottom, _ = shapes[sr.id]
+                cl_span, cl_top, _, _ = shapes[cl.id]
+                need = sr_y + sr_bottom - (y + cl_y + cl_top) + spacing_y
+                if need > 0:
+                    y += need
+                sr_end, cl_end = sr_x + sr_span, cl_x + cl_span
+                if sr_end <= cl_end:
+                    sr, sr_x, sr_y = self._next_bottom(sr, sr_x, sr_y)
+                if cl_end <= sr_end:
+                    cl, cl_x, cl_y = self._next_top(cl, cl_x, cl_y)
+            offsets.append(y)
+
+            e_t_node, e_t_x, e_t_y, e_b_node, e_b_x, e_b_y = self._extremes[node.id]
+            if sr is None and cl is not None:
+                # 新しい兄弟の方が深い: 全体の上端の輪郭は、端から新しい兄弟の輪郭の続きへつながる
+                self._top_threads[t_node.id] = (cl, cl_x - t_x, y + cl_y - t_y)
+                t_node, t_x, t_y = e_t_node, e_t_x, y + e_t_y
+                b_node, b_x, b_y = e_b_node, e_b_x, y + e_b_y
+            elif sr is not None:
+                # 詰めた兄弟の方が深い: 新しい兄弟の下端の輪郭は、端から詰めた兄弟の輪郭の続きへつながる
+                self._bottom_threads[e_b_node.id] = (sr, sr_x - e_b_x, sr_y - (y + e_b_y))
+            else:
+                b_node, b_x, b_y = e_b_node, e_b_x, y + e_b_y
+
+        mid = (offsets[0] + offsets[-1]) / 2
+        for node, dy in zip(nodes, offsets):
+            self._offsets[node.id] = dy - mid
+        return t_node, t_x, t_y - mid, b_node, b_x, b_y - mid
+
+    def _group_contour(self, nodes: List[Node]) -> list:
+        """兄弟を詰め、全体の輪郭を [(区間の終わりのx, 上端y, 下端y), ...] として返す（セクターの比較用）"""
+        if not nodes:
+            return []
+        self._stack_siblings(nodes)
+        tops = self._contour_walk(nodes[0], self._next_top, 1)
+        bottoms = self._contour_walk(nodes[-1], self._next_bottom, 2)
+        contour = []
+        i = j = 0
+        while i < len(tops) and j < len(bottoms):
+            t_end, top = tops[i]
+            b_end, bottom = bottoms[j]
+            contour.append((min(t_end, b_end), top, bottom))
+            if t_end <= b_end: i += 1
+            if b_end <= t_end: j += 1
+        contour.extend((end, top, -INF) for end, top in tops[i:])
+        contour.extend((end, INF, bottom) for end, bottom in bottoms[j:])
+        return contour
+
+    def _contour_walk(self, node: Node, step, field: int) -> list:
+        """輪郭を端までたどり、[(区間の終わりのx, 上端または下端のy), ...] を返す"""
+        result = []
+        x, y = 0.0, self._offsets[node.id]
+        while node is not None:
+            shape = self._shapes[node.id]
+            result.append((x + shape[0], y + shape[field]))
+            node, x, y = step(node, x, y)
+        return result
+
+    def _shift_group(self, nodes: List[Node], dy: float):
+        for node in nodes:
+            self._offsets[node.id] += dy
+
+    def _place_subtree(self, top_node: Node, parent: Node, direction: str, batches: Batches):
+        """相対位置から絶対座標を前順で確定する"""
+        collapsed = lambda n: not self.is_expanded(n)
+        for node in preorder(top_node, self.laid_out_children, collapsed):
+            if batches.tick(): yield
+            p = parent if node is top_node else node.parent
+            if direction == 'right':
+                node.x = p.x + p.width/2 + self.h_margin + node.width/2
+            else:
+                node.x = p.x - p.width/2 - self.h_margin - node.width/2
+            if node is not top_node:
+                node.y = p.y + self._offsets[node.id]
+
+    def reflow_node(self, node: Node, width, height):
+        """輪郭は部分的に更新できないため、ライブ再配置は行わない"""
+        return None
@@ -0,0 +1,131 @@
+import functools
+import json
+import os
+import signal
+import tempfile
+import threading
+import time
+from collections import deque
+
+class Tracer:
+    """処理時間の区間(span)をリングバッファに記録し、Chromeのtrace-event形式(JSON)で書き出すクラス
+
+    無効な間は traced() を付けた関数でもフラグを1回確認するだけで、記録は行わない。
+    バッファには新しい方から BUFFER_SIZE 件だけを保持する。
+    書き出したファイルは chrome://tracing や Perfetto で表示できる。
+    """
+    BUFFER_SIZE = 200000
+
+    def __init__(self):
+        self.enabled = False
+        self.events = deque(maxlen=self.BUFFER_SIZE) # (名前, 種類, 開始[µs], 長さ[µs], スレッドID, 引数)
+
+    def enable(self, enabled: bool = True):
+        self.enabled = enabled
+
+    def span(self, name: str, **args) -> "_Span":
+        """with文で囲んだ区間を記録する"""
+        return _Span(self, name, args)
+
+    def record(self, name: str, start_us: int, duration_us: int, args=None, category: str = "pymind"):
+        self.events.append((name, category, start_us, duration_us, threading.get_native_id(), args))
+
+    def dump(self, file_path: str) -> int:
+        """バッファの内容をtrace-event形式で書き出し、書き出した件数を返す"""
+        pid = os.getpid()
+        events = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": "pymind"}}]
+        for name, category, start, duration, tid, args in list(self.events):
+            event = {"name": name, "cat": category, "ph": "X", "ts": start, "dur": duration, "pid": pid, "tid": tid}
+            if args:
+                event["args"] = args
+            events.append(event)
+        with open(file_path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+        return len(events) - 1
+
+class _Span:
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer: Tracer, name: str, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.tracer.enabled:
+            end = time.perf_counter_ns()
+            self.tracer.record(self.name, self.start // 1000, (end - self.start) // 1000, self.args or None)
+        return False
+
+tracer = Tracer()
+
+def traced(name: str):
+    """関数の呼び出しをspanとして記録するデコレーター"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                end = time.perf_counter_ns()
+                tracer.record(name, start // 1000, (end - start) // 1000)
+        return wrapper
+    return decorator
+
+def default_trace_path() -> str:
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return os.path.join(tempfile.gettempdir(), f"pymind-trace-{os.getpid()}-{stamp}.json")
+
+def install_dump_signal(on_dump=None) -> bool:
+    """SIGUSR1 を受けたらトレースを一時ディレクトリへ書き出す（対応していないOSではFalse）"""
+    if not hasattr(signal, "SIGUSR1"):
+        return False
+
+    def handler(signum, frame):
+        path = default_trace_path()
+        tracer.dump(path)
+        if on_dump: on_dump(path)
+    signal.signal(signal.SIGUSR1, handler)
+    return True
+
+class StallDetector:
+    """イベントループの停止（応答なし）を検出して記録するクラス
+
+    INTERVAL_MS ごとに after で自身を呼び出し、予定より threshold_ms 以上遅れた場合に、
+    遅れていた区間を "event-loop stall" として記録する。
+    """
+    INTERVAL_MS = 50
+
+    def __init__(self, widget, threshold_ms: int = 200):
+        self.widget = widget
+        self.threshold_ms = threshold_ms
+        self._after_id = None
+        self._expected = None
+
+    def start(self):
+        if self._after_id is None:
+            self._schedule()
+
+    def stop(self):
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _schedule(self):
+        self._expected = time.perf_counter_ns() + self.INTERVAL_MS * 1_000_000
+        self._after_id = self.widget.after(self.INTERVAL_MS, self._tick)
+
+    def _tick(self):
+        now = time.perf_counter_ns()
+        late_ms = (now - self._expected) / 1_000_000
+        if late_ms >= self.threshold_ms and tracer.enabled:
+            tracer.record("event-loop stall", self._expected // 1000, (now - self._expected) // 1000,
+                          {"late_ms": round(late_ms, 1)}, category="stall")
+        self._schedule()
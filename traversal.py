@@ -0,0 +1,117 @@
+from collections import deque
+from typing import Callable, Iterator, List, Optional
+
+# ツリーの走査。いずれも明示的なスタックで行うため、深いツリー（インポートした数万階層の
+# アウトラインなど）でも RecursionError にならず、再帰呼び出しのオーバーヘッドもない。
+#   children_of: ノードの子の一覧を返す関数（省略時は node.children）。
+#                LayoutEngine.laid_out_children を渡すと、表示範囲の子とプレースホルダーをたどる。
+#   prune:       真を返したノードは返すが、その子孫はたどらない（折りたたみ・画面外の枝など）。
+
+def _children(node):
+    return node.children
+
+def preorder(root, children_of: Callable = None, prune: Callable = None) -> Iterator:
+    """ノードを前順（親が先、兄弟は順序どおり）に返す
+
+    ノードを返した後にその子を取得するため、呼び出し側で返されたノードの
+    子を変更しても（デシリアライズで子を組み立てる場合など）その結果がたどられる。
+    """
+    children_of = children_of or _children
+    stack = [root]
+    pop, extend = stack.pop, stack.extend
+    while stack:
+        node = pop()
+        yield node
+        if prune is not None and prune(node):
+            continue
+        children = children_of(node)
+        if children:
+            extend(reversed(children))
+
+def postorder(root, children_of: Callable = None, prune: Callable = None) -> List:
+    """ノードを後順（子がすべて先、兄弟は順序どおり）に並べた一覧を返す
+
+    prune はノードを最初に訪れた時点（子より前）に呼ばれる。
+    """
+    # 前順を逆にすると「子が先・兄弟は逆順」になる。兄弟の順序も保つため、
+    # 親ごとに子を逆順に積む前順（右から左へたどる前順）を逆にする
+    children_of = children_of or _children
+    order = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        if prune is not None and prune(node):
+            continue
+        children = children_of(node)
+        if children:
+            stack.extend(children)
+    order.reverse()
+    return order
+
+def visible(root, is_expanded: Callable, children_of: Callable = None,
+            culled: Optional[Callable] = None) -> Iterator:
+    """表示されるノードを前順に返す（折りたたまれたノードの子孫と、culled が真の枝を除く）
+
+    culled(node) が真のノードは、そのノード自身もサブツリーも返さない。
+    """
+    children_of = children_of or _children
+    stack = [root]
+    pop, extend = stack.pop, stack.extend
+    while stack:
+        node = pop()
+        if culled is not None and culled(node):
+            continue
+        yield node
+        if is_expanded(node):
+            children = children_of(node)
+            if children:
+                extend(reversed(children))
+
+def visible_by_level(root, is_expanded: Callable, children_of: Callable = None) -> Iterator:
+    """表示されるノードを浅い階層から順に（幅優先で）返す"""
+    children_of = children_of or _children
+    queue = deque([root])
+    popleft, extend = queue.popleft, queue.extend
+    while queue:
+        node = popleft()
+        yield node
+        if is_expanded(node):
+            children = children_of(node)
+            if children:
+                extend(children)
+
+def find(root, predicate: Callable, children_of: Callable = None) -> Optional[object]:
+    """前順で最初に predicate を満たすノード（なければNone）"""
+    for node in preorder(root, children_of):
+        if predicate(node):
+            return node
+    return None
+
+# 長い走査をジェネレーターとして書き、一定のノード数ごとに中断できるようにする
+# （段階表示で全体のレイアウトを after() の間に少しずつ進める場合など）。
+# 各ループでノードを1つ処理するごとに `if batches.tick(): yield` とし、
+# 一括で実行する場合は run_steps() で最後まで進める。
+
+class Batches:
+    """ノードを size 個処理するごとに tick() が真を返すカウンター（size=Noneなら常に偽）"""
+    def __init__(self, size: Optional[int] = None):
+        self.size = size
+        self._left = size
+
+    def tick(self) -> bool:
+        if self.size is None:
+            return False
+        self._left -= 1
+        if self._left > 0:
+            return False
+        self._left = self.size
+        return True
+
+def run_steps(steps):
+    """ジェネレーターを中断せずに最後まで実行し、その戻り値（return の値）を返す"""
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
@@ -0,0 +1,101 @@
+from typing import Dict, List, Optional
+from models import MindMapModel, Node
+
+# 外部で更新されたファイルの内容（保存形式の辞書）を、ノードIDをキーにして
+# 表示中のモデルとの差分として適用する。ノードを作り直さないため、選択中のノードや
+# 折りたたみ状態、レイアウト済みのサイズはそのまま残る。
+
+SYNCED_ATTRIBUTES = ("text", "direction", "color")
+
+def index_tree_data(data: dict) -> Optional[Dict[str, dict]]:
+    """保存形式の辞書を id -> ノードの辞書 の対応表にする（idの欠落・重複があればNone）"""
+    index = {}
+    stack = [data]
+    while stack:
+        node_data = stack.pop()
+        node_id = node_data.get("id")
+        if node_id is None or node_id in index:
+            return None
+        index[node_id] = node_data
+        stack.extend(node_data.get("children", []))
+    return index
+
+def apply_tree_diff(model: MindMapModel, data: dict) -> Optional[List[tuple]]:
+    """差分（挿入・削除・移動・テキストと属性の変更）だけをモデルに適用し、適用した変更の一覧を返す
+
+    変更は ("insert", node), ("delete", node), ("move", node), ("update", node, 属性名の一覧)。
+    ルートのIDが異なる・IDが欠けているなど差分で表せない場合は何もせずNoneを返す
+    （呼び出し側で全体を読み込み直す）。
+    折りたたみ状態は表示側の状態として扱い、既存のノードには反映しない。
+    """
+    new_index = index_tree_data(data)
+    if new_index is None or data["id"] != model.root.id:
+        return None
+
+    live: Dict[str, Node] = {}
+    stack = [model.root]
+    while stack:
+        node = stack.pop()
+        live[node.id] = node
+        stack.extend(node.children)
+
+    changes = []
+    with model.batch():
+        _apply_changes(model, data, new_index, live, changes)
+    return changes
+
+def _apply_changes(model: MindMapModel, data: dict, new_index: Dict[str, dict], live: Dict[str, Node],
+                   changes: list):
+    # 新しいツリーを前順にたどり、各親の子の並びを先頭から合わせていく。
+    # 前順のため、ある親を処理する時点でその祖先はすべて最終的な位置にあり、移動で循環は生じない。
+    # 新しいツリーに存在しない子は最後に切り離す。残る子孫を先に移動で取り出しておくことで、
+    # 元に戻す際に「削除の取り消し」より後に「移動の取り消し」が行われ、子孫が元の親へ戻る。
+    removed = []
+    stack = [(data, model.root)]
+    while stack:
+        parent_data, parent = stack.pop()
+        _update_attributes(model, parent, parent_data, changes)
+
+        children = parent.children
+        removed.extend(c for c in children if c.id not in new_index)
+
+        # i は切り離す予定の子を飛ばした位置（切り離す子はその場に残すため、他の子を移動せずに済む）
+        i = 0
+        for child_data in parent_data.get("children", []):
+            while i < len(children) and children[i].id not in new_index:
+                i += 1
+            node = live.get(child_data["id"])
+            if node is None:
+                node = Node(child_data.get("text", ""), node_id=child_data["id"])
+                node.direction = child_data.get("direction")
+                node.color = child_data.get("color")
+                node.collapsed = child_data.get("collapsed", False)
+                live[node.id] = node
+                model.insert_subtree(parent, node, i)
+                changes.append(("insert", node))
+            elif node.parent is not parent or not node._in_parent or children[i] is not node:
+                model.relocate_subtree(node, parent, i)
+                changes.append(("move", node))
+            stack.append((child_data, node))
+            i += 1
+        # 末尾に残った子は、この後に処理される別の親の下へ移動されるか、最後に切り離される
+
+    for node in removed:
+        model.remove_subtree(node)
+        changes.append(("delete", node))
+
+def _update_attributes(model: MindMapModel, node: Node, node_data: dict, changes: list):
+    changed = []
+    for name in SYNCED_ATTRIBUTES:
+        value = node_data.get(name)
+        if name == "text" and value is None:
+            value = ""
+        if getattr(node, name) != value:
+            changed.append(name)
+    if "text" in changed:
+        model.set_text(node, node_data.get("text") or "")
+    if "direction" in changed or "color" in changed:
+        # 方向・色はノード単位の値をそのまま合わせる（子孫の方向は各ノードのデータで合わせる）
+        model.set_style(node, node_data.get("direction"), node_data.get("color"))
+    if changed:
+        changes.append(("update", node, changed))
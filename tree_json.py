@@ -0,0 +1,207 @@
+import json
+import re
+from json.decoder import JSONDecodeError, scanstring
+from json.encoder import encode_basestring, encode_basestring_ascii
+from json.scanner import NUMBER_RE
+from typing import TextIO
+
+# 深いツリー（数万階層のアウトラインなど）を含むJSONの書き出し・読み込み。
+# 標準の json モジュールは入れ子1段ごとに再帰するため、数百階層で RecursionError になる。
+# ここでは入れ子を明示的なスタックでたどる書き出し・読み込みを行う。
+# 字下げなしの書き出しと読み込みは、浅いデータでは標準の json（Cによる実装）のほうが速いため
+# まずそちらで処理し、RecursionError になった場合だけスタックによる処理に切り替える（結果は同じ）。
+# 字下げする場合の標準の実装はPythonによるものなので、常にスタックによる処理で書き出す。
+# このとき字下げは INDENT_LIMIT 段までとする（深い階層では字下げの合計が深さの2乗に比例して増えるため）。
+# json.dump / json.load と同じ引数のうち、このアプリで使うもの（indent, separators, ensure_ascii）に対応する。
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_CONSTANTS = (("null", None), ("true", True), ("false", False),
+              ("NaN", float("nan")), ("Infinity", float("inf")), ("-Infinity", float("-inf")))
+_END = object()
+INDENT_LIMIT = 32
+
+def dumps(obj, indent=None, separators=None, ensure_ascii: bool = True) -> str:
+    """json.dumps と同じ文字列を返す（深い入れ子でも RecursionError にならない）
+
+    字下げは INDENT_LIMIT 段までで、それより深い階層は同じ幅で字下げする。
+    """
+    if indent is None:
+        try:
+            return json.dumps(obj, separators=separators, ensure_ascii=ensure_ascii)
+        except RecursionError:
+            pass
+    return "".join(_encode(obj, indent, separators, ensure_ascii))
+
+def dump(obj, f: TextIO, indent=None, separators=None, ensure_ascii: bool = True):
+    """json.dump と同じ内容を書き出す
+
+    標準の json.dump は少しずつ書き出すため、途中で RecursionError になると書きかけのファイルが残る。
+    文字列をすべて作ってから書き込む。
+    """
+    f.write(dumps(obj, indent=indent, separators=separators, ensure_ascii=ensure_ascii))
+
+def loads(s):
+    """json.loads と同じ値を返す（深い入れ子でも RecursionError にならない）"""
+    try:
+        return json.loads(s)
+    except RecursionError:
+        if isinstance(s, (bytes, bytearray)):
+            s = s.decode("utf-8")
+        return _decode(s)
+
+def load(f: TextIO):
+    return loads(f.read())
+
+# --- 書き出し ---
+
+def _encode(obj, indent, separators, ensure_ascii: bool):
+    """値を書き出す文字列の断片を順に返す"""
+    if separators is not None:
+        item_separator, key_separator = separators
+    else:
+        item_separator, key_separator = (", ", ": ") if indent is None else (",", ": ")
+    if isinstance(indent, int):
+        indent = " " * indent
+    encode_str = encode_basestring_ascii if ensure_ascii else encode_basestring
+
+    # 書き出し中のコンテナごとに [残りの要素のイテレーター, 辞書かどうか, 深さ, 最初の要素か]
+    stack = []
+    value = obj
+    while True:
+        # value を書き出す（コンテナなら開き括弧だけを書き、要素はスタックから順に書く）
+        if isinstance(value, (list, tuple, dict)):
+            is_dict = isinstance(value, dict)
+            if not value:
+                yield "{}" if is_dict else "[]"
+            else:
+                yield "{" if is_dict else "["
+                stack.append([iter(value.items() if is_dict else value), is_dict, len(stack) + 1, True])
+        else:
+            yield _encode_scalar(value, encode_str)
+
+        # 次に書き出す要素を探す（書き終えたコンテナは閉じ括弧を書いて取り除く）
+        while stack:
+            frame = stack[-1]
+            item = next(frame[0], _END)
+            if item is not _END:
+                break
+            stack.pop()
+            if indent is not None:
+                yield "\n" + indent * min(frame[2] - 1, INDENT_LIMIT)
+            yield "}" if frame[1] else "]"
+        else:
+            return
+
+        if frame[3]:
+            frame[3] = False
+        else:
+            yield item_separator
+        if indent is not None:
+            yield "\n" + indent * min(frame[2], INDENT_LIMIT)
+        if frame[1]:
+            key, value = item
+            if not isinstance(key, str):
+                key = _encode_scalar(key, encode_str)
+            yield encode_str(key)
+            yield key_separator
+        else:
+            value = item
+
+def _encode_scalar(value, encode_str) -> str:
+    if isinstance(value, str):
+        return encode_str(value)
+    if value is None:
+        return "null"
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if isinstance(value, int):
+        return int.__repr__(value)
+    if isinstance(value, float):
+        if value != value:
+            return "NaN"
+        if value in (float("inf"), float("-inf")):
+            return "Infinity" if value > 0 else "-Infinity"
+        return float.__repr__(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+# --- 読み込み ---
+
+def _decode(s: str):
+    """JSONの文字列を、入れ子を明示的なスタックでたどって値にする"""
+    # 読み込み中のコンテナごとに [コンテナ, 次の値を入れるキー（配列ならNone）]
+    stack = []
+    idx = _WHITESPACE.match(s, 0).end()
+    while True:
+        # 値を1つ読む（空でないコンテナなら開き括弧だけを読み、最初の要素へ進む）
+        value, idx = _scan_value(s, idx, stack)
+        if value is _END:
+            continue
+
+        # 読んだ値を親のコンテナに入れ、閉じたコンテナは親へ入れていく
+        while stack:
+            frame = stack[-1]
+            container = frame[0]
+            if frame[1] is None:
+                container.append(value)
+            else:
+                container[frame[1]] = value
+            idx = _WHITESPACE.match(s, idx).end()
+            char = s[idx:idx + 1]
+            closing = "]" if frame[1] is None else "}"
+            if char == ",":
+                idx = _WHITESPACE.match(s, idx + 1).end()
+                if frame[1] is not None:
+                    frame[1], idx = _scan_key(s, idx)
+                break
+            if char != closing:
+                raise JSONDecodeError("Expecting ',' delimiter", s, idx)
+            idx += 1
+            stack.pop()
+            value = container
+        else:
+            end = _WHITESPACE.match(s, idx).end()
+            if end != len(s):
+                raise JSONDecodeError("Extra data", s, end)
+            return value
+
+def _scan_value(s: str, idx: int, stack: list):
+    """idx から値を1つ読み、(値, 続きの位置) を返す
+
+    空でない配列・オブジェクトはスタックに積み、最初の要素の位置とともに _END を返す。
+    """
+    char = s[idx:idx + 1]
+    if char == '"':
+        return scanstring(s, idx + 1)
+    if char == "{" or char == "[":
+        is_dict = char == "{"
+        idx = _WHITESPACE.match(s, idx + 1).end()
+        if s[idx:idx + 1] == ("}" if is_dict else "]"):
+            return ({} if is_dict else []), idx + 1
+        if is_dict:
+            key, idx = _scan_key(s, idx)
+            stack.append([{}, key])
+        else:
+            stack.append([[], None])
+        return _END, idx
+    match = NUMBER_RE.match(s, idx)
+    if match is not None:
+        integer, frac, exp = match.groups()
+        if frac or exp:
+            return float(integer + (frac or "") + (exp or "")), match.end()
+        return int(integer), match.end()
+    for literal, value in _CONSTANTS:
+        if s.startswith(literal, idx):
+            return value, idx + len(literal)
+    raise JSONDecodeError("Expecting value", s, idx)
+
+def _scan_key(s: str, idx: int):
+    """オブジェクトのキーと続く ':' を読み、(キー, 値の位置) を返す"""
+    if s[idx:idx + 1] != '"':
+        raise JSONDecodeError("Expecting property name enclosed in double quotes", s, idx)
+    key, idx = scanstring(s, idx + 1)
+    idx = _WHITESPACE.match(s, idx).end()
+    if s[idx:idx + 1] != ":":
+        raise JSONDecodeError("Expecting ':' delimiter", s, idx)
+    return key, _WHITESPACE.match(s, idx + 1).end()
@@ -1,23 +1,49 @@
+import io
+import os
+import re
 import tkinter as tk
+from tkinter import filedialog, messagebox
+from events import BatchBegin, BatchEnd, ModelLoaded, NodeRemoved, TextChanged
 from models import MindMapModel, Node
 from graphics import GraphicsEngine
 from layout import LayoutEngine
+from layout_cache import discard_layout_cache, restore_layout_cache, save_layout_cache
+from paging import ChildWindows, Placeholder
+from tidy_layout import TidyLayoutEngine
 from editor import NodeEditor
 from drag_drop import DragDropHandler
 from navigation import KeyboardNavigator
 from persistence import PersistenceHandler
+from scheduler import RenderScheduler
+from svg_export import export_svg
+from exporters import export_indented_text
+from importers import import_indented_nodes
+from cli import validate_data
+from file_watcher import FileWatcher
+from history import UndoHistory
+from tree_diff import apply_tree_diff
+from sync import SyncSession, SocketTransport
+from tracing import StallDetector, default_trace_path, tracer
+from traversal import Batches, visible, visible_by_level
+from replay import SessionRecorder
 
 class MindMapView:
     LOGICAL_CENTER_X = 5000
     LOGICAL_CENTER_Y = 5000
+    LAYOUT_ENGINES = {"standard": LayoutEngine, "tidy": TidyLayoutEngine}
+    PROGRESSIVE_BATCH_NODES = 2000 # 段階表示で1フレームに追加するノード数の目安
+    PROGRESSIVE_DELAY_MS = 1       # 段階表示のフレーム間に入力イベントを処理させる間隔
+    SYNC_POLL_MS = 30              # 同期中に受信した操作を反映する間隔
 
-    def __init__(self, root: tk.Tk):
+    def __init__(self, root: tk.Tk, undo_depth: int = UndoHistory.DEFAULT_DEPTH):
         self.root = root
         self.root.title("pymind - Python Mind Map Tool")
         
         # メインフレーム（CanvasとScrollbarを配置）
         self.main_frame = tk.Frame(self.root)
         self.main_frame.pack(fill=tk.BOTH, expand=True)
+        # ホイスト中の経路（パンくずリスト）。ホイスト中のみ表示する
+        self.breadcrumb = tk.Frame(self.root, bg="#eeeeee")
         
         # スクロールバー
         self.v_scroll = tk.Scrollbar(self.main_frame, orient=tk.VERTICAL)
@@ -35,14 +61,40 @@ class MindMapView:
         self.model = MindMapModel()
         self.graphics = GraphicsEngine(self.canvas)
         self.layout_engine = LayoutEngine()
-        self.selected_node: Node = self.model.root
-        self.editor = NodeEditor(self.canvas, self.root, self.graphics, self.render)
+        self.child_windows = ChildWindows() # 子の多いトピックは一部の子だけを表示する
+        self.layout_engine.child_windows = self.child_windows
+        self.selection = {} # node_id -> Node（選択順。selected_node を含む）
+        self.selected_node = self.model.root
+        self._band = None # 範囲選択の矩形 {"x", "y", "id", "additive"}
+        self._clipboard_nodes = [] # コピーしたサブツリーの複製（貼り付けのたびに新しいIDで複製する）
+        self._clipboard_text = None # 上の複製をクリップボードに書き出したテキスト
+        self._pending_single_select = None # 複数選択中のノードを押した場合、ドラッグしなければ単一選択に戻す
+        self._progressive_generation = 0 # 段階表示の世代（別のファイルを読み込んだら古い段階表示を打ち切る）
+        self._progressive_running = False # 段階表示の全体レイアウト・描画を after() で進めている途中か
+        self.sync: SyncSession = None
+        self._model_events = [] # 一括操作の途中で受け取ったモデルのイベント
+        self.input_handlers = {} # イベントシーケンス -> ハンドラ（操作の再生で使用）
+        self._drawn_selection = None # 描画済みの選択状態 node_id -> Node（Noneは未描画）
+        self.recorder = None # 操作の記録（replay.SessionRecorder）
+        self.stall_detector = StallDetector(self.root)
+        self.scheduler = RenderScheduler(self.root, self._on_frame)
+        self.editor = NodeEditor(self.canvas, self.root, self.graphics, self._on_edit_finish, self._on_edit_change,
+                                 set_text=self._commit_edit)
         self.drag_handler = DragDropHandler(
-            self.canvas, self.model, self.graphics, self.layout_engine, self.render, self.find_node_at,
-            self.LOGICAL_CENTER_X, self.LOGICAL_CENTER_Y
+            self.canvas, self.model, self.graphics, self.layout_engine, self.find_node_at,
+            get_selection=lambda: list(self.selection.values())
         )
-        self.navigator = KeyboardNavigator(self.model, self.render)
+        self.navigator = KeyboardNavigator(self.model, self.layout_engine, self.render)
         self.persistence = PersistenceHandler(self.model, self._on_load_complete)
+        # 元に戻す・やり直すの履歴（他の参加者・外部での変更は自分の操作として記録しない）
+        self.history = UndoHistory(self.model, undo_depth)
+        # モデルの変更は、変更の内容に応じて再描画する（各操作のハンドラでは再描画しない）
+        self.model.subscribe(self._on_model_event)
+        # 開いているファイルの外部での更新を監視する（自身の保存は除く）
+        self.file_watcher = FileWatcher(self.root, lambda: self.persistence.current_file_path,
+                                        self._on_external_change)
+        self.persistence.on_written = self._on_written
+        self.file_watcher.start()
         
         # メニューバーの作成
         self._create_menu()
@@ -50,12 +102,16 @@ class MindMapView:
         # イベントバインド
         # イベントバインド (bind_allではなくroot.bindを使用し、breakが機能するようにする)
         def bind_key(key, handler):
-            self.root.bind(key, self._wrap_handler(handler))
+            name = handler.__name__ if handler.__name__ != "<lambda>" else None
+            self._bind_input(self.root, key, self._wrap_handler(handler), name)
 
         bind_key("<Tab>", self.on_add_child)
         bind_key("<Return>", self.on_add_sibling)
         bind_key("<F2>", self.on_edit_node)
         bind_key("<Delete>", self.on_delete_node)
+        bind_key("<Control-c>", self.on_copy)
+        bind_key("<Control-x>", self.on_cut)
+        bind_key("<Control-v>", self.on_paste)
         bind_key("<Control-s>", self.persistence.on_save)
         bind_key("<Control-S>", self.persistence.on_save_as) # Ctrl+Shift+S
         bind_key("<Control-o>", self.persistence.on_open)
@@ -63,19 +119,45 @@ class MindMapView:
         bind_key("<Down>", lambda e: self._navigate("down"))
         bind_key("<Left>", lambda e: self._navigate("left"))
         bind_key("<Right>", lambda e: self._navigate("right"))
+        bind_key("<space>", self.on_toggle_collapse)
+        bind_key("<Escape>", self.on_clear_selection)
+        bind_key("<Control-z>", self.on_undo)
+        bind_key("<Control-y>", self.on_redo)
+        bind_key("<Control-Z>", self.on_redo) # Ctrl+Shift+Z
+        bind_key("<Alt-Right>", self.on_hoist)
+        bind_key("<Alt-Left>", self.on_unhoist)
+        for level in range(1, 10):
+            bind_key(f"<Control-Key-{level}>", lambda e, level=level: self.on_expand_to_level(level))
         
         # マウスホイール
-        self.canvas.bind("<MouseWheel>", self.on_mouse_wheel)
-        self.canvas.bind("<Shift-MouseWheel>", self.on_mouse_wheel_x)
+        self._bind_input(self.canvas, "<MouseWheel>", self.on_mouse_wheel)
+        self._bind_input(self.canvas, "<Shift-MouseWheel>", self.on_mouse_wheel_x)
+        # ウィンドウサイズの変更時はスクロール領域と表示位置のみ更新する
+        self.canvas.bind("<Configure>", lambda e: self.scheduler.invalidate(RenderScheduler.GEOMETRY))
         
         self.first_render = True
         self.render()
 
         # マウスイベントのバインド
-        self.canvas.bind("<Button-1>", self._on_canvas_click)
-        self.canvas.bind("<Double-Button-1>", self._on_canvas_double_click)
-        self.canvas.bind("<B1-Motion>", lambda e: self.drag_handler.handle_motion(e))
-        self.canvas.bind("<ButtonRelease-1>", lambda e: self.drag_handler.handle_drop(e))
+        self._bind_input(self.canvas, "<Button-1>", self._on_canvas_click)
+        self._bind_input(self.canvas, "<Control-Button-1>", lambda e: self._on_canvas_click(e, mode="toggle"),
+                         "_on_canvas_click")
+        self._bind_input(self.canvas, "<Shift-Button-1>", lambda e: self._on_canvas_click(e, mode="range"),
+                         "_on_canvas_click")
+        self._bind_input(self.canvas, "<Double-Button-1>", self._on_canvas_double_click)
+        self._bind_input(self.canvas, "<B1-Motion>", self._on_canvas_motion)
+        self._bind_input(self.canvas, "<ButtonRelease-1>", self._on_canvas_release)
+
+    @property
+    def selected_node(self) -> Node:
+        """主選択ノード（キーボード操作・編集の対象）"""
+        return self._selected_node
+
+    @selected_node.setter
+    def selected_node(self, node: Node):
+        """主選択ノードを設定し、複数選択を解除する"""
+        self._selected_node = node
+        self.selection = {node.id: node} if node else {}
 
     def on_mouse_wheel(self, event):
         self.canvas.yview_scroll(int(-1*(event.delta/120)), "units")
@@ -83,7 +165,8 @@ class MindMapView:
     def on_mouse_wheel_x(self, event):
         self.canvas.xview_scroll(int(-1*(event.delta/120)), "units")
 
-    def _on_canvas_click(self, event):
+    def _on_canvas_click(self, event, mode="single"):
+        """クリックによる選択。mode は single（通常）, toggle（Ctrl）, range（Shift）"""
         if not self.editor.is_editing():
             self.canvas.focus_set()
             
@@ -91,24 +174,113 @@ class MindMapView:
             cx = self.canvas.canvasx(event.x)
             cy = self.canvas.canvasy(event.y)
             
+            placeholder = self._placeholder_at(cx, cy)
+            if placeholder is not None:
+                # 「他 K 件」をクリックすると、隠れている子を1ページ分追加で表示する
+                self.selected_node = self.child_windows.open(placeholder)
+                self.render()
+                return "break"
+
             # クリックしたノードを選択状態にする
             clicked_node = self.find_node_at(cx, cy)
             
             if clicked_node:
-                self.selected_node = clicked_node
-                self.render()
-                
                 # アイコンクリックの判定
                 items = self.canvas.find_overlapping(cx-2, cy-2, cx+2, cy+2)
                 for item_id in items:
                     tags = self.canvas.gettags(item_id)
                     if "collapse_icon" in tags:
-                        clicked_node.collapsed = not clicked_node.collapsed
+                        self.selected_node = clicked_node
+                        self.model.set_collapsed([clicked_node], not clicked_node.collapsed)
                         self.render()
                         return "break"
 
+                if mode == "toggle":
+                    self._toggle_selection(clicked_node)
+                elif mode == "range":
+                    self._select_range(clicked_node)
+                elif clicked_node.id in self.selection and len(self.selection) > 1:
+                    # 複数選択をまとめてドラッグできるよう、単一選択への切り替えはボタンを離すまで保留する
+                    self._selected_node = clicked_node
+                    self._pending_single_select = clicked_node
+                else:
+                    self.selected_node = clicked_node
+                self.scheduler.invalidate(RenderScheduler.SELECTION)
+
                 # ドラッグ開始の準備
-                self.drag_handler.start_drag(event, self.selected_node)
+                self.drag_handler.start_drag(event, clicked_node)
+            else:
+                # 何もない場所からは範囲選択を開始する
+                self._band = {"x": cx, "y": cy, "id": None, "additive": mode != "single"}
+            return "break"
+
+    def _toggle_selection(self, node: Node):
+        """ノードを選択に追加、または選択から外す（最後の1つは外さない）"""
+        if node.id in self.selection and len(self.selection) > 1:
+            del self.selection[node.id]
+            if node is self._selected_node:
+                self._selected_node = next(reversed(self.selection.values()))
+        else:
+            self.selection[node.id] = node
+            self._selected_node = node
+
+    def _select_range(self, node: Node):
+        """主選択ノードと同じ親を持つ場合は間の兄弟をすべて選択し、そうでなければ追加する"""
+        anchor = self._selected_node
+        if anchor.parent is None or node.parent is not anchor.parent:
+            self.selection[node.id] = node
+            return
+        siblings = anchor.parent.children
+        i, j = sorted((anchor.index_in_parent(), node.index_in_parent()))
+        for sibling in siblings[i:j + 1]:
+            self.selection[sibling.id] = sibling
+
+    def _on_canvas_motion(self, event):
+        if self._band is None:
+            self.drag_handler.handle_motion(event)
+            return
+        band = self._band
+        cx, cy = self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
+        if band["id"] is None:
+            band["id"] = self.canvas.create_rectangle(
+                cx, cy, cx, cy, outline="#0078d7", fill="", dash=(2, 2), tags="selection_band"
+            )
+        self.canvas.coords(band["id"], band["x"], band["y"], cx, cy)
+
+    def _on_canvas_release(self, event):
+        if self._band is None:
+            pending = self._pending_single_select
+            self._pending_single_select = None
+            if pending is not None and not self.drag_handler.drag_data.get("dragging"):
+                self.selected_node = pending
+                self.scheduler.invalidate(RenderScheduler.SELECTION)
+            self.drag_handler.handle_drop(event)
+            return
+
+        band, self._band = self._band, None
+        if band["id"] is None:
+            return # ドラッグせずに空白をクリックしただけ
+        self.canvas.delete(band["id"])
+        cx, cy = self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
+        self._select_in_rect(min(band["x"], cx), min(band["y"], cy), max(band["x"], cx), max(band["y"], cy),
+                             additive=band["additive"])
+
+    def _select_in_rect(self, x1, y1, x2, y2, additive=False):
+        """矩形に重なる表示中のノードを選択する"""
+        graph = self.layout_engine.nav_graph
+        if graph is None:
+            return
+        hits = [n for n in graph.nodes
+                if not isinstance(n, Placeholder)
+                and n.x + n.width/2 >= x1 and n.x - n.width/2 <= x2
+                and n.y + n.height/2 >= y1 and n.y - n.height/2 <= y2]
+        if not hits:
+            return
+        if not additive:
+            self.selected_node = hits[0]
+        for node in hits:
+            self.selection[node.id] = node
+        self.scheduler.invalidate(RenderScheduler.SELECTION)
 
     def _on_canvas_double_click(self, event):
         """ダブルクリックで編集モードを開始"""
@@ -118,11 +290,20 @@ class MindMapView:
         
         if clicked_node:
             self.selected_node = clicked_node
-            self.render()
-            self.on_edit_node(None)
+            self.scheduler.invalidate(RenderScheduler.SELECTION)
+            self._edit_after_frame()
 
     def find_node_at(self, x, y):
         """指定座標にあるノードを返す"""
+        node_id = self._node_id_at(x, y)
+        return self.model.find_node_by_id(node_id) if node_id else None
+
+    def _placeholder_at(self, x, y):
+        node_id = self._node_id_at(x, y)
+        return self.child_windows.placeholder(node_id) if node_id else None
+
+    def _node_id_at(self, x, y):
+        """指定座標にある描画済みのノード（プレースホルダーを含む）のIDを返す"""
         # 矩形の当たり判定 (クリック範囲を少し広げる)
         # find_overlapping は (x1, y1, x2, y2) で指定
         padding = 10
@@ -134,17 +315,199 @@ class MindMapView:
                 # タグからnode_idを取得 (e.g., "node <uuid>")
                 for tag in tags:
                     if tag not in ("node", "text", "current", "ghost"):
-                        node_id = tag
-                        return self.model.find_node_by_id(node_id)
+                        return tag
         return None
 
     def _navigate(self, direction):
-        self.selected_node = self.navigator.navigate(self.selected_node, direction)
-        self.render(force_center=True)
+        # 隣接表はレイアウト時に作られるため、保留中のレイアウトがあれば先に反映する
+        if self.scheduler.is_pending(RenderScheduler.LAYOUT):
+            self.scheduler.flush()
+        node = self.navigator.navigate(self.selected_node, direction)
+        if isinstance(node, Placeholder):
+            # 表示範囲の端を越えた場合は、範囲をずらして隣の子を選択する
+            self.selected_node = self.child_windows.page(node)
+            self.scheduler.invalidate(RenderScheduler.LAYOUT, force_center=True)
+            return
+        self.selected_node = node
+        self.scheduler.invalidate(RenderScheduler.SELECTION, force_center=True)
 
     def _on_load_complete(self, root_node):
+        self._stop_progressive_paint()
         self.selected_node = root_node
+        if self._paint_cached_layout():
+            return
         self.render()
+        self.scheduler.after_frame(self._save_layout_cache)
+
+    def _on_written(self, file_path):
+        self.file_watcher.remember(file_path)
+        self.scheduler.after_frame(self._save_layout_cache)
+
+    def open_file(self, file_path, on_progress=None):
+        """ファイルを読み込み、浅い階層から段階的に描画する
+
+        on_progress(stage) は "loaded"（読み込み完了）, "first_frame"（ルートと第1階層の描画完了）,
+        "complete"（全階層の描画完了）の各時点で呼ばれる。
+        """
+        try:
+            self.persistence.load_path(file_path)
+        except Exception as e:
+            messagebox.showerror("エラー", f"読み込みに失敗しました: {e}")
+            return
+        if on_progress: on_progress("loaded")
+        self.selected_node = self.model.root
+        if self._paint_cached_layout(on_progress):
+            return
+        self._start_progressive_paint(on_progress)
+
+    def _paint_cached_layout(self, on_progress=None) -> bool:
+        """前回のレイアウトのキャッシュがあれば、テキストを計測せずに復元した座標で描画する
+
+        隣接表を作るための全体レイアウト（計測は省かれる）は次のフレームで行い、
+        復元したサイズはアイドル時に少しずつ計測し直して確かめる。
+        """
+        path = self.persistence.current_file_path
+        if not path:
+            return False
+        self._stop_progressive_paint()
+        with tracer.span("LayoutCache.restore", file=path):
+            nodes = restore_layout_cache(path, self.model, self.layout_engine, self.graphics)
+        if nodes is None:
+            return False
+
+        generation = self._progressive_generation
+        # 読み込みで要求された全体レイアウトは、描画の後に回す
+        self.scheduler.cancel(RenderScheduler.LAYOUT)
+        self._drawn_selection = None # 選択の切り替えではなく、復元した座標ですべて描画させる
+        self.scheduler.invalidate(RenderScheduler.SELECTION)
+
+        def relayout():
+            # 座標は復元済みのため描き直さず、隣接表を作るためのレイアウトだけを区切って行う
+            steps = self.layout_engine.layout_steps(self.model, self.graphics, self.LOGICAL_CENTER_X,
+                                                    self.LOGICAL_CENTER_Y, self.PROGRESSIVE_BATCH_NODES)
+            self._run_progressive(generation, steps, on_laid_out)
+
+        def on_laid_out():
+            if on_progress: on_progress("complete")
+            self.root.after(self.PROGRESSIVE_DELAY_MS, lambda: self._verify_cached_layout(generation, nodes, 0))
+
+        def on_drawn():
+            if generation != self._progressive_generation:
+                return
+            if on_progress: on_progress("first_frame")
+            self.root.after(self.PROGRESSIVE_DELAY_MS, relayout)
+        self.scheduler.after_frame(on_drawn)
+        return True
+
+    def _verify_cached_layout(self, generation, nodes, index):
+        """復元したノードのサイズを計測し直し、異なる場合はキャッシュを破棄して全体を計測し直す"""
+        if generation != self._progressive_generation:
+            return
+        graphics = self.graphics
+        end = min(len(nodes), index + self.PROGRESSIVE_BATCH_NODES)
+        for node in nodes[index:end]:
+            if node._layout_key is None:
+                continue # 編集などで計測し直す予定のノード
+            font = graphics.root_font if node.depth == 0 else graphics.font
+            if tuple(graphics.get_text_size(node.text, font)) != (node.width, node.height):
+                discard_layout_cache(self.persistence.current_file_path)
+                for n in nodes:
+                    n._layout_key = None
+                self.render()
+                self.scheduler.after_frame(self._save_layout_cache)
+                return
+        if end < len(nodes):
+            self.root.after(self.PROGRESSIVE_DELAY_MS, lambda: self._verify_cached_layout(generation, nodes, end))
+
+    def _save_layout_cache(self, file_path=None):
+        """保存済みの内容と一致するレイアウトを、次回の読み込み用にファイルの横へ保存する"""
+        path = self.persistence.current_file_path
+        if not path or (file_path and file_path != path) or self.persistence.is_modified():
+            return
+        if self.scheduler.is_pending(RenderScheduler.LAYOUT):
+            return
+        with tracer.span("LayoutCache.save", file=path):
+            save_layout_cache(path, self.model, self.layout_engine, self.graphics)
+
+    def _start_progressive_paint(self, on_progress=None):
+        """ルートと第1階層を先に描画し、全体のレイアウトと残りの描画はイベント処理の合間に少しずつ進める
+
+        全体のレイアウトは PROGRESSIVE_BATCH_NODES 個のノードごとに区切り、その間は第1階層までの描画を表示しておく。
+        レイアウトが終わったら、描画済みの項目は消さずに浅い階層から同じ個数ずつ描き足す。
+        途中でモデルが変更されたり全体の再描画が要求されたりした場合は打ち切り、通常の描画に任せる。
+        """
+        self._stop_progressive_paint()
+        generation = self._progressive_generation
+        self.layout_engine.depth_limit = 1
+        self.render()
+
+        def on_first_frame():
+            if generation != self._progressive_generation:
+                return
+            if on_progress: on_progress("first_frame")
+            self.layout_engine.depth_limit = None
+            steps = self.layout_engine.layout_steps(self.model, self.graphics, self.LOGICAL_CENTER_X,
+                                                    self.LOGICAL_CENTER_Y, self.PROGRESSIVE_BATCH_NODES)
+            self._run_progressive(generation, steps, on_laid_out)
+
+        def on_laid_out():
+            self._run_progressive(generation, self._progressive_draw_steps(), on_drawn)
+
+        def on_drawn():
+            self._drawn_selection = dict(self.selection)
+            self.scheduler.invalidate(RenderScheduler.GEOMETRY)
+            if on_progress: on_progress("complete")
+            self.scheduler.after_frame(self._save_layout_cache)
+        self.scheduler.after_frame(on_first_frame)
+
+    def _run_progressive(self, generation, steps, on_done):
+        """段階表示の処理（ジェネレーター）を1区切りずつ after() で進め、最後まで進んだら on_done を呼ぶ"""
+        if generation != self._progressive_generation:
+            return
+        self._progressive_running = True
+        try:
+            next(steps)
+        except StopIteration:
+            self._progressive_running = False
+            on_done()
+            return
+        self.root.after(self.PROGRESSIVE_DELAY_MS, lambda: self._run_progressive(generation, steps, on_done))
+
+    def _progressive_draw_steps(self):
+        """表示されるノードを浅い階層から順に、描画済みの項目に重ねて描画する（描き直したノードは項目が置き換わる）"""
+        engine, selection = self.layout_engine, self.selection
+        batches = Batches(self.PROGRESSIVE_BATCH_NODES)
+        for n in visible_by_level(engine.layout_root(self.model), engine.is_expanded, engine.laid_out_children):
+            self.graphics.draw_node(n, is_selected=(n.id in selection))
+            if batches.tick():
+                self.scheduler.invalidate(RenderScheduler.GEOMETRY) # 描き足した分だけスクロール範囲を広げる
+                yield
+
+    def _stop_progressive_paint(self):
+        self._progressive_generation += 1
+        self._progressive_running = False
+        self.layout_engine.depth_limit = None
+
+    def _bind_input(self, widget, sequence, handler, name=None):
+        """入力イベントにハンドラを登録する（操作の記録中は、ハンドラを呼ぶ前に入力を記録する）"""
+        if name is None:
+            name = getattr(handler, "__name__", None)
+        def dispatch(event):
+            if self.recorder is not None:
+                self.recorder.record_input(sequence, name, event)
+            return handler(event)
+        self.input_handlers[sequence] = handler
+        widget.bind(sequence, dispatch)
+
+    def start_recording(self, file_path):
+        """操作の記録を開始する（現在の文書を記録の先頭に含める）"""
+        self.stop_recording()
+        self.recorder = SessionRecorder(self, file_path)
+
+    def stop_recording(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
 
     def _wrap_handler(self, func):
         """編集中は入力を無視し、かつイベントが他へ伝播しないようにする"""
@@ -156,20 +519,60 @@ class MindMapView:
         return wrapper
 
     def render(self, force_center=False):
-        self.graphics.clear()
-        w, h = self._get_canvas_size()
-        
-        # レイアウト計算: ウィンドウサイズに依存しない固定の基準点を使用
-        self.layout_engine.apply_layout(self.model, self.graphics, self.LOGICAL_CENTER_X, self.LOGICAL_CENTER_Y)
-        
-        # 全ノード描画
-        self._draw_subtree(self.model.root)
-        
-        # スクロールと自動センタリング
-        self._update_scroll_and_focus(w, h, force_center)
+        """レイアウトからの再描画を要求する（実際の描画は次のアイドル時に1回だけ行う）"""
+        self.scheduler.invalidate(RenderScheduler.LAYOUT, force_center=force_center)
+
+    def _on_frame(self, flags, force_center):
+        with tracer.span("MindMapView.render", flags=flags):
+            w, h = self._get_canvas_size()
+            if self.child_windows.reveal(self.selected_node):
+                flags |= RenderScheduler.LAYOUT # 表示範囲外の子が選択された（追加・貼り付けなど）
+            if flags & RenderScheduler.LAYOUT and self._progressive_running:
+                self._stop_progressive_paint() # 段階表示の続きは破棄し、この描画で全体をレイアウトする
+            
+            if flags & RenderScheduler.LAYOUT:
+                # レイアウト計算: ウィンドウサイズに依存しない固定の基準点を使用
+                self.layout_engine.apply_layout(self.model, self.graphics, self.LOGICAL_CENTER_X, self.LOGICAL_CENTER_Y)
+            
+            redrawn = False
+            if flags & RenderScheduler.LAYOUT or (flags & RenderScheduler.SELECTION and self._drawn_selection is None):
+                # 全ノード描画
+                with tracer.span("MindMapView.draw"):
+                    self.graphics.clear()
+                    self._draw_subtree(self.layout_engine.layout_root(self.model))
+                self._drawn_selection = dict(self.selection)
+                redrawn = True
+            elif flags & RenderScheduler.SELECTION:
+                # 選択が変わったノードだけ表示を切り替える
+                with tracer.span("MindMapView.restyle_selection"):
+                    self._restyle_selection()
+            
+            # スクロールと自動センタリング。スクロール領域の計算（bbox）はキャンバスの全アイテムを
+            # たどるため、選択だけが変わった場合は行わず、選択したノードが見えるようにするだけにする
+            if flags & (RenderScheduler.LAYOUT | RenderScheduler.GEOMETRY) or redrawn or self.first_render:
+                self._update_scroll_and_focus(w, h, force_center)
+            else:
+                self.ensure_node_visible(self.selected_node, force_center=force_center)
+
+    def _restyle_selection(self):
+        """前回の描画から選択状態が変わったノードだけ、強調表示を付け外しする"""
+        drawn, current = self._drawn_selection, self.selection
+        for node_id, node in drawn.items():
+            if node_id not in current:
+                self.graphics.set_selected(node, False)
+        for node_id, node in current.items():
+            if node_id not in drawn:
+                self.graphics.set_selected(node, True)
+        self._drawn_selection = dict(current)
+
+    def _edit_after_frame(self):
+        """描画が終わり、ノードの座標が確定してから編集を開始する"""
+        self.scheduler.after_frame(lambda: self.on_edit_node(None))
 
     def _get_canvas_size(self):
-        self.root.update_idletasks()
+        if self.first_render:
+            # 初回のみウィンドウの配置を確定させて実際のサイズを取得する
+            self.root.update_idletasks()
         w = max(100, self.canvas.winfo_width())
         h = max(100, self.canvas.winfo_height())
         return w, h
@@ -205,9 +608,6 @@ class MindMapView:
         """指定したノードが画面外にある場合、見える位置までスクロールする"""
         if not node or not self.canvas.cget("scrollregion"): return
         
-        # scrollregionの変更を反映させる
-        self.canvas.update_idletasks()
-        
         # キャンバス上の現在の表示領域を取得 (比率 0.0 to 1.0)
         vx1, vx2 = self.canvas.xview()
         vy1, vy2 = self.canvas.yview()
@@ -244,42 +644,422 @@ class MindMapView:
             self.canvas.yview_moveto(max(0, node_rel_y - view_h_ratio / 2))
 
     def _draw_subtree(self, node: Node):
-        self.graphics.draw_node(node, is_selected=(node == self.selected_node))
-        if not node.collapsed:
-            for child in node.children:
-                self._draw_subtree(child)
+        engine, selection = self.layout_engine, self.selection
+        for n in visible(node, engine.is_expanded, engine.laid_out_children):
+            self.graphics.draw_node(n, is_selected=(n.id in selection))
 
     def on_add_child(self, event):
         if self.editor.is_editing(): return
         
-        # 折りたたまれている場合は展開する
-        if self.selected_node.collapsed:
-            self.selected_node.collapsed = False
-            
-        new_node = self.model.add_node(self.selected_node)
+        # 折りたたまれている場合は展開する（展開と追加で1回の操作）
+        with self.model.batch():
+            if self.selected_node.collapsed:
+                self.model.set_collapsed([self.selected_node], False)
+            new_node = self.model.add_node(self.selected_node)
         self.selected_node = new_node
-        self.render()
-        self.on_edit_node(None)
+        self._edit_after_frame()
 
     def on_add_sibling(self, event):
         if self.editor.is_editing(): return
-        if self.selected_node.parent:
+        # レイアウトの根（ホイスト中のノードを含む）には兄弟を追加しない
+        if self.selected_node.parent and self.selected_node is not self.layout_engine.hoisted:
             new_node = self.model.add_node(self.selected_node.parent)
             self.selected_node = new_node
-            self.render()
-            self.on_edit_node(None)
+            self._edit_after_frame()
 
     def on_edit_node(self, event):
         self.editor.start_edit(self.selected_node)
         return "break"
 
+    def _commit_edit(self, node: Node, text: str):
+        if self.recorder is not None:
+            self.recorder.record_edit("commit", text)
+        self.model.set_text(node, text)
+
+    def _on_edit_finish(self):
+        if self.recorder is not None:
+            self.recorder.record_edit("end")
+        self.render()
+
+    def _on_edit_change(self, node: Node, text: str):
+        """編集中のテキストに合わせて、編集ノードと影響範囲だけを再配置する"""
+        if self.recorder is not None:
+            self.recorder.record_edit("change", text)
+        if self._reflow_node(node, text):
+            self.editor.relocate(node)
+
+    def _reflow_node(self, node: Node, text: str):
+        """テキストのサイズに合わせて node と影響範囲だけを再配置・再描画する
+
+        再配置した場合はTrue、サイズが変わらない場合はFalse、
+        部分的な再配置に対応していないレイアウト方式の場合はNoneを返す。
+        """
+        font = self.graphics.root_font if node.depth == 0 else self.graphics.font
+        width, height = self.graphics.get_text_size(text, font)
+        if (width, height) == (node.width, node.height):
+            return False
+        
+        result = self.layout_engine.reflow_node(node, width, height)
+        if result is None:
+            return None
+        changed, moves = result
+        for n in changed:
+            self.graphics.draw_node(n, is_selected=(n.id in self.selection))
+        for subtree_root, dx, dy in moves:
+            self.graphics.translate_subtree(subtree_root, dx, dy, self.layout_engine.laid_out_children)
+        
+        # 位置が変わらなくても、親の端点が動いた子の接続線は描き直す
+        redrawn = {n.id for n in changed} | {m[0].id for m in moves}
+        for n in changed:
+            if n.collapsed: continue
+            for child in self.layout_engine.laid_out_children(n):
+                if child.id not in redrawn:
+                    self.graphics.draw_connection(child)
+        return True
+
+    def _on_external_change(self, file_path):
+        """開いているファイルが外部で更新された場合、差分だけをモデルに反映する
+
+        選択・折りたたみ状態と表示位置は保ち、テキストだけの変更はそのノードの周囲だけを再配置する。
+        未保存の変更がある場合は反映するかを確認し、反映しなければ編集中の内容を残す。
+        反映した差分は1回の操作として元に戻せる。
+        """
+        if self.editor.is_editing():
+            return False # 編集が終わってから反映する
+        try:
+            data = self.persistence.read_data(file_path)
+        except (OSError, ValueError):
+            return False # 書き込み途中などで読めない場合は、次のポーリングで読み直す
+        if validate_data(data)[0]:
+            return False # JSONとしては読めてもpymindの文書でない場合は反映しない（次の更新を待つ）
+        if self.persistence.is_modified() and not messagebox.askyesno(
+                "外部での変更", f"ファイルが外部で更新されました。\n{file_path}\n\n"
+                "未保存の変更がありますが、外部での変更を反映しますか？\n"
+                "（いいえを選ぶと編集中の内容を残します）"):
+            return True
+        # 差分はモデルのイベントとして通知され、_on_model_event で再描画される
+        if apply_tree_diff(self.model, data) is None:
+            # 別の文書に置き換わった場合は全体を読み込み直す
+            self.model.load(data)
+            self._on_load_complete(self.model.root)
+        self.persistence.remember_saved()
+        return True
+
+    def _on_model_event(self, event):
+        """モデルの変更を受け取り、一括操作の終わりにまとめて選択の整理と再描画を行う
+
+        テキストだけの変更は、そのノードの周囲だけを再配置する。方向・色の変更（AttributesChanged）は
+        左右の振り分けと系統色が変わるため、他の変更と同じく全体を再配置する。
+        """
+        if self._progressive_running:
+            # 段階表示の続きは変更前のツリーをたどるため破棄し、全体を描き直す
+            self._stop_progressive_paint()
+            self.render()
+        if isinstance(event, BatchBegin):
+            return
+        if not isinstance(event, BatchEnd):
+            self._model_events.append(event)
+            if self.model.in_batch:
+                return
+        events, self._model_events = self._model_events, []
+        if not events:
+            return
+
+        if all(isinstance(e, TextChanged) for e in events):
+            if self._reflow_texts([e.node for e in events]):
+                return
+        elif any(isinstance(e, (NodeRemoved, ModelLoaded)) for e in events):
+            hoisted = self.layout_engine.hoisted
+            if hoisted is not None and not self._is_attached(hoisted):
+                self.hoist(None) # ホイスト中のノードが削除された・別の文書を読み込んだ
+            self._drop_detached_selection()
+        self.render()
+
+    def _reflow_texts(self, nodes) -> bool:
+        """テキストが変わったノードだけを再配置・再描画する（できない場合はFalse）"""
+        if self.scheduler.is_pending(RenderScheduler.LAYOUT):
+            return False # 全体のレイアウトが予定されている
+        for node in nodes:
+            if not self._is_attached(node) or not self._is_shown(node):
+                continue
+            if self._reflow_node(node, node.text) is None:
+                return False
+            self.graphics.draw_node(node, is_selected=(node.id in self.selection))
+        return True
+
+    def start_sync(self, address: str):
+        """リレー（host:port または unix:パス）に接続し、他のpymindと編集操作を同期する"""
+        try:
+            self.sync = SyncSession(self.model, SocketTransport(address))
+        except OSError as e:
+            messagebox.showerror("エラー", f"同期用のリレーに接続できません: {e}")
+            return
+        self._poll_sync()
+
+    def _poll_sync(self):
+        if self.editor.is_editing() or self.drag_handler.drag_data.get("dragging"):
+            # 編集・ドラッグ中のノードが入れ替わらないよう、操作が終わってから反映する
+            self.root.after(self.SYNC_POLL_MS, self._poll_sync)
+            return
+        with self.history.suspended():
+            self.sync.poll() # 受信した変更はモデルのイベントとして再描画される
+        self.root.after(self.SYNC_POLL_MS, self._poll_sync)
+
+    def _is_shown(self, node: Node) -> bool:
+        """祖先がすべて展開されていて、現在のレイアウトで配置されているか"""
+        root = self.layout_engine.layout_root(self.model)
+        if node is root:
+            return True
+        p = node.parent
+        while p is not root:
+            if p is None or not self.layout_engine.is_expanded(p):
+                return False # ホイスト中のサブツリーの外、または折りたたまれている
+            p = p.parent
+        return self.layout_engine.is_expanded(root) and self.child_windows.is_visible(node)
+
+    def _is_attached(self, node: Node) -> bool:
+        """現在のルートから辿れるか（削除されたサブツリーや読み込み前のツリーのノードでないか）"""
+        while node.parent is not None:
+            if not node._in_parent:
+                return False
+            node = node.parent
+        return node is self.model.root
+
+    def _drop_detached_selection(self):
+        """削除されてツリーから外れたノードを選択から外す"""
+        attached = self._is_attached
+        remaining = [n for n in self.selection.values() if attached(n)]
+        primary = self._selected_node if attached(self._selected_node) else (remaining[0] if remaining else self.model.root)
+        self.selected_node = primary
+        for node in remaining:
+            self.selection[node.id] = node
+
     def on_delete_node(self, event):
         if self.editor.is_editing(): return
-        if self.selected_node.parent:
-            parent = self.selected_node.parent
-            parent.remove_child(self.selected_node)
-            self.selected_node = parent
-            self.render()
+        # 選択中のノードをまとめて削除し、再描画は1回だけ行う（ホイスト中のノードはルートと同様に残す）
+        hoisted = self.layout_engine.hoisted
+        fallback = self.model.delete_nodes(n for n in self.selection.values() if n is not hoisted)
+        if fallback is not None:
+            self.selected_node = fallback
+
+    def on_undo(self, event=None):
+        if self.editor.is_editing(): return
+        self._select_after_history(self.history.undo())
+
+    def on_redo(self, event=None):
+        if self.editor.is_editing(): return
+        self._select_after_history(self.history.redo())
+
+    def _select_after_history(self, node):
+        """元に戻した・やり直した操作の対象を選択する（表示されていなければ表示中の祖先）"""
+        if node is None or not self._is_attached(node):
+            return
+        root = self.layout_engine.layout_root(self.model)
+        if node is not root and not node.is_descendant_of(root):
+            return # ホイスト中のサブツリーの外
+        shown = node
+        p = node.parent
+        while shown is not root:
+            if p.collapsed:
+                shown = p
+            if p is root:
+                break
+            p = p.parent
+        self.selected_node = shown
+        self.scheduler.invalidate(RenderScheduler.SELECTION, force_center=True)
+
+    def on_copy(self, event):
+        """選択中のサブツリーを複製して保持し、インデントテキストとしてクリップボードにも書き出す"""
+        if self.editor.is_editing(): return
+        nodes = self.model.top_level_nodes(self.selection.values())
+        if not nodes: return
+        # 複製はコピーした時点の内容で固定する（後の編集は貼り付けに影響しない）
+        self._clipboard_nodes = [node.clone() for node in nodes]
+        buffer = io.StringIO()
+        for node in self._clipboard_nodes:
+            export_indented_text(node, buffer)
+        self._clipboard_text = buffer.getvalue()
+        self.root.clipboard_clear()
+        self.root.clipboard_append(self._clipboard_text)
+
+    def on_cut(self, event):
+        if self.editor.is_editing(): return
+        self.on_copy(event)
+        self.on_delete_node(event)
+
+    def on_paste(self, event):
+        """クリップボードの内容を選択中のノードの子として貼り付ける（再描画は1回だけ行う）"""
+        if self.editor.is_editing() or self.selected_node is None: return
+        try:
+            text = self.root.clipboard_get()
+        except tk.TclError:
+            text = None
+        if text is not None and text != self._clipboard_text:
+            # 他のアプリケーションからコピーされたテキストはアウトラインとして読み込む
+            templates = import_indented_nodes(text.splitlines())
+        else:
+            templates = self._clipboard_nodes
+        if not templates: return
+
+        pasted = self.model.paste_subtrees(self.selected_node, templates)
+        self.selected_node = pasted[0]
+        for node in pasted[1:]:
+            self.selection[node.id] = node
+
+    def on_toggle_collapse(self, event):
+        """選択中のノードに展開中のものがあればすべて折りたたみ、なければすべて展開する"""
+        nodes = [n for n in self.selection.values() if n.children]
+        if not nodes: return
+        self.model.set_collapsed(nodes, any(not n.collapsed for n in nodes))
+        self._drop_hidden_selection()
+
+    def on_expand_to_level(self, level: int):
+        """選択中の各ノードを指定した階層まで展開する（Ctrl+1〜9）"""
+        with self.model.batch(): # 複数のノードへの操作も1回の操作として元に戻す
+            for node in self.model.top_level_nodes(self.selection.values()):
+                self.model.expand_to_level(node, level)
+        self._drop_hidden_selection()
+
+    def on_clear_selection(self, event):
+        """複数選択を解除して主選択ノードだけを残す"""
+        if len(self.selection) > 1:
+            self.selected_node = self.selected_node
+            self.scheduler.invalidate(RenderScheduler.SELECTION)
+
+    def _drop_hidden_selection(self):
+        """折りたたみで見えなくなったノードを選択から外す（主選択は見えている祖先へ移す）"""
+        def visible_self(node):
+            shown, p = node, node.parent
+            while p is not None:
+                if p.collapsed:
+                    shown = p
+                p = p.parent
+            return shown
+
+        primary = visible_self(self._selected_node)
+        visible = [n for n in self.selection.values() if visible_self(n) is n]
+        self.selected_node = primary
+        for node in visible:
+            self.selection[node.id] = node
+
+    def hoist(self, node: Node):
+        """node をレイアウトの根として、そのサブツリーだけを配置・描画する（None または文書のルートで解除）"""
+        if node is self.model.root:
+            node = None
+        if node is not None and node.collapsed:
+            self.model.set_collapsed([node], False) # 根の子は常に展開して表示する
+        self._stop_progressive_paint()
+        self.layout_engine.hoist(node)
+        root = self.layout_engine.layout_root(self.model)
+        inside = [n for n in self.selection.values() if n is root or n.is_descendant_of(root)]
+        primary = self._selected_node if self._selected_node in inside else root
+        self.selected_node = primary
+        for n in inside:
+            self.selection[n.id] = n
+        self._update_breadcrumb()
+        self.render(force_center=True)
+
+    def on_hoist(self, event=None):
+        """選択中のトピックをホイストする"""
+        if self.editor.is_editing(): return
+        self.hoist(self.selected_node)
+
+    def on_unhoist(self, event=None):
+        """ホイストを1階層戻す"""
+        if self.editor.is_editing(): return
+        hoisted = self.layout_engine.hoisted
+        if hoisted is not None:
+            self.hoist(hoisted.parent)
+            self.selected_node = hoisted
+
+    def _update_breadcrumb(self):
+        """ホイスト中は、文書のルートからホイストしたノードまでの経路をキャンバスの上に表示する"""
+        for widget in self.breadcrumb.winfo_children():
+            widget.destroy()
+        hoisted = self.layout_engine.hoisted
+        if hoisted is None:
+            self.breadcrumb.pack_forget()
+            return
+
+        path = []
+        curr = hoisted
+        while curr is not None:
+            path.append(curr)
+            curr = curr.parent
+        for i, node in enumerate(reversed(path)):
+            if i:
+                tk.Label(self.breadcrumb, text="›", bg="#eeeeee").pack(side=tk.LEFT)
+            text = re.sub(r'<[^>]+>', '', node.text).replace("\n", " ")
+            if len(text) > 20:
+                text = text[:20] + "…"
+            label = tk.Label(self.breadcrumb, text=text, bg="#eeeeee",
+                             fg="#333333" if node is hoisted else "#1565C0",
+                             cursor="" if node is hoisted else "hand2")
+            label.pack(side=tk.LEFT, padx=2)
+            if node is not hoisted:
+                label.bind("<Button-1>", lambda e, node=node: self.hoist(node))
+        self.breadcrumb.pack(side=tk.TOP, fill=tk.X, before=self.main_frame)
+
+    def _on_toggle_geometric_nav(self):
+        self.navigator.geometric = self.geometric_nav_var.get()
+
+    def set_layout_engine(self, name: str):
+        """レイアウト方式を切り替えて再描画する"""
+        self._stop_progressive_paint() # 段階表示の途中なら打ち切り、新しい方式で全体を描画する
+        engine = self.LAYOUT_ENGINES[name]()
+        engine.child_windows = self.child_windows
+        engine.hoisted = self.layout_engine.hoisted
+        self.layout_engine = engine
+        self.drag_handler.layout_engine = engine
+        self.navigator.layout_engine = engine
+        self.render()
+
+    def set_tracing(self, enabled: bool):
+        """処理時間の記録とイベントループの停止検出を切り替える"""
+        tracer.enable(enabled)
+        self.trace_var.set(enabled)
+        if enabled:
+            self.stall_detector.start()
+        else:
+            self.stall_detector.stop()
+
+    def on_save_trace(self):
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".json", initialfile=os.path.basename(default_trace_path()),
+            filetypes=[("Chrome trace", "*.json"), ("All files", "*.*")]
+        )
+        if not file_path:
+            return
+        try:
+            count = tracer.dump(file_path)
+            messagebox.showinfo("トレース", f"{count} 件の記録を保存しました。\n{file_path}")
+        except Exception as e:
+            messagebox.showerror("エラー", f"トレースの保存に失敗しました: {e}")
+
+    def on_start_recording(self):
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".jsonl", filetypes=[("操作の記録", "*.jsonl"), ("All files", "*.*")]
+        )
+        if file_path:
+            self.start_recording(file_path)
+
+    def on_export_svg(self):
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".svg", filetypes=[("SVG files", "*.svg"), ("All files", "*.*")]
+        )
+        if not file_path:
+            return
+        try:
+            # 保留中の配置を済ませ、画面と同じ配置結果を書き出す（ノードの座標は変更されない）。
+            # 段階表示の途中はまだ全体が配置されていないため、複製したツリーを配置して書き出す
+            self.scheduler.flush()
+            progressive = self.layout_engine.depth_limit is not None or self._progressive_running
+            engine = None if progressive else self.layout_engine
+            export_svg(self.model, file_path, metrics=self.graphics,
+                       center_x=self.LOGICAL_CENTER_X, center_y=self.LOGICAL_CENTER_Y, layout_engine=engine)
+            messagebox.showinfo("エクスポート", f"SVGを出力しました。\n{file_path}")
+        except Exception as e:
+            messagebox.showerror("エラー", f"エクスポートに失敗しました: {e}")
 
     def _create_menu(self):
         menubar = tk.Menu(self.root)
@@ -287,7 +1067,36 @@ class MindMapView:
         filemenu.add_command(label="開く (Ctrl+O)", command=self.persistence.on_open)
         filemenu.add_command(label="保存 (Ctrl+S)", command=self.persistence.on_save)
         filemenu.add_command(label="名前を付けて保存 (Ctrl+Shift+S)", command=self.persistence.on_save_as)
+        filemenu.add_command(label="インポート (テキスト/Markdown/OPML)...", command=self.persistence.on_import)
+        filemenu.add_command(label="SVGにエクスポート...", command=self.on_export_svg)
         filemenu.add_separator()
         filemenu.add_command(label="終了", command=self.root.quit)
         menubar.add_cascade(label="ファイル", menu=filemenu)
+
+        editmenu = tk.Menu(menubar, tearoff=0)
+        editmenu.add_command(label="元に戻す (Ctrl+Z)", command=self.on_undo)
+        editmenu.add_command(label="やり直し (Ctrl+Y)", command=self.on_redo)
+        menubar.add_cascade(label="編集", menu=editmenu)
+
+        viewmenu = tk.Menu(menubar, tearoff=0)
+        self.geometric_nav_var = tk.BooleanVar(value=self.navigator.geometric)
+        viewmenu.add_checkbutton(label="座標に基づく矢印キー移動", variable=self.geometric_nav_var,
+                                 command=self._on_toggle_geometric_nav)
+        viewmenu.add_command(label="選択中のトピックをホイスト (Alt+→)", command=self.on_hoist)
+        viewmenu.add_command(label="ホイストを戻す (Alt+←)", command=self.on_unhoist)
+        viewmenu.add_separator()
+        self.layout_var = tk.StringVar(value="standard")
+        viewmenu.add_radiobutton(label="レイアウト: 標準", variable=self.layout_var, value="standard",
+                                 command=lambda: self.set_layout_engine(self.layout_var.get()))
+        viewmenu.add_radiobutton(label="レイアウト: 詰めて配置 (Tidy)", variable=self.layout_var, value="tidy",
+                                 command=lambda: self.set_layout_engine(self.layout_var.get()))
+        viewmenu.add_separator()
+        self.trace_var = tk.BooleanVar(value=tracer.enabled)
+        viewmenu.add_checkbutton(label="処理時間を記録 (トレース)", variable=self.trace_var,
+                                 command=lambda: self.set_tracing(self.trace_var.get()))
+        viewmenu.add_command(label="トレースを保存...", command=self.on_save_trace)
+        viewmenu.add_separator()
+        viewmenu.add_command(label="操作の記録を開始...", command=self.on_start_recording)
+        viewmenu.add_command(label="操作の記録を停止", command=self.stop_recording)
+        menubar.add_cascade(label="表示", menu=viewmenu)
         self.root.config(menu=menubar)